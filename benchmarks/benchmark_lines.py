@@ -0,0 +1,49 @@
+# Print the memory and the time taken by the lines of a tab: PYTHONPATH=src python benchmarks/benchmark_lines.py [count]
+import gc
+import sys
+import time
+import tracemalloc
+
+from lazython.tab import Tab
+
+
+def measure(name: str, count: int, fill: 'function[[Tab], None]') -> None:
+    """Print the memory and the time taken by the lines of a tab.
+
+    Args:
+        name (str): The name of the measure.
+        count (int): The number of lines added.
+        fill (function[[Tab], None]): Adds the lines to a tab.
+    """
+    tab = Tab(name=name)
+    gc.collect()
+    start_time = time.perf_counter()
+    fill(tab)
+    duration = time.perf_counter() - start_time
+    del tab
+
+    # Measure the memory on another tab, as tracing allocations slows them down.
+    tab = Tab(name=name)
+    gc.collect()
+    tracemalloc.start()
+    fill(tab)
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{name:<16} {memory / count:8.1f} B/line {duration:8.3f} s')
+
+
+if __name__ == '__main__':
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    texts = [f'Line {i}' for i in range(count)]
+
+    def add_line(tab: Tab) -> None:
+        for _ in range(count):
+            tab.add_line()
+
+    print(f'{count} lines, not counting the texts')
+    measure('add_line', count, add_line)
+    measure('add_lines', count, lambda tab: tab.add_lines('' for _ in range(count)))
+    measure('add_lines, text', count, lambda tab: tab.add_lines(texts))
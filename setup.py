@@ -12,4 +12,5 @@ setup(
     packages=find_packages(where="src"),
     package_dir={"": "src"},
     install_requires=[],
+    python_requires=">=3.10",
 )
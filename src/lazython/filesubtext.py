@@ -0,0 +1,390 @@
+import os
+import re
+import time
+import weakref
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Sequence
+
+from .subtext import TEXT_IDS, get_hit_bounds
+from .vars import HIT_COLOR, HIT_END_COLOR
+
+
+class FileSubtext:
+    """A subtext read from a file.
+
+    The file is not read into memory: the offset of each of its lines is indexed, and a window of
+    rows only reads and decodes the bytes of the visible lines. Reads go through `os.pread`, so that
+    a file truncated under the subtext only gives shorter reads.
+
+    The file is indexed in the background from the first time it is displayed, a chunk at a time,
+    and a window only waits for the rows it displays. Until the whole file is indexed, its size only
+    counts the lines indexed so far. When the file grows, only the appended bytes are indexed. The
+    size of the file is only checked again once the thread following it saw a change, and a file
+    replaced at the same path, e.g. by a log rotation, is opened again.
+
+    Each line of the file is a row: lines longer than the width are cut instead of wrapped, so that
+    the rows do not depend on the width.
+    """
+
+    WRAP = False  # The rows are the lines of the file.
+    INDEX_CHUNK_SIZE = 1 << 20  # The number of bytes indexed or searched at once.
+    POLL_INTERVAL = 0.5  # The time between two checks of the file size, in seconds.
+
+    def __init__(
+            self: 'FileSubtext',
+            path: str,
+            encoding: str = 'utf-8',
+            on_change: 'function[[], None]' = None,
+    ) -> None:
+        """Initialize a file subtext.
+
+        Args:
+            path (str): The path of the file.
+            encoding (str, optional): The encoding of the file. Defaults to 'utf-8'.
+            on_change (function[[], None], optional): Called from another thread when the file size changes, and as the
+                file gets indexed. Defaults to None means the file is not followed, it is read as it was when first
+                displayed.
+        """
+        self.path = path
+        self.encoding = encoding
+
+        self.__file = open(path, 'rb')
+        self.__inode = self.__get_inode(os.fstat(self.__file.fileno()))
+        self.__size = 0  # The size of the file when last checked.
+        self.__rows = array('q', [0])  # The offset of each line indexed so far. It is only appended to, or replaced.
+        self.__indexed = 0  # The number of bytes indexed.
+        self.__indexing = False  # Whether the thread indexing the file is running.
+        self.__text_id = next(TEXT_IDS)  # Changes when the file is truncated or replaced, see `get_span`.
+        self.__lock = threading.Lock()  # Held while the file is read, or the index or the size are updated.
+        self.__on_change = on_change
+        self.__closed = threading.Event()
+        self.__changed = threading.Event()  # Set when the file has to be checked again.
+        self.__changed.set()
+
+        if on_change is not None:
+            # The thread only holds a weak reference, so that it ends with the subtext.
+            thread = threading.Thread(
+                target=FileSubtext.__follow,
+                args=(weakref.ref(self), self.__closed, self.__changed, on_change),
+                daemon=True,
+            )
+            thread.start()
+
+    def __len__(
+            self: 'FileSubtext',
+    ) -> int:
+        self.__update()
+        return self.__size
+
+    def close(
+            self: 'FileSubtext',
+    ) -> None:
+        """Stop following and indexing the file, and release it."""
+        self.__closed.set()
+        with self.__lock:
+            self.__file.close()
+
+    def get_text(
+            self: 'FileSubtext',
+    ) -> str:
+        """Get the text.
+
+        It reads the whole file.
+
+        Returns:
+            str: The text.
+        """
+        self.__update()
+        return self.__read(0, self.__size).decode(self.encoding, errors='replace')
+
+    def get_size(
+            self: 'FileSubtext',
+            width: int,
+    ) -> tuple[int, int]:
+        """Get the size of the text at the specified width.
+
+        Args:
+            width (int): The width.
+
+        Returns:
+            tuple[int, int]: The number of columns and the number of lines.
+        """
+        self.__update()
+        self.__start_index()
+        if self.__size == 0:
+            return 0, 0
+        return max(0, width), len(self.__rows) - 1
+
+    def get_window(
+            self: 'FileSubtext',
+            width: int,
+            scroll: int,
+            height: int,
+            hits: Sequence[int] = (),
+            query: str = '',
+    ) -> tuple[str, int]:
+        """Get the text displayed by a window of rows.
+
+        Args:
+            width (int): The width.
+            scroll (int): The first row of the window.
+            height (int): The number of rows of the window.
+            hits (Sequence[int], optional): The offsets of the hits of a search, highlighted in the window. Defaults to ().
+            query (str, optional): The query of the search. Defaults to ''.
+
+        Returns:
+            tuple[str, int]: The text and the scroll to render it with.
+        """
+        self.__update()
+        self.__start_index()
+        self.__index(lambda rows, indexed: len(rows) > scroll + height)
+        rows = self.__rows
+        if height <= 0 or scroll >= len(rows):
+            return '', 0
+        start = rows[scroll]
+        end = rows[scroll + height] if scroll + height < len(rows) else self.__indexed
+        data = self.__read(start, end)
+        if not hits:
+            return '\x1b[0m' + data.decode(self.encoding, errors='replace'), 0
+        pieces = ['\x1b[0m']
+        position = 0
+        for hit_start, hit_end in get_hit_bounds(start, end, hits, len(query.encode(self.encoding))):
+            pieces += [data[position:hit_start].decode(self.encoding, errors='replace'), HIT_COLOR,
+                       data[hit_start:hit_end].decode(self.encoding, errors='replace'), HIT_END_COLOR]
+            position = hit_end
+        pieces.append(data[position:].decode(self.encoding, errors='replace'))
+        return ''.join(pieces), 0
+
+    def get_row(
+            self: 'FileSubtext',
+            width: int,
+            offset: int,
+    ) -> int:
+        """Get the row displaying an offset, see `prepare_search`.
+
+        Args:
+            width (int): The width.
+            offset (int): The offset.
+
+        Returns:
+            int: The row.
+        """
+        self.__update()
+        self.__start_index()
+        self.__index(lambda rows, indexed: indexed > offset)
+        return bisect_right(self.__rows, offset) - 1
+
+    def get_span(
+            self: 'FileSubtext',
+    ) -> tuple[int, int, int]:
+        """Get the identity and the offsets of the text, see `Subtext.get_span`.
+
+        The identity changes when the file is truncated or replaced.
+
+        Returns:
+            tuple[int, int, int]: The identity, the start offset and the end offset, in bytes.
+        """
+        self.__update()
+        return self.__text_id, 0, self.__size
+
+    def prepare_search(
+            self: 'FileSubtext',
+            query: str,
+            since: int = None,
+    ) -> 'function[[threading.Event], array]':
+        """Prepare a search of the file, ignoring case for ASCII letters.
+
+        Args:
+            query (str): The query.
+            since (int, optional): The end offset of the file searched before, see `get_span`. Only the hits ending
+                after it are searched. Defaults to None means the whole file.
+
+        Returns:
+            function[[threading.Event], array]: Searches the file, and returns the byte offsets of the hits. It reads the
+                file on its own, so that it can run in another thread. A file that cannot be read has no hits. If the
+                optional event gets set, it stops and returns the hits found so far.
+        """
+        path = self.path
+        _, _, end = self.get_span()  # The bytes appended since are left to the next search.
+        pattern = query.encode(self.encoding)
+        expression = re.compile(re.escape(pattern), re.IGNORECASE)
+
+        def search(cancel: threading.Event = None) -> array:
+            hits = array('q')
+            try:
+                file = open(path, 'rb')
+            except OSError:
+                return hits
+            with file:
+                offset = max(0, since - len(pattern) + 1) if since is not None else 0
+                file.seek(offset)
+                overlap = b''
+                while offset < end and (chunk := file.read(min(FileSubtext.INDEX_CHUNK_SIZE, end - offset))):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    # The end of the previous chunk is searched again, for the hits across chunks. It is too
+                    # short to hold a whole hit, so no hit is found twice.
+                    data = overlap + chunk
+                    base = offset - len(overlap)
+                    hits.extend(base + match.start() for match in expression.finditer(data))
+                    offset += len(chunk)
+                    overlap = data[-(len(pattern) - 1):] if len(pattern) > 1 else b''
+            return hits
+        return search
+
+    def __read(
+            self: 'FileSubtext',
+            start: int,
+            end: int,
+    ) -> bytes:
+        """Read the bytes between two offsets, or less if the file is shorter."""
+        pieces = []
+        with self.__lock:
+            while start < end and not self.__file.closed:
+                piece = os.pread(self.__file.fileno(), end - start, start)
+                if not piece:
+                    break
+                pieces.append(piece)
+                start += len(piece)
+        return b''.join(pieces)
+
+    def __update(
+            self: 'FileSubtext',
+    ) -> None:
+        """Update the size of the file if it changed, or open it again if it was replaced."""
+        if self.__file.closed or not self.__changed.is_set():
+            return
+        self.__changed.clear()
+        try:
+            inode = self.__get_inode(os.stat(self.path))
+        except OSError:
+            inode = self.__inode
+        with self.__lock:
+            if self.__file.closed:
+                return
+            if inode != self.__inode:
+                self.__reopen()
+            size = os.fstat(self.__file.fileno()).st_size
+            if size < self.__indexed:
+                # The file was truncated, index it again.
+                self.__rows = array('q', [0])
+                self.__indexed = 0
+                self.__text_id = next(TEXT_IDS)
+            self.__size = size
+
+    def __reopen(
+            self: 'FileSubtext',
+    ) -> None:
+        """Open the file found at the path, replacing the file read so far."""
+        try:
+            file = open(self.path, 'rb')
+        except OSError:
+            return
+        self.__file.close()
+        self.__file = file
+        self.__inode = self.__get_inode(os.fstat(file.fileno()))
+        self.__size = 0
+        self.__rows = array('q', [0])
+        self.__indexed = 0
+        self.__text_id = next(TEXT_IDS)
+
+    @staticmethod
+    def __get_inode(
+            stat: os.stat_result,
+    ) -> tuple[int, int]:
+        return stat.st_dev, stat.st_ino
+
+    def __start_index(
+            self: 'FileSubtext',
+    ) -> None:
+        """Index the bytes not indexed yet in the background."""
+        with self.__lock:
+            if self.__indexing or self.__indexed >= self.__size or self.__file.closed:
+                return
+            self.__indexing = True
+        threading.Thread(target=self.__run_index, daemon=True).start()
+
+    def __run_index(
+            self: 'FileSubtext',
+    ) -> None:
+        last_change = time.monotonic()
+        while not self.__closed.is_set():
+            if not self.__index_chunk():
+                break
+            if self.__on_change is not None and time.monotonic() - last_change >= FileSubtext.POLL_INTERVAL:
+                # Show the lines indexed so far.
+                last_change = time.monotonic()
+                self.__on_change()
+        if self.__on_change is not None and not self.__closed.is_set():
+            self.__on_change()
+
+    def __index(
+            self: 'FileSubtext',
+            done: 'function[[array, int], bool]',
+    ) -> None:
+        """Index the bytes not indexed yet until a condition on the rows and the number of bytes indexed holds."""
+        while not done(self.__rows, self.__indexed) and self.__index_chunk(stop=False):
+            pass
+
+    def __index_chunk(
+            self: 'FileSubtext',
+            stop: bool = True,
+    ) -> bool:
+        """Index the lines of the next chunk of bytes not indexed yet.
+
+        Args:
+            stop (bool, optional): If True, the indexing thread stops when there is nothing left to index. Defaults to True.
+
+        Returns:
+            bool: False if there was nothing left to index.
+        """
+        with self.__lock:
+            if self.__indexed >= self.__size or self.__file.closed:
+                if stop:
+                    self.__indexing = False
+                return False
+            start = self.__indexed
+            chunk = os.pread(self.__file.fileno(), min(FileSubtext.INDEX_CHUNK_SIZE, self.__size - start), start)
+            if not chunk:
+                # The file is shorter than it was, until its size is checked again.
+                self.__size = start
+                if stop:
+                    self.__indexing = False
+                return False
+            # The offset after each newline of the chunk.
+            lengths = [len(line) + 1 for line in chunk.split(b'\n')]
+            lengths.pop()
+            offsets = accumulate(lengths, initial=start)
+            next(offsets)
+            self.__rows.extend(offsets)
+            self.__indexed = start + len(chunk)
+            return True
+
+    @staticmethod
+    def __follow(
+            reference: 'weakref.ref[FileSubtext]',
+            closed: threading.Event,
+            changed: threading.Event,
+            on_change: 'function[[], None]',
+    ) -> None:
+        """Set `changed` and call `on_change` whenever the size of the file, or the file at its path, changes."""
+        def get_state() -> tuple | None:
+            subtext = reference()
+            if subtext is None:
+                return None
+            try:
+                stat = os.stat(subtext.path)
+            except OSError:
+                return ()
+            return stat.st_dev, stat.st_ino, stat.st_size
+
+        state = get_state()
+        while state is not None and not closed.wait(FileSubtext.POLL_INTERVAL):
+            new_state = get_state()
+            if new_state is not None and new_state != state:
+                changed.set()
+                on_change()
+            state = new_state
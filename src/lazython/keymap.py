@@ -0,0 +1,102 @@
+from .shortcut import Shortcut
+
+
+class Keymap:
+    """A registry of key bindings.
+
+    A binding is bound either to a key or to a chord, a tuple of keys pressed one after the other.
+    Bindings are looked up by their keys in a dict, and every proper prefix of a chord is indexed
+    as well, so that recognizing a partial chord is a single lookup too.
+    """
+
+    def __init__(
+            self: 'Keymap',
+    ) -> None:
+        """Initialize a keymap."""
+        self.__shortcuts: list[Shortcut] = []  # The shortcuts, in the order they were added.
+        self.__bindings: dict[tuple[int, ...], list[Shortcut]] = {}  # The shortcuts of each key sequence.
+        self.__prefixes: dict[tuple[int, ...], int] = {}  # The number of chords starting with each key sequence.
+        self.__displayable: list[Shortcut] = None  # The shortcuts displayed in the menu, once computed.
+
+    @staticmethod
+    def get_keys(
+            key: int | tuple[int, ...],
+    ) -> tuple[int, ...]:
+        """Get the key sequence of a key or a chord.
+
+        Args:
+            key (int | tuple[int, ...]): The key or the chord.
+
+        Returns:
+            tuple[int, ...]: The key sequence.
+        """
+        return tuple(key) if isinstance(key, (tuple, list)) else (key,)
+
+    def add(
+            self: 'Keymap',
+            shortcut: 'Shortcut',
+    ) -> None:
+        """Add a shortcut.
+
+        Args:
+            shortcut (Shortcut): The shortcut.
+        """
+        keys = Keymap.get_keys(shortcut.key)
+        if len(keys) == 0:
+            raise ValueError('A shortcut needs at least one key.')
+
+        self.__shortcuts.append(shortcut)
+        self.__bindings.setdefault(keys, []).append(shortcut)
+        for i in range(1, len(keys)):
+            self.__prefixes[keys[:i]] = self.__prefixes.get(keys[:i], 0) + 1
+        self.__displayable = None
+
+    def get(
+            self: 'Keymap',
+            keys: tuple[int, ...],
+    ) -> list['Shortcut']:
+        """Get the shortcuts bound to a key sequence.
+
+        Args:
+            keys (tuple[int, ...]): The key sequence.
+
+        Returns:
+            list[Shortcut]: The shortcuts.
+        """
+        return self.__bindings.get(keys, [])
+
+    def is_prefix(
+            self: 'Keymap',
+            keys: tuple[int, ...],
+    ) -> bool:
+        """Check if a key sequence is the beginning of a chord.
+
+        Args:
+            keys (tuple[int, ...]): The key sequence.
+
+        Returns:
+            bool: True if a longer chord starts with the key sequence.
+        """
+        return keys in self.__prefixes
+
+    def get_shortcuts(
+            self: 'Keymap',
+    ) -> list['Shortcut']:
+        """Get the shortcuts.
+
+        Returns:
+            list[Shortcut]: The shortcuts, in the order they were added.
+        """
+        return self.__shortcuts
+
+    def get_displayable(
+            self: 'Keymap',
+    ) -> list['Shortcut']:
+        """Get the shortcuts displayed in the menu.
+
+        Returns:
+            list[Shortcut]: The shortcuts with a name and a help, in the order they were added.
+        """
+        if self.__displayable is None:
+            self.__displayable = [shortcut for shortcut in self.__shortcuts if shortcut.displayable()]
+        return self.__displayable
@@ -0,0 +1,324 @@
+import re
+from array import array
+
+from .style import DEFAULT_STYLE, apply_sgr
+
+
+TAB_WIDTH = 4
+
+# The first char of every escape sequence, to skip plain text quickly.
+SPECIAL_EXPR = re.compile(r'[\n\r\t\x1b]')
+
+# A text that may be the beginning of an escape sequence.
+PARTIAL_EXPR = re.compile(r'\x1b(?:\[[0-9;]*)?')
+
+# Escape sequences, grouped by prefix.
+TOKEN_EXPR = re.compile(
+    r'(?P<newline>\n)'
+    r'|(?P<return>\r)'
+    r'|(?P<tab>\t)'
+    r'|\x1b(?:'
+    r'(?P<save>7)'
+    r'|(?P<restore>8)'
+    r'|\[(?:'
+    r'(?P<color>[0-9;]*m)'
+    r'|(?P<goto>\d+;\d+H)'
+    r'|(?P<erase>K)'
+    r'|(?P<return_erase>2K)'
+    r'|(?P<move_up>\d*A)'
+    r'))'
+)
+
+
+class Layout:
+    """Lay a text out in a box.
+
+    The text is tokenized in a single pass with precompiled expressions: runs of plain text are
+    handled as slices, and each escape sequence is classified once by its group name and dispatched.
+
+    A layout can be fed incrementally, and can index the offset and the style at which each wrapped
+    row starts. The index is only usable while the text never moves the cursor up (see `monotonic`).
+    """
+
+    def __init__(
+            self: 'Layout',
+            width: int,
+            wrap: bool = True,
+            style: str = DEFAULT_STYLE,
+            draw: 'function[[int, int, str, str], None]' = None,
+            index: bool = False,
+            start: int = 0,
+    ) -> None:
+        """Initialize a layout.
+
+        Args:
+            width (int): The width of the box.
+            wrap (bool, optional): If False, the lines are cut with an ellipsis instead of being wrapped. Defaults to True.
+            style (str, optional): The style at the beginning of the text. Defaults to DEFAULT_STYLE.
+            draw (function[[int, int, str, str], None], optional): Called with the column, the row, the text and the style of each
+                piece of text to draw. The text always fits in the box width. Defaults to None means nothing is drawn.
+            index (bool, optional): If True, the start of each row is indexed. Defaults to False.
+            start (int, optional): The offset of the text in a longer text, from which the rows are indexed. Defaults to 0.
+        """
+        self.width = width
+        self.wrap = wrap
+        self.style = style
+
+        self.cursor_x = 0
+        self.cursor_y = 0
+        self.saved_x = 0
+        self.saved_y = 0
+        self.min_x = 0
+        self.max_x = 0
+        self.min_y = 0
+        self.max_y = 0
+
+        self.monotonic = True  # False once the text moved the cursor up.
+        self.length = start  # The offset of the end of the text fed so far.
+        self.rows: array = array('q', [start]) if index else None  # The offset of each row.
+        self.row_styles: list[str] = [style] if index else None  # The style at the start of each row.
+        self.row_widths: array = array('q', [0]) if index else None  # The rightmost column reached in each row.
+        self.first_row = 0  # The first row of the index not dropped.
+
+        self.__pending = ''  # The beginning of an escape sequence, waiting for the next feed.
+        self.__draw = draw
+
+        # Handlers of the less common escape sequences.
+        self.__handlers = {
+            'save': self.__save,
+            'restore': self.__restore,
+            'goto': self.__goto,
+            'tab': self.__tab,
+            'erase': self.__erase,
+            'return_erase': self.__return_erase,
+            'move_up': self.__move_up,
+        }
+
+    def feed(
+            self: 'Layout',
+            text: str,
+            final: bool = True,
+    ) -> None:
+        """Lay a text out, after the text already fed.
+
+        Args:
+            text (str): The text.
+            final (bool, optional): If False, more text may follow, and an escape sequence cut at the end of
+                the text is kept until the next feed. Defaults to True.
+        """
+        base = self.length - len(self.__pending)
+        self.length += len(text)
+        if self.__pending:
+            text = self.__pending + text
+            self.__pending = ''
+        length = len(text)
+        if not final:
+            start = text.rfind('\x1b', max(0, length - 16))
+            if start != -1 and TOKEN_EXPR.match(text, start) is None and PARTIAL_EXPR.fullmatch(text, start):
+                self.__pending = text[start:]
+                length = start
+
+        draw = self.__draw
+        rows = self.rows
+        row_styles = self.row_styles
+        row_widths = self.row_widths
+        width = self.width
+        handlers = self.__handlers
+        style = self.style
+        cursor_x = self.cursor_x
+        cursor_y = self.cursor_y
+        min_x, max_x = self.min_x, self.max_x
+        min_y, max_y = self.min_y, self.max_y
+
+        position = 0
+        while position < length:
+            # Find the next escape sequence.
+            start = position
+            while (special := SPECIAL_EXPR.search(text, start, length)) is not None:
+                start = special.start()
+                if (match := TOKEN_EXPR.match(text, start, length)) is not None:
+                    break
+                start += 1
+            else:
+                match = None
+                start = length
+
+            # Plain text.
+            while position < start:
+                if cursor_x >= width:
+                    if not self.wrap:
+                        if draw is not None and cursor_x > 0:
+                            draw(cursor_x - 1, cursor_y, '…', style)
+                        break
+                    # Wrap.
+                    cursor_x = 0
+                    cursor_y += 1
+                    if rows is not None and cursor_y == len(rows):
+                        rows.append(base + position)
+                        row_styles.append(style)
+                        row_widths.append(0)
+
+                # Add as many chars as the line can hold.
+                stop = min(start, position + max(1, width - cursor_x))
+                if draw is not None and cursor_x < width:
+                    draw(cursor_x, cursor_y, text[position:stop], style)
+                cursor_x += stop - position
+                position = stop
+
+                # Update maxes.
+                if cursor_x > max_x:
+                    max_x = cursor_x
+                if cursor_y > max_y:
+                    max_y = cursor_y
+                if rows is not None and cursor_y >= 0 and cursor_x > row_widths[cursor_y]:
+                    row_widths[cursor_y] = cursor_x
+
+            if match is None:
+                break
+            position = match.end()
+
+            # Escape sequence. The most common ones are handled inline.
+            kind = match.lastgroup
+            if kind == 'newline':
+                cursor_x = 0
+                cursor_y += 1
+            elif kind == 'color':
+                style = apply_sgr(style, match.group())
+            elif kind == 'return':
+                cursor_x = 0
+            else:
+                self.style, self.cursor_x, self.cursor_y = style, cursor_x, cursor_y
+                handlers[kind](match.group())
+                style, cursor_x, cursor_y = self.style, self.cursor_x, self.cursor_y
+
+            # Index the new rows.
+            if rows is not None:
+                while cursor_y >= len(rows):
+                    rows.append(base + position)
+                    row_styles.append(style)
+                    row_widths.append(0)
+                if cursor_y >= 0 and cursor_x > row_widths[cursor_y]:
+                    row_widths[cursor_y] = cursor_x
+
+            # Update cursor min and max.
+            if cursor_x < min_x:
+                min_x = cursor_x
+            if cursor_x > max_x:
+                max_x = cursor_x
+            if cursor_y < min_y:
+                min_y = cursor_y
+            if cursor_y > max_y:
+                max_y = cursor_y
+
+        self.style = style
+        self.cursor_x = cursor_x
+        self.cursor_y = cursor_y
+        self.min_x, self.max_x = min_x, max_x
+        self.min_y, self.max_y = min_y, max_y
+
+    def drop_rows(
+            self: 'Layout',
+            count: int,
+    ) -> None:
+        """Drop the first rows, once the text they hold was removed from the beginning of the text.
+
+        The dropped rows are only deleted from the index once they make half of it, so that dropping
+        rows takes constant amortized time. Until then, the index starts at `first_row`. The number of
+        columns is computed again from the kept rows when a dropped row was the widest.
+
+        Args:
+            count (int): The number of rows to drop.
+        """
+        first_row = self.first_row
+        self.first_row += count
+        self.min_y = max(self.min_y, self.first_row)
+        if self.rows is None:
+            return
+        if max(self.row_widths[first_row:self.first_row], default=0) >= self.max_x:
+            self.max_x = max(self.row_widths[self.first_row:], default=0)
+        if self.first_row * 2 < len(self.rows):
+            return
+        del self.rows[:self.first_row]
+        del self.row_styles[:self.first_row]
+        del self.row_widths[:self.first_row]
+        self.cursor_y -= self.first_row
+        self.saved_y -= self.first_row
+        self.min_y -= self.first_row
+        self.max_y -= self.first_row
+        self.first_row = 0
+
+    def get_size(
+            self: 'Layout',
+    ) -> tuple[int, int]:
+        """Get the size of the text fed so far.
+
+        Returns:
+            tuple[int, int]: The number of columns and the number of lines.
+        """
+        if self.__pending:
+            # Lay the pending text out as if no more text followed.
+            layout = Layout(self.width, wrap=self.wrap, style=self.style)
+            layout.cursor_x, layout.cursor_y = self.cursor_x, self.cursor_y
+            layout.min_x, layout.max_x = self.min_x, self.max_x
+            layout.min_y, layout.max_y = self.min_y, self.max_y
+            layout.feed(self.__pending)
+            return layout.get_size()
+        return self.max_x - self.min_x, self.max_y - self.min_y
+
+    # Escape sequence handlers.
+
+    def __save(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.saved_x, self.saved_y = self.cursor_x, self.cursor_y
+
+    def __restore(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.monotonic = False
+        self.cursor_x = self.saved_x
+        self.cursor_y = self.saved_y
+
+    def __goto(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.monotonic = False
+        cursor_x, cursor_y = token[2:-1].split(';')
+        # Terminals treat 0 as 1.
+        self.cursor_x = max(0, int(cursor_x) - 1)
+        self.cursor_y = max(0, int(cursor_y) - 1)
+
+    def __tab(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.cursor_x += TAB_WIDTH - self.cursor_x % TAB_WIDTH
+        if self.cursor_x >= self.width:
+            # Wrap.
+            self.cursor_x = 0
+            self.cursor_y += 1
+
+    def __erase(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        if self.__draw is not None and self.cursor_x < self.width:
+            self.__draw(self.cursor_x, self.cursor_y, ' ' * (self.width - self.cursor_x), self.style)
+
+    def __return_erase(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.cursor_x = 0
+        if self.__draw is not None and self.width > 0:
+            self.__draw(0, self.cursor_y, ' ' * self.width, self.style)
+
+    def __move_up(
+            self: 'Layout',
+            token: str,
+    ) -> None:
+        self.monotonic = False
+        self.cursor_y -= int(token[2:-1] or 1)
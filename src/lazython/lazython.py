@@ -1,12 +1,18 @@
 import os
+import sys
+import signal
+import asyncio
 import threading
+import contextlib
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from .box import Box
 from .tab import Tab
-from .renderer import Renderer
-from .listener import Listener
+from .renderer import Renderer, FrameStats
+from .listener import Listener, key_text
 from .shortcut import Shortcut
+from .keymap import Keymap
 
 
 class Lazython:
@@ -14,7 +20,9 @@ class Lazython:
 
     Methods:
         start(): Start the lazython.
+        run_async(): Run the lazython in the running event loop.
         new_tab(): Create a new tab.
+        batch(): Group mutations into a single frame.
         update(): Perform all necessary updates.
         render(): Render the lazython.
         is_renderable(): Check if the lazython is renderable.
@@ -27,14 +35,33 @@ class Lazython:
         previous_subtab(): Focus the previous subtab.
         scroll_up(): Scroll up in the tab content.
         scroll_down(): Scroll down in the tab content.
+        search_all(): Search the contents of all the tabs.
+        cancel_search(): Cancel the search of all the tabs.
+        stats(): Get the statistics of the last rendered frames.
+        toggle_stats(): Toggle the line of frame statistics.
+
+    Concurrency:
+        Tabs and lines can be mutated from any thread. Every mutation holds the renderer lock, and so
+        does the composition of a frame, so that a frame always shows a consistent state of the model.
+        The frame is sent to the terminal after the lock is released: a producer only waits for the
+        composition of the visible rows, never for the terminal. Key and click callbacks run in the
+        thread calling `start`, frames are rendered in a separate thread. With `run_async`, callbacks
+        and frames all run in the event loop. Mutations made in a `batch` context are rendered
+        together, in the next frame. `search_all` runs in a pool of worker threads, which add the
+        results like any producer.
     """
 
+    SEARCH_WORKERS = 4  # The number of threads searching the tabs.
+
     def __init__(
             self: 'Lazython',
             tabs_width: float = 0.4,
             tabs_min_width: int = 10,
             content_min_width: int = 10,
             refresh_delay: float = 0.1,
+            filter_key: int = None,
+            search_keys: tuple[int, int, int] = None,
+            search_all_key: int = None,
     ) -> None:
         """Initialize the lazython.
 
@@ -44,6 +71,13 @@ class Lazython:
             tabs_min_width (int, optional): The minimum width of the tabs. Defaults to 10.
             content_min_width (int, optional): The minimum width of the content. Defaults to 10.
             refresh_delay (float, optional): The refresh delay. Defaults to 0.1.
+            filter_key (int, optional): The key starting to type the filter query of the selected tab, e.g. 47 for `/`.
+                Defaults to None means no key, `Tab.start_filter` can still be bound with `add_key`.
+            search_keys (tuple[int, int, int], optional): The keys starting to type the query searched in the content,
+                jumping to the next hit and jumping to the previous hit, e.g. (6, 14, 16) for `ctrl` + `f`, `n` and `p`.
+                Defaults to None means no keys, see `Tab.start_search`, `Tab.next_match` and `Tab.previous_match`.
+            search_all_key (int, optional): The key starting to type the query searched in all the tabs, e.g. 7 for
+                `ctrl` + `g`. Defaults to None means no key, see `search_all`.
         """
         # TODO: Check if the arguments are valid.
         if tabs_min_width < 4:
@@ -72,34 +106,61 @@ class Lazython:
 
         self.__refresh_delay = refresh_delay
 
-        self.__shortcuts: list[Shortcut] = []
+        self.__loop: asyncio.AbstractEventLoop = None  # The event loop of `run_async`.
+        self.__stopped: asyncio.Future = None  # Resolved when the lazython run by `run_async` stops.
+
+        self.__builtin_keymap = Keymap()  # The keys of the lazython itself.
+        self.__option_keymap = Keymap()  # The opt-in keys of the lazython, overridden by the keys of the app.
+        self.__filter_key = filter_key
+        self.__search_keys = search_keys or (None, None, None)
+        self.__search_all_key = search_all_key
+        self.__keymap = Keymap()  # The keys added with `add_key`.
+        self.__chord: tuple[int, ...] = ()  # The keys of the chord being typed.
 
         self.__renderer = Renderer()
         self.__listener = Listener()
 
+        self.__frame_stats = FrameStats(budget=refresh_delay)
+        self.__display_stats = False  # Whether the line of frame statistics is displayed.
+
         self.__display_menu = False
         self.__menu_selected = 0
 
+        self.__search_pool: ThreadPoolExecutor = None  # Created by the first search of all the tabs.
+        self.__search_cancel = threading.Event()  # Set when the running search of all the tabs is cancelled.
+        self.__results_tab: Tab = None  # The tab of the results of `search_all`.
+        self.__search_results: dict['Line', tuple[Tab, 'Line', int]] = {}  # The tab, line and subtab of each result.
+        self.__search_query = ''
+        self.__global_input: str = None  # The query typed for `search_all`, None if not typing.
+
         self.__listener.add_key_callback(self.key_callback)
         self.__listener.add_click_callback(self.click_callback)
 
+        self.__add_builtin_keys()
+
     def main(
             self: 'Lazython',
     ) -> None:
         """The main function.
 
         This function will start the lazython and will block until the lazython is stopped.
+        A frame is only rendered when something changed, and at most once per refresh delay.
         """
-        last_time = time.time()
         while self.__running:
+            # Wait for something to render.
+            self.__renderer.dirty.wait()
+            if not self.__running:
+                break
+            self.__renderer.dirty.clear()
+
+            start_time = time.time()
             self.render()
 
-            # Wait for the next frame.
-            current_time = time.time()
-            delay = self.__refresh_delay - (current_time - last_time)
+            # Wait for the next frame, unless the terminal is resized.
+            delay = self.__refresh_delay - (time.time() - start_time)
             if delay > 0:
-                time.sleep(delay)
-            last_time = current_time
+                self.__renderer.resized.wait(delay)
+            self.__renderer.resized.clear()
 
     def start(
             self: 'Lazython',
@@ -116,16 +177,139 @@ class Lazython:
         threading.Thread(target=self.main).start()
         self.__listener.listen()
 
+    async def run_async(
+            self: 'Lazython',
+    ) -> None:
+        """Run the lazython in the running event loop, until it is stopped.
+
+        Unlike `start`, no thread is used: the input is read when stdin is readable, and frames are
+        rendered by callbacks of the loop, at most once per refresh delay. Coroutines of the same loop
+        can update the tabs directly.
+
+        Example:
+            async def main():
+                lazython = Lazython()
+                tab = lazython.new_tab(name='Tab')
+                asyncio.create_task(collect(tab))
+                await lazython.run_async()
+
+            asyncio.run(main())
+        """
+        if self.__running:
+            raise Exception('The lazython is already running.')
+
+        loop = asyncio.get_running_loop()
+        fd = sys.stdin.fileno()
+        render_handle: asyncio.Handle = None
+        flush_handle: asyncio.Handle = None
+        last_render = -self.__refresh_delay
+
+        def render() -> None:
+            nonlocal render_handle, last_render
+            render_handle = None
+            if not self.__running:
+                return
+            self.__renderer.dirty.clear()
+            self.__renderer.resized.clear()
+            last_render = loop.time()
+            self.render()
+
+        def schedule_render() -> None:
+            nonlocal render_handle
+            if render_handle is not None:
+                if not self.__renderer.resized.is_set():
+                    return
+                # Render a resized terminal without waiting.
+                render_handle.cancel()
+            delay = 0 if self.__renderer.resized.is_set() else last_render + self.__refresh_delay - loop.time()
+            render_handle = loop.call_later(max(0, delay), render)
+
+        def flush() -> None:
+            nonlocal flush_handle
+            flush_handle = None
+            self.__listener.flush()
+
+        def read() -> None:
+            nonlocal flush_handle
+            self.__listener.process(os.read(fd, Listener.READ_SIZE))
+
+            # Wait for the rest of a sequence, but not forever.
+            if flush_handle is not None:
+                flush_handle.cancel()
+                flush_handle = None
+            if self.__listener.has_pending():
+                flush_handle = loop.call_later(Listener.ESCAPE_TIMEOUT, flush)
+
+        def cancel_handles() -> None:
+            for handle in (render_handle, flush_handle):
+                if handle is not None:
+                    handle.cancel()
+
+        def reset() -> None:
+            self.__renderer.on_invalidate = None
+            self.__loop = None
+            self.__stopped = None
+
+        def stop() -> None:
+            if self.__running:
+                self.stop()
+
+        # Each step is undone on exit, in reverse order, only if it succeeded.
+        with contextlib.ExitStack() as stack:
+            self.__loop = loop
+            self.__stopped = loop.create_future()
+            self.__renderer.on_invalidate = lambda: loop.call_soon_threadsafe(schedule_render)
+            stack.callback(reset)
+            self.__listener.prepare()
+            stack.callback(self.__listener.terminate)
+            self.__running = True
+            stack.callback(stop)
+            stack.callback(cancel_handles)
+            loop.add_reader(fd, read)
+            stack.callback(loop.remove_reader, fd)
+            if threading.current_thread() is threading.main_thread():
+                loop.add_signal_handler(signal.SIGINT, self.__listener.interrupt)
+                stack.callback(loop.remove_signal_handler, signal.SIGINT)
+            self.__renderer.start()
+            await self.__stopped
+
     def stop(
             self: 'Lazython',
     ) -> None:
         """Stop the lazython."""
         if not self.__running:
             raise Exception('The lazython is not running.')
+        self.cancel_search()
         self.__listener.stop()
         self.__renderer.stop()
         self.__running = False
 
+        # Wake the render thread up.
+        self.__renderer.invalidate()
+
+        # Return from `run_async`.
+        if self.__stopped is not None:
+            stopped = self.__stopped
+            self.__loop.call_soon_threadsafe(lambda: stopped.done() or stopped.set_result(None))
+
+    def batch(
+            self: 'Lazython',
+    ) -> 'contextlib.AbstractContextManager':
+        """Group mutations into a single frame.
+
+        Inside the context, the model is locked for the render thread and nothing gets rendered.
+        The next frame shows all the mutations at once.
+
+        Example:
+            with lazython.batch():
+                for line, status in zip(lines, statuses):
+                    line.set_text(status)
+
+        Returns:
+            contextlib.AbstractContextManager: The batch context.
+        """
+        return self.__renderer.batch()
+
     def new_tab(
             self: 'Lazython',
             name: str = '',
@@ -144,10 +328,12 @@ class Lazython:
         Returns:
             Tab: The new tab.
         """
-        new_tab = Tab(name=name, subtabs=subtabs, height_weight=height_weight,
-                      min_height=min_height, renderer=self.__renderer)
-        self.__tabs.append(new_tab)
-        return new_tab
+        with self.__renderer.lock:
+            new_tab = Tab(name=name, subtabs=subtabs, height_weight=height_weight,
+                          min_height=min_height, renderer=self.__renderer)
+            self.__tabs.append(new_tab)
+            self.__renderer.invalidate()
+            return new_tab
 
     def key_callback(
             self: 'Lazython',
@@ -158,79 +344,375 @@ class Lazython:
         Args:
             key (int): The key code.
         """
-        # Quit when `ctrl` + `c` is pressed.
-        if key == 0:
-            self.stop()
+        # While a query is typed, its keys go to the query before any key binding, even the keys of the app.
+        if len(self.__chord) == 0 and self.__global_input is not None and self.__type_global_key(key):
+            # The key is typed in the query of `search_all`.
+            return
+        if len(self.__chord) == 0 and len(self.__tabs) > 0 and self.__tabs[self.__selected_tab].type_key(key):
+            # The key is typed in a query of the tab.
+            return
 
-        # Close when `esc` or `q` is pressed.
-        elif key == 27 or key == 113:
-            if self.__display_menu:
+        keys = self.__chord + (key,)
+        keymaps = self.__get_keymaps()
+        bound = any(len(keymap.get(keys)) > 0 for keymap in keymaps)
+        if not bound and any(keymap.is_prefix(keys) for keymap in keymaps):
+            # Wait for the rest of the chord.
+            self.__chord = keys
+            return
+        self.__chord = ()
+        if not bound and len(keys) > 1:
+            # The chord is broken, the key is taken on its own.
+            self.key_callback(key)
+            return
+
+        # Execute the built-in callbacks, and the opt-in ones unless the app binds the keys.
+        keymaps = self.__get_app_keymaps()
+        shortcuts = self.__builtin_keymap.get(keys)
+        if not any(len(keymap.get(keys)) > 0 for keymap in keymaps):
+            shortcuts = shortcuts + self.__option_keymap.get(keys)
+        for shortcut in shortcuts:
+            shortcut.callback()
+
+        # Execute the callbacks, then the callbacks of the tab selected by now.
+        keymaps = self.__get_app_keymaps()
+        for keymap in keymaps:
+            shortcuts = keymap.get(keys)
+            for shortcut in shortcuts:
+                shortcut.callback()
+            if len(shortcuts) > 0:
                 self.menu_quit()
-            else:
-                self.stop()
 
-        # Focus next tab when `tab` is pressed.
-        elif key == 9:
-            self.next_tab()
+    def __add_builtin_keys(
+            self: 'Lazython',
+    ) -> None:
+        """Bind the keys of the lazython itself."""
+        builtin_keys = [
+            (0, self.stop),  # Quit when `ctrl` + `c` is pressed.
+            (27, self.__close),  # Close when `esc` is pressed.
+            (113, self.__close),  # Close when `q` is pressed.
+            (9, self.next_tab),  # Focus next tab when `tab` is pressed.
+            (5921563, self.previous_tab),  # Focus previous tab when `shift` + `tab` is pressed.
+            (4348699, self.__down),  # Focus next line when `down` is pressed.
+            (4283163, self.__up),  # Focus previous line when `up` is pressed.
+            (4414235, self.next_subtab),  # Focus next subtab when `right` is pressed.
+            (4479771, self.previous_subtab),  # Focus previous subtab when `left` is pressed.
+            (2117425947, self.scroll_up),  # Scroll up when `page up` is pressed.
+            (2117491483, self.scroll_down),  # Scroll down when `page down` is pressed.
+            (120, self.menu_toggle),  # Toggle menu when `x` is pressed.
+            (10, self.__enter),  # Execute menu item when `enter` is pressed.
+        ]
+        for key, callback in builtin_keys:
+            self.__builtin_keymap.add(Shortcut(key=key, callback=callback))
+
+        option_keys = [
+            (self.__filter_key, self.__filter, 'Filter'),  # Filter the lines of the tab.
+            (self.__search_keys[0], self.__search, 'Search'),  # Search the content.
+            (self.__search_keys[1], self.__next_match, 'Next match'),  # Jump to the next hit of the search.
+            (self.__search_keys[2], self.__previous_match, 'Previous match'),  # Jump to the previous hit of the search.
+            (self.__search_all_key, self.__search_all, 'Search all'),  # Search all the tabs.
+        ]
+        for key, callback, help in option_keys:
+            if key is not None:
+                self.__option_keymap.add(Shortcut(key=key, callback=callback, name=Lazython.__get_key_name(key), help=help))
+
+    @staticmethod
+    def __get_key_name(
+            key: int,
+    ) -> str:
+        """Get the name of a key, as displayed in the footer.
 
-        # Focus previous tab when `shift` + `tab` is pressed.
-        elif key == 5921563:
-            self.previous_tab()
+        Args:
+            key (int): The key code.
 
-        # Focus next line when `down` is pressed.
-        elif key == 4348699:
-            if self.__display_menu:
-                self.menu_next()
-            else:
-                self.next_line()
+        Returns:
+            str: The name.
+        """
+        if 0 < key <= 26 and key not in (9, 10, 13):
+            return f'Ctrl+{chr(key + 64)}'
+        text = key_text(key)
+        return text if text is not None else str(key)
+
+    def __get_keymaps(
+            self: 'Lazython',
+    ) -> list['Keymap']:
+        """Get the keymaps to look the keys up in.
+
+        Returns:
+            list[Keymap]: The built-in keymaps, the keymap of `add_key` and the keymap of the selected tab.
+        """
+        return [self.__builtin_keymap, self.__option_keymap] + self.__get_app_keymaps()
+
+    def __get_app_keymaps(
+            self: 'Lazython',
+    ) -> list['Keymap']:
+        """Get the keymaps of the app.
+
+        Returns:
+            list[Keymap]: The keymap of `add_key` and the keymap of the selected tab.
+        """
+        keymaps = [self.__keymap]
+        if len(self.__tabs) > 0:
+            keymaps.append(self.__tabs[self.__selected_tab].get_keymap())
+        return keymaps
+
+    def __is_app_key(
+            self: 'Lazython',
+            key: int,
+    ) -> bool:
+        """Check if the app binds a key, on its own or as the start of a chord.
+
+        Args:
+            key (int): The key code.
+
+        Returns:
+            bool: True if the key is bound with `add_key` or on the selected tab.
+        """
+        return any(len(keymap.get((key,))) > 0 or keymap.is_prefix((key,)) for keymap in self.__get_app_keymaps())
+
+    def __close(
+            self: 'Lazython',
+    ) -> None:
+        """Close the menu if displayed, else stop the lazython."""
+        if self.__display_menu:
+            self.menu_quit()
+        else:
+            self.stop()
+
+    def __down(
+            self: 'Lazython',
+    ) -> None:
+        """Select the next menu item if the menu is displayed, else focus the next line."""
+        if self.__display_menu:
+            self.menu_next()
+        else:
+            self.next_line()
+
+    def __up(
+            self: 'Lazython',
+    ) -> None:
+        """Select the previous menu item if the menu is displayed, else focus the previous line."""
+        if self.__display_menu:
+            self.menu_previous()
+        else:
+            self.previous_line()
+
+    def __enter(
+            self: 'Lazython',
+    ) -> None:
+        """Execute the selected menu item if the menu is displayed, else open the selected search result,
+        unless the app binds `enter`."""
+        if self.__display_menu:
+            self.menu_execute()
+            self.menu_quit()
+        elif not self.__is_app_key(10):
+            self.__open_result()
+
+    def __filter(
+            self: 'Lazython',
+    ) -> None:
+        """Start typing the filter query of the selected tab, if the menu is not displayed."""
+        if not self.__display_menu and len(self.__tabs) > 0:
+            self.__tabs[self.__selected_tab].start_filter()
+
+    def __search(
+            self: 'Lazython',
+    ) -> None:
+        """Start typing the query searched in the content, if the menu is not displayed."""
+        if not self.__display_menu and len(self.__tabs) > 0:
+            self.__tabs[self.__selected_tab].start_search()
+
+    def __next_match(
+            self: 'Lazython',
+    ) -> None:
+        """Jump to the next hit of the search in the content."""
+        if len(self.__tabs) > 0:
+            self.__tabs[self.__selected_tab].next_match()
 
-        # Focus previous line when `up` is pressed.
-        elif key == 4283163:
+    def __previous_match(
+            self: 'Lazython',
+    ) -> None:
+        """Jump to the previous hit of the search in the content."""
+        if len(self.__tabs) > 0:
+            self.__tabs[self.__selected_tab].previous_match()
+
+    def __search_all(
+            self: 'Lazython',
+    ) -> None:
+        """Start typing the query searched in all the tabs, if the menu is not displayed."""
+        with self.__renderer.lock:
             if self.__display_menu:
-                self.menu_previous()
+                return
+            self.__global_input = ''
+            self.__select_tab(self.__get_results_tab())
+            self.__renderer.invalidate()
+
+    def __type_global_key(
+            self: 'Lazython',
+            key: int,
+    ) -> bool:
+        """Type a key in the query of `search_all`.
+
+        Each change of the query starts a new search. `enter` stops typing, `esc` also cancels the search.
+
+        Args:
+            key (int): The key code.
+
+        Returns:
+            bool: True if the key was typed, False if it is not a key of the query.
+        """
+        with self.__renderer.lock:
+            if key in (10, 27):
+                if key == 27:
+                    self.cancel_search()
+                self.__global_input = None
+            elif key in (8, 127):
+                self.__global_input = self.__global_input[:-1]
+                self.search_all(self.__global_input)
             else:
-                self.previous_line()
+                text = key_text(key)
+                if text is None:
+                    return False
+                self.__global_input += text
+                self.search_all(self.__global_input)
+            self.__renderer.invalidate()
+            return True
+
+    def search_all(
+            self: 'Lazython',
+            query: str,
+    ) -> 'Tab':
+        """Search the contents of all the tabs, ignoring case.
+
+        The subtexts are searched by a pool of threads, while the results are added to a tab of search results,
+        one line per subtext holding the query. The search of the previous query is cancelled.
+
+        Args:
+            query (str): The query. An empty query only clears the results.
 
-        # Focus next subtab when `right` is pressed.
-        elif key == 4414235:
-            self.next_subtab()
+        Returns:
+            Tab: The tab of the search results.
+        """
+        with self.__renderer.lock:
+            self.cancel_search()
+            results_tab = self.__get_results_tab()
+            results_tab.clear_lines()
+            self.__search_results = {}
+            self.__search_query = query
+            if not query:
+                return results_tab
+
+            cancel = threading.Event()
+            self.__search_cancel = cancel
+            if self.__search_pool is None:
+                self.__search_pool = ThreadPoolExecutor(max_workers=Lazython.SEARCH_WORKERS,
+                                                        thread_name_prefix='lazython-search')
+            for tab in self.__tabs:
+                if tab is not results_tab:
+                    self.__search_pool.submit(self.__search_tab, tab, query, cancel)
+            return results_tab
+
+    def cancel_search(
+            self: 'Lazython',
+    ) -> None:
+        """Cancel the search of all the tabs. The results found so far are kept."""
+        self.__search_cancel.set()
 
-        # Focus previous subtab when `left` is pressed.
-        elif key == 4479771:
-            self.previous_subtab()
+    def __search_tab(
+            self: 'Lazython',
+            tab: 'Tab',
+            query: str,
+            cancel: threading.Event,
+    ) -> None:
+        """Search the contents of a tab, in a thread of the pool.
 
-        # Scroll up when `page up` is pressed.
-        elif key == 2117425947:
-            self.scroll_up()
+        Args:
+            tab (Tab): The tab.
+            query (str): The query.
+            cancel (threading.Event): Set when the search is cancelled.
+        """
+        if cancel.is_set():
+            return
+        for line, subtab, search in tab.prepare_search(query):
+            if cancel.is_set():
+                return
+            hits = search(cancel)
+            if len(hits) == 0:
+                continue
+            with self.__renderer.lock:
+                # The results tab may have been cleared for another query meanwhile.
+                if cancel.is_set():
+                    return
+                subtabs = tab.get_subtabs()
+                subtab_name = subtabs[subtab] if subtab < len(subtabs) else str(subtab)
+                result = self.__results_tab.add_line(
+                    f'{tab.get_name()} › {line.get_text()} › {subtab_name}',
+                    [f'{len(hits)} hit{"s" if len(hits) > 1 else ""} of {query!r}.\nPress enter to open.'],
+                )
+                self.__search_results[result] = (tab, line, subtab)
+
+    def __get_results_tab(
+            self: 'Lazython',
+    ) -> 'Tab':
+        """Get the tab of the search results, creating it if needed.
 
-        # Scroll down when `page down` is pressed.
-        elif key == 2117491483:
-            self.scroll_down()
+        Returns:
+            Tab: The tab.
+        """
+        with self.__renderer.lock:
+            if self.__results_tab is None or self.__results_tab not in self.__tabs:
+                self.__results_tab = self.new_tab(name='Search', subtabs=['Hits'])
+            return self.__results_tab
 
-        # Toggle menu when `x` is pressed.
-        elif key == 120:
-            self.menu_toggle()
+    def __open_result(
+            self: 'Lazython',
+    ) -> None:
+        """Select the line and the subtab of the selected search result, and search its content."""
+        with self.__renderer.lock:
+            if len(self.__tabs) == 0 or self.__tabs[self.__selected_tab] is not self.__results_tab:
+                return
+            result = self.__search_results.get(self.__results_tab.get_selected_line())
+            if result is None:
+                return
+            tab, line, subtab = result
+            if tab not in self.__tabs:
+                return
+            try:
+                tab.show_line(line)
+            except ValueError:
+                # The line was deleted since.
+                return
+            self.__select_tab(tab)
+            tab.select_subtab(subtab)
+            tab.set_search(self.__search_query)
+            tab.next_match()
+
+    def __select_tab(
+            self: 'Lazython',
+            tab: 'Tab',
+    ) -> None:
+        """Focus a tab.
 
-        # Execute menu item when `enter` is pressed.
-        elif key == 10:
-            if self.__display_menu:
-                self.menu_execute()
-                self.menu_quit()
+        Args:
+            tab (Tab): The tab.
+        """
+        with self.__renderer.lock:
+            previous_tab = self.__tabs[self.__selected_tab]
+            self.__selected_tab = self.__tabs.index(tab)
+            previous_tab.unselect()
+            tab.select()
 
-        # Execute the callbacks.
-        callbacks = [shortcut.callback for shortcut in self.__shortcuts if shortcut.key == key]
-        for callback in callbacks:
-            callback()
-        if len(callbacks) > 0:
-            self.menu_quit()
+    def __get_menu_shortcuts(
+            self: 'Lazython',
+    ) -> list['Shortcut']:
+        """Get the shortcuts displayed in the menu.
 
-        # Execute tab callbacks.
+        Returns:
+            list[Shortcut]: The shortcuts of `add_key`, then the shortcuts of the selected tab.
+        """
+        shortcuts = self.__keymap.get_displayable()
         if len(self.__tabs) > 0:
-            callbacks = self.__tabs[self.__selected_tab].get_key_callbacks(key)
-            for callback in callbacks:
-                callback()
-            if len(callbacks) > 0:
-                self.menu_quit()
+            shortcuts = shortcuts + self.__tabs[self.__selected_tab].get_keymap().get_displayable()
+        return shortcuts
 
     def menu_toggle(
             self: 'Lazython',
@@ -245,50 +727,57 @@ class Lazython:
             self: 'Lazython',
     ) -> None:
         """Select the next menu item."""
-        self.__menu_selected += 1
-        shorcuts = [shortcut for shortcut in self.__shortcuts if shortcut.displayable()] + \
-            [shortcut for shortcut in self.__tabs[self.__selected_tab].get_shortcuts() if shortcut.displayable()]
-        if self.__menu_selected >= len(shorcuts):
-            self.__menu_selected = len(shorcuts) - 1
+        with self.__renderer.lock:
+            self.__menu_selected += 1
+            shortcuts = self.__get_menu_shortcuts()
+            if self.__menu_selected >= len(shortcuts):
+                self.__menu_selected = len(shortcuts) - 1
+            self.__renderer.invalidate()
 
     def menu_previous(
             self: 'Lazython',
     ) -> None:
         """Select the previous menu item."""
-        self.__menu_selected -= 1
-        if self.__menu_selected < 0:
-            self.__menu_selected = 0
+        with self.__renderer.lock:
+            self.__menu_selected -= 1
+            if self.__menu_selected < 0:
+                self.__menu_selected = 0
+            self.__renderer.invalidate()
 
     def menu_open(
             self: 'Lazython',
     ) -> None:
         """Open the menu."""
-        self.__display_menu = True
-        self.__menu_selected = 0
+        with self.__renderer.lock:
+            self.__display_menu = True
+            self.__menu_selected = 0
+            self.__renderer.invalidate()
 
     def menu_quit(
             self: 'Lazython',
     ) -> None:
         """Quit the menu."""
-        self.__display_menu = False
-        self.__menu_selected = 0
+        with self.__renderer.lock:
+            if not self.__display_menu:
+                return
+            self.__display_menu = False
+            self.__menu_selected = 0
+            self.__renderer.invalidate()
 
     def menu_execute(
             self: 'Lazython',
     ) -> None:
         """Execute the selected menu item."""
-        if self.__menu_selected < len(self.__shortcuts):
-            self.__shortcuts[self.__menu_selected].callback()
-        else:
-            self.__tabs[self.__selected_tab].get_shortcuts()[self.__menu_selected - len(self.__shortcuts)].callback()
+        shortcuts = self.__get_menu_shortcuts()
+        if 0 <= self.__menu_selected < len(shortcuts):
+            shortcuts[self.__menu_selected].callback()
 
     def __render_menu(
             self: 'Lazython',
     ) -> None:
         """Render the menu."""
         # Get the menu size.
-        shortcuts = [shortcut for shortcut in self.__shortcuts if shortcut.displayable()] + \
-            [shortcut for shortcut in self.__tabs[self.__selected_tab].get_shortcuts() if shortcut.displayable()]
+        shortcuts = self.__get_menu_shortcuts()
         menu_width = max([len(shortcut.name) for shortcut in shortcuts])
         menu_width += max([len(shortcut.help) for shortcut in shortcuts])
         menu_width += len(sep := ' : ')
@@ -348,46 +837,47 @@ class Lazython:
             x (int): The x.
             y (int): The y.
         """
-        if len(self.__tabs) == 0:
-            return
-
-        if key == 0:
-            # Left click.
-            if x < self.__tabs_box.get_width():
-                # Tab click.
-                current_y = 0
-                for i, tab in enumerate(self.__tabs):
-                    if current_y <= y < current_y + tab.get_tab_height():
-                        # Select the tab.
-                        self.__tabs[self.__selected_tab].unselect()
-                        self.__selected_tab = i
-                        self.__tabs[self.__selected_tab].select()
-
-                        # Select the line.
-                        line = y - current_y - 1
-                        if line < 0:
-                            break
-                        if line >= self.__tabs[self.__selected_tab].get_nb_lines():
+        with self.__renderer.lock:
+            if len(self.__tabs) == 0:
+                return
+
+            if key == 0:
+                # Left click.
+                if x < self.__tabs_box.get_width():
+                    # Tab click.
+                    current_y = 0
+                    for i, tab in enumerate(self.__tabs):
+                        if current_y <= y < current_y + tab.get_tab_height():
+                            # Select the tab.
+                            self.__tabs[self.__selected_tab].unselect()
+                            self.__selected_tab = i
+                            self.__tabs[self.__selected_tab].select()
+
+                            # Select the line.
+                            line = y - current_y - 1
+                            if line < 0:
+                                break
+                            if line >= self.__tabs[self.__selected_tab].get_nb_lines():
+                                break
+
+                            self.__tabs[self.__selected_tab].select_line(line)
                             break
+                        current_y += tab.get_tab_height() if tab.get_tab_height() > 0 else 1
+                else:
+                    # Content click.
+                    # TODO: Select the subtab.
+                    pass
 
-                        self.__tabs[self.__selected_tab].select_line(line)
-                        break
-                    current_y += tab.get_tab_height() if tab.get_tab_height() > 0 else 1
-            else:
-                # Content click.
-                # TODO: Select the subtab.
-                pass
-
-        elif key == 64:
-            # Scroll up.
-            self.scroll_up()
-        elif key == 65:
-            # Scroll down.
-            self.scroll_down()
+            elif key == 64:
+                # Scroll up.
+                self.scroll_up()
+            elif key == 65:
+                # Scroll down.
+                self.scroll_down()
 
     def add_key(
             self: 'Lazython',
-            key: int,
+            key: int | tuple[int, ...],
             callback: 'function',
             name: str = None,
             help: str = None,
@@ -395,12 +885,14 @@ class Lazython:
         """Add a key shortcut.
 
         Args:
-            key (int): The key.
+            key (int | tuple[int, ...]): The key, or the chord of keys pressed one after the other.
             callback (function): The callback.
             name (str): The name. Defaults to None means no display in the menu.
             help (str): The help. Defaults to None means no display in the menu.
         """
-        self.__shortcuts.append(Shortcut(key=key, callback=callback, name=name, help=help))
+        with self.__renderer.lock:
+            self.__keymap.add(Shortcut(key=key, callback=callback, name=name, help=help))
+            self.__renderer.invalidate()
 
     def update(
             self: 'Lazython',
@@ -414,35 +906,93 @@ class Lazython:
     def render(
             self: 'Lazython',
     ) -> None:
-        """Render the lazython."""
+        """Render the lazython.
+
+        The frame is composed while holding the model lock, then sent to the terminal without it.
+        The time of each phase is recorded in the frame statistics, see `stats`.
+        """
+        addstr_calls = self.__renderer.addstr_calls
+        with self.__renderer.lock:
+            times = self.__compose()
+        start_time = time.perf_counter()
+        written = self.__renderer.refresh()
+        times.append(time.perf_counter() - start_time)
+        self.__frame_stats.record(tuple(times), self.__renderer.addstr_calls - addstr_calls, written)
+
+    def stats(
+            self: 'Lazython',
+    ) -> dict:
+        """Get the statistics of the last rendered frames.
+
+        The times are in seconds: `layout` sizes the boxes and clears the screen, `tabs` renders the tab list,
+        `content` renders the content, the menu and the footer, `flush` sends the frame to the terminal. A frame
+        taking longer than the refresh delay counts the frames it skipped.
+
+        Example:
+            stats = lazython.stats()
+            print(stats['total']['p99'], stats['bytes']['p50'], stats['skipped'])
+
+        Returns:
+            dict: The statistics, see `FrameStats.info`.
+        """
+        return self.__frame_stats.info()
+
+    def toggle_stats(
+            self: 'Lazython',
+    ) -> None:
+        """Toggle the line of frame statistics, displayed over the top of the screen.
+
+        No key is bound to it, the app can bind it with `add_key` while debugging.
+        """
+        with self.__renderer.lock:
+            self.__display_stats = not self.__display_stats
+            self.__renderer.invalidate()
+
+    def __compose(
+            self: 'Lazython',
+    ) -> list[float]:
+        """Draw the frame in the renderer.
+
+        Returns:
+            list[float]: The layout, tabs and content times.
+        """
+        start_time = time.perf_counter()
         self.update()
 
         self.__renderer.clear()
+        times = [time.perf_counter() - start_time]
+        start_time = time.perf_counter()
 
         if len(self.__tabs) == 0:
             self.__renderer.addstr('No tab.')
-            self.__render_footer()
-            self.__renderer.refresh()
-            return
-
-        if not self.is_renderable():
+            times.append(0.0)
+        elif not self.is_renderable():
             self.__renderer.addstr('Terminal too small.')
-            self.__render_footer()
-            self.__renderer.refresh()
-            return
-
-        for tab in self.__tabs:
-            tab.render_tab()
+            times.append(0.0)
+        else:
+            for tab in self.__tabs:
+                tab.render_tab()
+            times.append(time.perf_counter() - start_time)
+            start_time = time.perf_counter()
 
-        tab = self.__tabs[self.__selected_tab]
-        tab.render_content()
+            tab = self.__tabs[self.__selected_tab]
+            tab.render_content()
 
-        if self.__display_menu:
-            self.__render_menu()
+            if self.__display_menu:
+                self.__render_menu()
 
         self.__render_footer()
+        if self.__display_stats:
+            self.__render_stats()
+        times.append(time.perf_counter() - start_time)
+        return times
 
-        self.__renderer.refresh()
+    def __render_stats(
+            self: 'Lazython',
+    ) -> None:
+        """Render the line of frame statistics, aligned right on the first row."""
+        text = self.__frame_stats.summary()[-self.__width:]
+        self.__renderer.addstr('\x1b[7m' + text + '\x1b[0m', x=self.__width - len(text), y=0, height=1)
 
     def is_renderable(
             self: 'Lazython',
@@ -476,31 +1026,33 @@ class Lazython:
             self: 'Lazython',
     ) -> None:
         """Focus the next tab."""
-        if len(self.__tabs) == 0:
-            return
-        previous_tab = self.__tabs[self.__selected_tab]
-        self.__selected_tab += 1
-        self.__selected_tab %= len(self.__tabs)
-
-        # Update the selected tab.
-        current_tab = self.__tabs[self.__selected_tab]
-        previous_tab.unselect()
-        current_tab.select()
+        with self.__renderer.lock:
+            if len(self.__tabs) == 0:
+                return
+            previous_tab = self.__tabs[self.__selected_tab]
+            self.__selected_tab += 1
+            self.__selected_tab %= len(self.__tabs)
+
+            # Update the selected tab.
+            current_tab = self.__tabs[self.__selected_tab]
+            previous_tab.unselect()
+            current_tab.select()
 
     def previous_tab(
             self: 'Lazython',
     ) -> None:
         """Focus the previous tab."""
-        if len(self.__tabs) == 0:
-            return
-        previous_tab = self.__tabs[self.__selected_tab]
-        self.__selected_tab -= 1
-        self.__selected_tab %= len(self.__tabs)
-
-        # Update the selected tab.
-        current_tab = self.__tabs[self.__selected_tab]
-        previous_tab.unselect()
-        current_tab.select()
+        with self.__renderer.lock:
+            if len(self.__tabs) == 0:
+                return
+            previous_tab = self.__tabs[self.__selected_tab]
+            self.__selected_tab -= 1
+            self.__selected_tab %= len(self.__tabs)
+
+            # Update the selected tab.
+            current_tab = self.__tabs[self.__selected_tab]
+            previous_tab.unselect()
+            current_tab.select()
 
     def next_line(
             self: 'Lazython',
@@ -542,7 +1094,7 @@ class Lazython:
             self: 'Lazython',
     ) -> None:
         # Get the terminal size.
-        size = os.get_terminal_size()
+        size = self.__renderer.get_terminal_size()
         self.__width = size.columns
         self.__height = size.lines
 
@@ -628,5 +1180,9 @@ class Lazython:
     def __render_footer(
             self: 'Lazython',
     ) -> None:
-        text = 'Tab/Shift+Tab: Switch tab | ↑ ↓: Switch line | ← →: Switch subtab | x: Menu | q: Quit'
+        if self.__global_input is not None:
+            text = f'Search all tabs: {self.__global_input}_'
+        else:
+            options = ''.join(f'{shortcut.name}: {shortcut.help} | ' for shortcut in self.__option_keymap.get_displayable())
+            text = f'Tab/Shift+Tab: Switch tab | ↑ ↓: Switch line | ← →: Switch subtab | {options}x: Menu | q: Quit'
         self.__renderer.addstr(text[:self.__width], x=0, y=self.__height - 1)
@@ -1,24 +1,80 @@
+import threading
+from typing import Sequence
+
+from .renderer import Renderer
+from .subtext import Subtext, prepare_search
+from .filesubtext import FileSubtext
+from .linestore import LineStore
 
 
 class Line:
     """The line class.
 
-    Not that useful, but to stay organized.
+    A line is a handle on a row of a `LineStore`, which holds the data of all the lines of a tab.
+    Handles are cheap to create, and two handles on the same line are equal. Once the line is
+    deleted from its tab, the getters of its handles return default values and the setters do nothing.
     """
 
-    __ID: int = 0
+    __slots__ = ('__store', '__id')
 
     def __init__(
             self: 'Line',
             text: str = '',
             subtexts: list[str] = [],
+            renderer: 'Renderer' = None,
     ) -> None:
-        self.__text = text
-        self.__subtexts = subtexts
-        self.__scroll = [-1 for _ in range(len(subtexts))]
+        self.__store = LineStore(renderer=renderer)
+        self.__id = self.__store.add(text, subtexts)
+
+    @staticmethod
+    def from_store(
+            store: 'LineStore',
+            id: int,
+    ) -> 'Line':
+        """Get a handle on a line of a store.
+
+        Args:
+            store (LineStore): The store.
+            id (int): The line id.
+
+        Returns:
+            Line: The line.
+        """
+        line = object.__new__(Line)
+        line.__store = store
+        line.__id = id
+        return line
+
+    def __eq__(
+            self: 'Line',
+            other: object,
+    ) -> bool:
+        return isinstance(other, Line) and self.__store is other.__store and self.__id == other.__id
+
+    def __hash__(
+            self: 'Line',
+    ) -> int:
+        return hash((id(self.__store), self.__id))
+
+    def get_id(
+            self: 'Line',
+    ) -> int:
+        """Get the id.
+
+        Returns:
+            int: The id, unique among the lines of its store.
+        """
+        return self.__id
+
+    def get_store(
+            self: 'Line',
+    ) -> 'LineStore':
+        """Get the store holding the line.
 
-        self.__id = Line.__ID
-        Line.__ID += 1
+        Returns:
+            LineStore: The store.
+        """
+        return self.__store
 
     def get_text(
             self: 'Line',
@@ -28,7 +84,8 @@ class Line:
         Returns:
             str: The text.
         """
-        return self.__text
+        slot = self.__store.get_slot(self.__id)
+        return self.__store.texts[slot] if slot is not None else ''
 
     def set_text(
             self: 'Line',
@@ -39,7 +96,15 @@ class Line:
         Args:
             text (str): The text.
         """
-        self.__text = text
+        with self.__get_lock():
+            slot = self.__store.get_slot(self.__id)
+            if slot is None or text == self.__store.texts[slot]:
+                return
+            old_text = self.__store.texts[slot]
+            self.__store.texts[slot] = text
+            if self.__store.on_set_text is not None:
+                self.__store.on_set_text(self.__id, old_text, text)
+            self.__invalidate()
 
     def get_subtext(
             self: 'Line',
@@ -53,7 +118,12 @@ class Line:
         Returns:
             str: The subtext at the specified subtab.
         """
-        return self.__subtexts[subtab] if subtab < len(self.__subtexts) else ''
+        with self.__get_lock():
+            subtexts = self.__get_subtexts()
+            if subtab >= len(subtexts):
+                return ''
+            subtext = subtexts[subtab]
+            return subtext if isinstance(subtext, str) else subtext.get_text()
 
     def set_subtext(
             self: 'Line',
@@ -62,15 +132,370 @@ class Line:
     ) -> None:
         """Set the subtext at the specified subtab.
 
+        It replaces the provider of the subtab, if any.
+
         Args:
             subtab (int): The subtab.
             subtext (str): The subtext.
         """
-        if subtab < len(self.__subtexts):
-            self.__subtexts[subtab] = subtext
+        with self.__get_lock():
+            self.__remove_provider(subtab)
+            self.__set_subtext(subtab, subtext)
+
+    def __set_subtext(
+            self: 'Line',
+            subtab: int,
+            subtext: str,
+    ) -> None:
+        slot = self.__store.get_slot(self.__id)
+        if slot is None:
+            return
+        subtexts = self.__store.subtexts.setdefault(slot, [])
+        if subtab < len(subtexts):
+            if isinstance(subtexts[subtab], FileSubtext):
+                subtexts[subtab].close()
+            elif isinstance(subtexts[subtab], str) and subtext == subtexts[subtab]:
+                # An indexed subtext is not joined to be compared, it is replaced.
+                return
+            subtexts[subtab] = subtext
         else:
-            self.__subtexts += [''] * (subtab - len(self.__subtexts)) + [subtext]
-            self.__scroll += [-1] * (subtab - len(self.__scroll) + 1)
+            subtexts += [''] * (subtab - len(subtexts)) + [subtext]
+        self.__invalidate()
+
+    def set_subtext_file(
+            self: 'Line',
+            subtab: int,
+            path: str,
+            encoding: str = 'utf-8',
+    ) -> None:
+        """Display a file as the subtext at the specified subtab.
+
+        The file is not read into memory: only the lines displayed are read, and the display follows
+        the file as it grows. Each line of the file takes a single row.
+
+        Args:
+            subtab (int): The subtab.
+            path (str): The path of the file.
+            encoding (str, optional): The encoding of the file. Defaults to 'utf-8'.
+        """
+        renderer = self.__store.renderer
+        subtext = FileSubtext(path, encoding=encoding, on_change=renderer.invalidate if renderer is not None else None)
+        with self.__get_lock():
+            if self.__store.get_slot(self.__id) is None:
+                subtext.close()
+                return
+            self.__remove_provider(subtab)
+            self.__set_subtext(subtab, subtext)
+
+    def set_subtext_provider(
+            self: 'Line',
+            subtab: int,
+            provider: 'function[[], str]',
+    ) -> None:
+        """Set a function computing the subtext at the specified subtab.
+
+        The provider is only called when the subtext is displayed, in a separate thread. Its result is
+        kept as the subtext until `refresh_subtext` is called. In the meantime, the subtext is empty.
+
+        Args:
+            subtab (int): The subtab.
+            provider (function[[], str]): The provider.
+        """
+        with self.__get_lock():
+            slot = self.__store.get_slot(self.__id)
+            if slot is None:
+                return
+            if subtab >= self.get_nb_subtext():
+                self.__set_subtext(subtab, '')
+            self.__store.providers.setdefault(slot, {})[subtab] = provider
+            self.__store.loads.pop((slot, subtab), None)
+            self.__store.outdated.add((slot, subtab))
+            self.__invalidate()
+
+    def refresh_subtext(
+            self: 'Line',
+            subtab: int,
+    ) -> None:
+        """Call the provider of the subtext at the specified subtab again, the next time it is displayed.
+
+        The current subtext is displayed until the provider returns.
+
+        Args:
+            subtab (int): The subtab.
+        """
+        with self.__get_lock():
+            slot = self.__store.get_slot(self.__id)
+            if slot is None or subtab not in self.__store.providers.get(slot, {}):
+                return
+            self.__store.loads.pop((slot, subtab), None)
+            self.__store.outdated.add((slot, subtab))
+            self.__invalidate()
+
+    def __remove_provider(
+            self: 'Line',
+            subtab: int,
+    ) -> None:
+        slot = self.__store.get_slot(self.__id)
+        providers = self.__store.providers.get(slot)
+        if providers is None or subtab not in providers:
+            return
+        del providers[subtab]
+        if len(providers) == 0:
+            del self.__store.providers[slot]
+        self.__store.loads.pop((slot, subtab), None)
+        self.__store.outdated.discard((slot, subtab))
+
+    def __load(
+            self: 'Line',
+            subtab: int,
+    ) -> None:
+        """Start the provider of a displayed subtext, if it is outdated."""
+        slot = self.__store.get_slot(self.__id)
+        key = (slot, subtab)
+        if key not in self.__store.outdated or key in self.__store.loads:
+            return
+        self.__store.outdated.discard(key)
+        token = self.__store.loads[key] = object()
+        provider = self.__store.providers[slot][subtab]
+        threading.Thread(target=self.__run_provider, args=(subtab, provider, token), daemon=True).start()
+
+    def __run_provider(
+            self: 'Line',
+            subtab: int,
+            provider: 'function[[], str]',
+            token: object,
+    ) -> None:
+        try:
+            subtext = provider()
+        except Exception as error:
+            subtext = f'{type(error).__name__}: {error}'
+
+        with self.__get_lock():
+            # The result is dropped if the line was deleted, or the provider replaced or refreshed since.
+            slot = self.__store.get_slot(self.__id)
+            if slot is None or self.__store.loads.get((slot, subtab)) is not token:
+                return
+            del self.__store.loads[(slot, subtab)]
+            self.__set_subtext(subtab, subtext)
+
+    def append_subtext(
+            self: 'Line',
+            subtab: int,
+            chunk: str,
+    ) -> None:
+        """Append a chunk of text to the subtext at the specified subtab.
+
+        Unlike `set_subtext(subtab, get_subtext(subtab) + chunk)`, it does not copy the subtext,
+        and the subtext line count is updated in time proportional to the chunk.
+
+        Args:
+            subtab (int): The subtab.
+            chunk (str): The chunk.
+        """
+        with self.__get_lock():
+            if not chunk:
+                return
+            if subtab >= len(self.__get_subtexts()):
+                self.set_subtext(subtab, '')
+            subtexts = self.__get_subtexts()
+            if subtab >= len(subtexts):
+                return
+            subtext = subtexts[subtab]
+            if isinstance(subtext, FileSubtext):
+                raise ValueError('The subtext is displayed from a file.')
+            if isinstance(subtext, str):
+                subtext = subtexts[subtab] = Subtext(subtext)
+            self.__shift_scroll(subtab, subtext.append(chunk))
+            self.__invalidate()
+
+    def set_subtext_limit(
+            self: 'Line',
+            subtab: int,
+            max_lines: int = None,
+            max_chars: int = None,
+    ) -> None:
+        """Bound the subtext at the specified subtab, until it is set again.
+
+        Once the subtext exceeds a limit, its oldest lines are dropped as chunks are appended with
+        `append_subtext`, so that a subtext streaming a log keeps a bounded size. The scroll follows
+        the rows it displays.
+
+        Args:
+            subtab (int): The subtab.
+            max_lines (int, optional): The maximum number of lines. Defaults to None means no limit.
+            max_chars (int, optional): The maximum number of chars. Defaults to None means no limit.
+        """
+        with self.__get_lock():
+            if subtab >= len(self.__get_subtexts()):
+                self.set_subtext(subtab, '')
+            subtexts = self.__get_subtexts()
+            if subtab >= len(subtexts):
+                return
+            if isinstance(subtexts[subtab], FileSubtext):
+                raise ValueError('The subtext is displayed from a file.')
+            subtext = self.__get_indexed_subtext(subtab)
+            self.__shift_scroll(subtab, subtext.set_limit(max_lines, max_chars))
+            self.__invalidate()
+
+    def __shift_scroll(
+            self: 'Line',
+            subtab: int,
+            dropped: int,
+    ) -> None:
+        """Keep the scroll on the same rows, once rows were dropped from the beginning of the subtext."""
+        scroll = self.get_scroll(subtab)
+        if dropped > 0 and scroll > 0:
+            self.set_scroll(subtab, max(0, scroll - dropped))
+
+    def get_subtext_size(
+            self: 'Line',
+            subtab: int,
+            width: int,
+    ) -> tuple[int, int]:
+        """Get the size of the subtext at the specified subtab.
+
+        Args:
+            subtab (int): The subtab.
+            width (int): The width.
+
+        Returns:
+            tuple[int, int]: The number of columns and the number of lines.
+        """
+        with self.__get_lock():
+            self.__load(subtab)
+            if subtab >= len(self.__get_subtexts()):
+                return 0, 0
+            return self.__get_indexed_subtext(subtab).get_size(width)
+
+    def get_subtext_window(
+            self: 'Line',
+            subtab: int,
+            width: int,
+            scroll: int,
+            height: int,
+            hits: Sequence[int] = (),
+            query: str = '',
+    ) -> tuple[str, int] | None:
+        """Get the text displayed by a window of rows of the subtext at the specified subtab.
+
+        Args:
+            subtab (int): The subtab.
+            width (int): The width.
+            scroll (int): The first row of the window.
+            height (int): The number of rows of the window.
+            hits (Sequence[int], optional): The hits of a search to highlight, see `prepare_subtext_search`. Defaults to ().
+            query (str, optional): The query of the search. Defaults to ''.
+
+        Returns:
+            tuple[str, int] | None: The text and the scroll to render it with, or None if the subtext cannot be windowed.
+        """
+        with self.__get_lock():
+            self.__load(subtab)
+            if subtab >= len(self.__get_subtexts()):
+                return '', 0
+            return self.__get_indexed_subtext(subtab).get_window(width, scroll, height, hits, query)
+
+    def get_subtext_span(
+            self: 'Line',
+            subtab: int,
+    ) -> tuple[int | None, int, int]:
+        """Get the identity and the offsets of the subtext at the specified subtab, without joining it.
+
+        While the identity stays the same, the subtext was only appended to or had lines dropped, and the offsets of
+        the hits of a search stay valid, see `Subtext.get_span`.
+
+        Args:
+            subtab (int): The subtab.
+
+        Returns:
+            tuple[int | None, int, int]: The identity, None if there is no subtext, then the start and the end offsets,
+                in chars, or in bytes for a file.
+        """
+        with self.__get_lock():
+            if subtab >= len(self.__get_subtexts()):
+                return None, 0, 0
+            return self.__get_indexed_subtext(subtab).get_span()
+
+    def prepare_subtext_search(
+            self: 'Line',
+            subtab: int,
+            query: str,
+            since: int = None,
+    ) -> 'function[[threading.Event], array] | None':
+        """Prepare a search of the subtext at the specified subtab, ignoring case.
+
+        Args:
+            subtab (int): The subtab.
+            query (str): The query.
+            since (int, optional): The end offset of the subtext searched before, see `get_subtext_span`. Only the hits
+                ending after it are searched. Defaults to None means the whole subtext.
+
+        Returns:
+            function[[threading.Event], array] | None: Searches the subtext and returns the offsets of the hits, or None
+                if there is no subtext. It can run in another thread, see `Subtext.prepare_search`.
+        """
+        with self.__get_lock():
+            subtexts = self.__get_subtexts()
+            if subtab >= len(subtexts) or not query:
+                return None
+            if isinstance(subtexts[subtab], str) and since is None:
+                # Searching does not need the row index.
+                return prepare_search(subtexts[subtab], query)
+            return self.__get_indexed_subtext(subtab).prepare_search(query, since)
+
+    def get_subtext_row(
+            self: 'Line',
+            subtab: int,
+            width: int,
+            offset: int,
+    ) -> int | None:
+        """Get the row displaying an offset of the subtext at the specified subtab.
+
+        Args:
+            subtab (int): The subtab.
+            width (int): The width.
+            offset (int): The offset of a hit, see `prepare_subtext_search`.
+
+        Returns:
+            int | None: The row, or None if the offset is not displayed.
+        """
+        with self.__get_lock():
+            if subtab >= len(self.__get_subtexts()):
+                return None
+            return self.__get_indexed_subtext(subtab).get_row(width, offset)
+
+    def get_subtext_wrap(
+            self: 'Line',
+            subtab: int,
+    ) -> bool:
+        """Check if the rows of the subtext at the specified subtab are wrapped.
+
+        Args:
+            subtab (int): The subtab.
+
+        Returns:
+            bool: False if the rows longer than the width are cut instead.
+        """
+        with self.__get_lock():
+            subtexts = self.__get_subtexts()
+            return subtab >= len(subtexts) or not isinstance(subtexts[subtab], FileSubtext)
+
+    def __get_indexed_subtext(
+            self: 'Line',
+            subtab: int,
+    ) -> 'Subtext':
+        subtexts = self.__get_subtexts()
+        subtext = subtexts[subtab]
+        if isinstance(subtext, str):
+            # Index the subtext once, its layouts are then kept up to date.
+            subtext = subtexts[subtab] = Subtext(subtext)
+        return subtext
+
+    def __get_subtexts(
+            self: 'Line',
+    ) -> list[str | Subtext]:
+        slot = self.__store.get_slot(self.__id)
+        return self.__store.subtexts.get(slot, []) if slot is not None else []
 
     def get_subtexts(
             self: 'Line',
@@ -80,7 +505,8 @@ class Line:
         Returns:
             list[str]: The subtexts.
         """
-        return self.__subtexts
+        with self.__get_lock():
+            return [self.get_subtext(subtab) for subtab in range(len(self.__get_subtexts()))]
 
     def set_subtexts(
             self: 'Line',
@@ -91,7 +517,18 @@ class Line:
         Args:
             subtexts (list[str]): The subtexts.
         """
-        self.__subtexts = subtexts
+        with self.__get_lock():
+            slot = self.__store.get_slot(self.__id)
+            if slot is None:
+                return
+            for subtab in list(self.__store.providers.get(slot, {})):
+                self.__remove_provider(subtab)
+            self.__store.close_subtexts(slot)
+            if len(subtexts) > 0:
+                self.__store.subtexts[slot] = list(subtexts)
+            else:
+                self.__store.subtexts.pop(slot, None)
+            self.__invalidate()
 
     def get_nb_subtext(
             self: 'Line',
@@ -101,7 +538,7 @@ class Line:
         Returns:
             int: The number of subtexts.
         """
-        return len(self.__subtexts)
+        return len(self.__get_subtexts())
 
     def get_scroll(
             self: 'Line',
@@ -115,7 +552,9 @@ class Line:
         Returns:
             int: The scroll at the specified subtab.
         """
-        return self.__scroll[subtab] if subtab < len(self.__scroll) else -1
+        slot = self.__store.get_slot(self.__id)
+        scrolls = self.__store.scrolls.get(slot, []) if slot is not None else []
+        return scrolls[subtab] if subtab < len(scrolls) else -1
 
     def set_scroll(
             self: 'Line',
@@ -128,7 +567,26 @@ class Line:
             subtab (int): The subtab.
             scroll (int): The scroll.
         """
-        if subtab < len(self.__scroll):
-            self.__scroll[subtab] = scroll
-        else:
-            self.__scroll += [-1] * (subtab - len(self.__scroll)) + [scroll]
+        with self.__get_lock():
+            if scroll == self.get_scroll(subtab):
+                return
+            slot = self.__store.get_slot(self.__id)
+            if slot is None:
+                return
+            scrolls = self.__store.scrolls.setdefault(slot, [])
+            if subtab < len(scrolls):
+                scrolls[subtab] = scroll
+            else:
+                scrolls += [-1] * (subtab - len(scrolls)) + [scroll]
+            self.__invalidate()
+
+    def __get_lock(
+            self: 'Line',
+    ) -> 'threading.RLock':
+        return self.__store.lock
+
+    def __invalidate(
+            self: 'Line',
+    ) -> None:
+        if self.__store.renderer is not None:
+            self.__store.renderer.invalidate()
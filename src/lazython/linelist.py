@@ -0,0 +1,337 @@
+from array import array
+from typing import Iterable, Iterator
+
+from .linestore import SLOT_MASK
+
+
+class LineList:
+    """An ordered list of line ids.
+
+    The ids are kept in blocks of a bounded size. A Fenwick tree over the block sizes gives the
+    block holding any index, and the offset of any block, in O(log n). As the block of each line is
+    recorded by slot, finding, deleting or moving a line costs O(log n + BLOCK_SIZE) instead of O(n).
+    """
+
+    BLOCK_SIZE = 256  # The size of the blocks built by `extend`. Blocks are split at twice this size.
+
+    def __init__(
+            self: 'LineList',
+            ids: Iterable[int] = (),
+    ) -> None:
+        """Initialize a line list.
+
+        Args:
+            ids (Iterable[int], optional): The initial line ids. Defaults to ().
+        """
+        self.__blocks: list[array] = []
+        self.__serials: list[int] = []  # The serial number of each block, which never changes.
+        self.__next_serial = 0
+        self.__tree: list[int] = [0]  # The Fenwick tree of the block sizes, 1-based.
+        self.__block_index: dict[int, int] = {}  # The index of each block, by serial number.
+        self.__block_of = array('i')  # The serial number of the block of each slot, -1 if none.
+        self.__length = 0
+        self.extend(ids)
+
+    def __len__(
+            self: 'LineList',
+    ) -> int:
+        return self.__length
+
+    def __iter__(
+            self: 'LineList',
+    ) -> Iterator[int]:
+        for block in self.__blocks:
+            yield from block
+
+    def __contains__(
+            self: 'LineList',
+            id: int,
+    ) -> bool:
+        slot = id & SLOT_MASK
+        if slot >= len(self.__block_of) or self.__block_of[slot] < 0:
+            return False
+        return id in self.__blocks[self.__block_index[self.__block_of[slot]]]
+
+    def __getitem__(
+            self: 'LineList',
+            index: int | slice,
+    ) -> int | list[int]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return list(self)[index]
+            return self.__get_range(start, stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('line index out of range')
+        block, offset = self.__locate(index)
+        return self.__blocks[block][offset]
+
+    def index(
+            self: 'LineList',
+            id: int,
+    ) -> int:
+        """Get the index of a line.
+
+        Args:
+            id (int): The line id.
+
+        Raises:
+            ValueError: If the line is not in the list.
+
+        Returns:
+            int: The index.
+        """
+        block_index = self.__get_block_index(id)
+        return self.__get_offset(block_index) + self.__blocks[block_index].index(id)
+
+    def append(
+            self: 'LineList',
+            id: int,
+    ) -> None:
+        """Add a line at the end.
+
+        Args:
+            id (int): The line id.
+        """
+        # Appended lines fill the last block, then a new one.
+        if not self.__blocks or len(self.__blocks[-1]) >= LineList.BLOCK_SIZE:
+            self.__append_block()
+        self.__blocks[-1].append(id)
+        self.__set_block(id, self.__serials[-1])
+        self.__length += 1
+        self.__add(len(self.__blocks) - 1, 1)
+
+    def extend(
+            self: 'LineList',
+            ids: Iterable[int],
+    ) -> None:
+        """Add lines at the end.
+
+        Args:
+            ids (Iterable[int]): The line ids.
+        """
+        ids = array('q', ids)
+        if len(ids) == 0:
+            return
+
+        # Fill the last block, then add full blocks.
+        position = 0
+        if self.__blocks and len(self.__blocks[-1]) < LineList.BLOCK_SIZE:
+            position = LineList.BLOCK_SIZE - len(self.__blocks[-1])
+            self.__add_to_block(len(self.__blocks) - 1, ids[:position])
+        for start in range(position, len(ids), LineList.BLOCK_SIZE):
+            self.__new_block(len(self.__blocks))
+            self.__add_to_block(len(self.__blocks) - 1, ids[start:start + LineList.BLOCK_SIZE])
+        self.__length += len(ids)
+        self.__rebuild()
+
+    def insert(
+            self: 'LineList',
+            index: int,
+            id: int,
+    ) -> None:
+        """Insert a line before an index.
+
+        Args:
+            index (int): The index.
+            id (int): The line id.
+        """
+        index = max(0, min(index, len(self)))
+        if not self.__blocks:
+            self.__new_block(0)
+            self.__rebuild()
+
+        if index == len(self):
+            block_index, offset = len(self.__blocks) - 1, len(self.__blocks[-1])
+        else:
+            block_index, offset = self.__locate(index)
+        block = self.__blocks[block_index]
+        block.insert(offset, id)
+        self.__set_block(id, self.__serials[block_index])
+        self.__length += 1
+
+        if len(block) > 2 * LineList.BLOCK_SIZE:
+            # Split the block.
+            half = len(block) // 2
+            self.__new_block(block_index + 1)
+            self.__add_to_block(block_index + 1, block[half:])
+            del block[half:]
+            self.__rebuild()
+        else:
+            self.__add(block_index, 1)
+
+    def remove(
+            self: 'LineList',
+            id: int,
+    ) -> int:
+        """Remove a line.
+
+        Args:
+            id (int): The line id.
+
+        Raises:
+            ValueError: If the line is not in the list.
+
+        Returns:
+            int: The index the line had.
+        """
+        block_index = self.__get_block_index(id)
+        block = self.__blocks[block_index]
+        offset = block.index(id)
+        index = self.__get_offset(block_index) + offset
+        del block[offset]
+        self.__block_of[id & SLOT_MASK] = -1
+        self.__length -= 1
+
+        if len(block) == 0:
+            del self.__blocks[block_index]
+            del self.__serials[block_index]
+            self.__rebuild()
+        else:
+            self.__add(block_index, -1)
+        return index
+
+    def move(
+            self: 'LineList',
+            id: int,
+            index: int,
+    ) -> None:
+        """Move a line to an index.
+
+        Args:
+            id (int): The line id.
+            index (int): The index of the line once moved.
+        """
+        self.remove(id)
+        self.insert(index, id)
+
+    def clear(
+            self: 'LineList',
+    ) -> None:
+        """Remove all the lines."""
+        self.__blocks = []
+        self.__serials = []
+        self.__block_of = array('i')
+        self.__length = 0
+        self.__rebuild()
+
+    def __new_block(
+            self: 'LineList',
+            block_index: int,
+    ) -> None:
+        self.__blocks.insert(block_index, array('q'))
+        self.__serials.insert(block_index, self.__next_serial)
+        self.__next_serial += 1
+
+    def __add_to_block(
+            self: 'LineList',
+            block_index: int,
+            ids: array,
+    ) -> None:
+        if len(ids) == 0:
+            return
+        self.__blocks[block_index].extend(ids)
+        serial = self.__serials[block_index]
+        size = max(id & SLOT_MASK for id in ids) + 1
+        if size > len(self.__block_of):
+            self.__block_of.extend([-1] * (size - len(self.__block_of)))
+        block_of = self.__block_of
+        for id in ids:
+            block_of[id & SLOT_MASK] = serial
+
+    def __set_block(
+            self: 'LineList',
+            id: int,
+            serial: int,
+    ) -> None:
+        slot = id & SLOT_MASK
+        if slot < len(self.__block_of):
+            self.__block_of[slot] = serial
+        else:
+            self.__block_of.extend([-1] * (slot - len(self.__block_of)))
+            self.__block_of.append(serial)
+
+    def __get_block_index(
+            self: 'LineList',
+            id: int,
+    ) -> int:
+        slot = id & SLOT_MASK
+        if slot >= len(self.__block_of) or self.__block_of[slot] < 0:
+            raise ValueError('The line is not in the list.')
+        return self.__block_index[self.__block_of[slot]]
+
+    def __get_range(
+            self: 'LineList',
+            start: int,
+            stop: int,
+    ) -> list[int]:
+        ids = []
+        if start >= stop:
+            return ids
+        block_index, offset = self.__locate(start)
+        while len(ids) < stop - start and block_index < len(self.__blocks):
+            ids += self.__blocks[block_index][offset:offset + stop - start - len(ids)]
+            block_index += 1
+            offset = 0
+        return ids
+
+    # Fenwick tree of the block sizes.
+
+    def __rebuild(
+            self: 'LineList',
+    ) -> None:
+        """Index the blocks again, after blocks were added or removed."""
+        self.__block_index = {serial: i for i, serial in enumerate(self.__serials)}
+        tree = [0] + [len(block) for block in self.__blocks]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.__tree = tree
+
+    def __append_block(
+            self: 'LineList',
+    ) -> None:
+        """Add an empty block at the end, without indexing all the blocks again."""
+        self.__new_block(len(self.__blocks))
+        self.__block_index[self.__serials[-1]] = len(self.__blocks) - 1
+        i = len(self.__tree)
+        self.__tree.append(self.__get_offset(i - 1) - self.__get_offset(i - (i & -i)))
+
+    def __add(
+            self: 'LineList',
+            block_index: int,
+            delta: int,
+    ) -> None:
+        i = block_index + 1
+        while i < len(self.__tree):
+            self.__tree[i] += delta
+            i += i & -i
+
+    def __get_offset(
+            self: 'LineList',
+            block_index: int,
+    ) -> int:
+        """Get the number of lines before a block."""
+        offset = 0
+        i = block_index
+        while i > 0:
+            offset += self.__tree[i]
+            i -= i & -i
+        return offset
+
+    def __locate(
+            self: 'LineList',
+            index: int,
+    ) -> tuple[int, int]:
+        """Get the block holding an index, and the offset of the index in the block."""
+        position = 0
+        step = 1 << (len(self.__tree) - 1).bit_length()
+        while step > 0:
+            if position + step < len(self.__tree) and self.__tree[position + step] <= index:
+                position += step
+                index -= self.__tree[position]
+            step >>= 1
+        return position, index
@@ -0,0 +1,143 @@
+import threading
+from array import array
+
+from .subtext import Subtext
+from .filesubtext import FileSubtext
+
+
+SLOT_BITS = 32  # The number of low bits of a line id holding its slot. The high bits hold its generation.
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+
+class LineStore:
+    """The columnar storage of lines.
+
+    Each line occupies a slot: its text is an entry of a single list, and its subtexts and scrolls
+    are only stored when it has some. The slots of removed lines are reused, so a line id is made of
+    its slot and of the generation of the slot, which tells a removed line apart from the line
+    reusing its slot.
+
+    The columns are public for `Line`, which is a handle on a line of a store.
+    """
+
+    def __init__(
+            self: 'LineStore',
+            renderer: 'Renderer' = None,
+    ) -> None:
+        """Initialize a line store.
+
+        Args:
+            renderer (Renderer, optional): The renderer to invalidate when a line changes. Defaults to None.
+        """
+        self.renderer = renderer
+        # Held while the lines are mutated or read. It is the lock of the renderer, if any.
+        self.lock: threading.RLock = renderer.lock if renderer is not None else threading.RLock()
+        self.texts: list[str] = []  # The text of each slot, None for free slots.
+        self.subtexts: dict[int, list[str | Subtext | FileSubtext]] = {}  # The subtexts of the slots having some.
+        self.scrolls: dict[int, list[int]] = {}  # The scrolls of the slots having some set.
+        self.providers: dict[int, dict[int, 'function[[], str]']] = {}  # The subtext providers, by slot and subtab.
+        self.outdated: set[tuple[int, int]] = set()  # The (slot, subtab) whose provider has to be called.
+        self.loads: dict[tuple[int, int], object] = {}  # The (slot, subtab) whose provider is running.
+        self.on_set_text: 'function[[int, str, str], None]' = None  # Called with the id, the old and the new text of a line.
+
+        self.__generations = array('I')  # The generation of each slot.
+        self.__free: list[int] = []  # The free slots.
+
+    def __len__(
+            self: 'LineStore',
+    ) -> int:
+        return len(self.texts) - len(self.__free)
+
+    def add(
+            self: 'LineStore',
+            text: str = '',
+            subtexts: list[str] = (),
+    ) -> int:
+        """Add a line.
+
+        Args:
+            text (str, optional): The line text. Defaults to ''.
+            subtexts (list[str], optional): The line contents. Defaults to ().
+
+        Returns:
+            int: The line id.
+        """
+        if self.__free:
+            slot = self.__free.pop()
+            self.texts[slot] = text
+        else:
+            slot = len(self.texts)
+            self.texts.append(text)
+            self.__generations.append(0)
+        if subtexts:
+            self.subtexts[slot] = list(subtexts)
+        return self.__generations[slot] << SLOT_BITS | slot
+
+    def remove(
+            self: 'LineStore',
+            id: int,
+    ) -> None:
+        """Remove a line.
+
+        Args:
+            id (int): The line id.
+        """
+        slot = self.get_slot(id)
+        if slot is None:
+            return
+        self.texts[slot] = None
+        self.close_subtexts(slot)
+        self.subtexts.pop(slot, None)
+        self.scrolls.pop(slot, None)
+        for subtab in self.providers.pop(slot, {}):
+            self.outdated.discard((slot, subtab))
+            self.loads.pop((slot, subtab), None)
+        self.__generations[slot] = (self.__generations[slot] + 1) & SLOT_MASK
+        self.__free.append(slot)
+
+    def clear(
+            self: 'LineStore',
+    ) -> None:
+        """Remove all the lines."""
+        for slot in self.subtexts:
+            self.close_subtexts(slot)
+        for slot, text in enumerate(self.texts):
+            if text is not None:
+                self.__generations[slot] = (self.__generations[slot] + 1) & SLOT_MASK
+        self.texts = [None] * len(self.texts)
+        self.subtexts = {}
+        self.scrolls = {}
+        self.providers = {}
+        self.outdated = set()
+        self.loads = {}
+        self.__free = list(range(len(self.texts) - 1, -1, -1))
+
+    def close_subtexts(
+            self: 'LineStore',
+            slot: int,
+    ) -> None:
+        """Release the files of the file subtexts of a slot.
+
+        Args:
+            slot (int): The slot.
+        """
+        for subtext in self.subtexts.get(slot, ()):
+            if isinstance(subtext, FileSubtext):
+                subtext.close()
+
+    def get_slot(
+            self: 'LineStore',
+            id: int,
+    ) -> int | None:
+        """Get the slot of a line.
+
+        Args:
+            id (int): The line id.
+
+        Returns:
+            int | None: The slot, or None if the line was removed.
+        """
+        slot = id & SLOT_MASK
+        if slot >= len(self.texts) or self.__generations[slot] != id >> SLOT_BITS or self.texts[slot] is None:
+            return None
+        return slot
@@ -2,11 +2,195 @@ import select
 import sys
 import termios
 import os
-import re
 from typing import *
 
 
+ESC = 0x1b
+PASTE_START = b'\x1b[200~'
+PASTE_END = b'\x1b[201~'
+
+
+def key_code(sequence: bytes) -> int:
+    """Convert the bytes of a key to an int.
+
+    Args:
+        sequence (bytes): The bytes sent by the terminal for the key.
+
+    Returns:
+        int: The key, with its first byte as the least significant one.
+    """
+    return int.from_bytes(sequence, 'little')
+
+
+def key_text(key: int) -> str | None:
+    """Convert a key to the text it types.
+
+    Args:
+        key (int): The key, as returned by `key_code`.
+
+    Returns:
+        str | None: The text, or None if the key does not type text.
+    """
+    text = key.to_bytes(max(1, (key.bit_length() + 7) // 8), 'little').decode(errors='replace')
+    return text if text.isprintable() else None
+
+
+class InputParser:
+    """An incremental parser of the terminal input.
+
+    The bytes are fed as they are read, and split into events:
+    - `('key', key)`, with the key as returned by `key_code`,
+    - `('click', key, x, y)`, for the mouse reports,
+    - `('paste', text)`, for the text pasted between bracketed paste markers.
+
+    A sequence cut at the end of a read is kept until the next feed. A lone escape cannot be told
+    apart from the beginning of a sequence, so it is only emitted by `flush`.
+    """
+
+    def __init__(self: 'InputParser'):
+        """Constructor."""
+        self.__pending = b''  # The beginning of a sequence, waiting for the next feed.
+        self.__paste: bytearray = None  # The text pasted so far, while in a bracketed paste.
+
+    def has_pending(self: 'InputParser') -> bool:
+        """Check if a sequence is waiting for more bytes.
+
+        Returns:
+            bool: True if the parser holds the beginning of a sequence.
+        """
+        return len(self.__pending) > 0 and self.__paste is None
+
+    def feed(self: 'InputParser', data: bytes) -> list[tuple]:
+        """Parse bytes read from the terminal.
+
+        Args:
+            data (bytes): The bytes.
+
+        Returns:
+            list[tuple]: The complete events.
+        """
+        if self.__pending:
+            data = self.__pending + data
+            self.__pending = b''
+
+        events = []
+        position = 0
+        length = len(data)
+        while position < length:
+            # Pasted text, up to the end marker.
+            if self.__paste is not None:
+                end = data.find(PASTE_END, position)
+                if end == -1:
+                    # Keep what may be the beginning of the end marker.
+                    keep = next((size for size in range(min(len(PASTE_END) - 1, length - position), 0, -1)
+                                 if PASTE_END.startswith(data[length - size:])), 0)
+                    self.__paste += data[position:length - keep]
+                    self.__pending = data[length - keep:]
+                    break
+                self.__paste += data[position:end]
+                events.append(('paste', self.__paste.decode('utf-8', 'replace')))
+                self.__paste = None
+                position = end + len(PASTE_END)
+                continue
+
+            end = self.__find_end(data, position)
+            if end is None:
+                self.__pending = data[position:]
+                break
+            sequence = data[position:end]
+            position = end
+
+            if sequence == PASTE_START:
+                self.__paste = bytearray()
+            elif len(sequence) == 6 and sequence.startswith(b'\x1b[M'):
+                events.append(('click', sequence[3] - 32, sequence[4] - 32, sequence[5] - 32))
+            else:
+                events.append(('key', key_code(sequence)))
+
+        return events
+
+    def flush(self: 'InputParser') -> list[tuple]:
+        """Parse the pending bytes as if no more bytes followed.
+
+        Returns:
+            list[tuple]: The events.
+        """
+        events = []
+        while self.has_pending():
+            # The escape is a key on its own, the following bytes are parsed again.
+            data = self.__pending
+            self.__pending = b''
+            events.append(('key', key_code(data[:1])))
+            events += self.feed(data[1:])
+        return events
+
+    @staticmethod
+    def __find_end(data: bytes, position: int) -> int | None:
+        """Find the end of the sequence starting at a position.
+
+        Args:
+            data (bytes): The bytes.
+            position (int): The start of the sequence.
+
+        Returns:
+            int | None: The end of the sequence, or None if the bytes end before it.
+        """
+        length = len(data)
+        if data[position] != ESC:
+            return InputParser.__find_char_end(data, position)
+        if position + 1 >= length:
+            return None
+
+        introducer = data[position + 1]
+        if introducer == ord('['):
+            # Control sequence.
+            if position + 2 >= length:
+                return None
+            if data[position + 2] == ord('M'):
+                # Mouse report: 3 bytes follow.
+                return position + 6 if position + 6 <= length else None
+            end = position + 2
+            while end < length and 0x20 <= data[end] <= 0x3f:
+                end += 1
+            if end >= length:
+                return None
+            return end + 1 if 0x40 <= data[end] <= 0x7e else end
+        if introducer == ord('O'):
+            # Single shift sequence, e.g. F1 to F4.
+            return position + 3 if position + 3 <= length else None
+        if introducer == ESC:
+            return position + 1
+
+        # Alt + key.
+        return InputParser.__find_char_end(data, position + 1)
+
+    @staticmethod
+    def __find_char_end(data: bytes, position: int) -> int | None:
+        """Find the end of the UTF-8 char starting at a position.
+
+        Args:
+            data (bytes): The bytes.
+            position (int): The start of the char.
+
+        Returns:
+            int | None: The end of the char, or None if the bytes end before it.
+        """
+        lead = data[position]
+        size = 4 if lead >= 0xf0 else 3 if lead >= 0xe0 else 2 if lead >= 0xc0 else 1
+        end = position + 1
+        while end < position + size:
+            if end >= len(data):
+                return None
+            if not 0x80 <= data[end] <= 0xbf:
+                break
+            end += 1
+        return end
+
+
 class Listener:
+    READ_SIZE = 4096  # The maximum number of bytes read at once.
+    ESCAPE_TIMEOUT = 0.05  # The time after which a lone escape is a key, in seconds.
+
     def __init__(self: 'Listener'):
         """Constructor."""
         self.listening = False
@@ -15,6 +199,9 @@ class Listener:
 
         self.key_callbacks = []
         self.click_callbacks = []
+        self.paste_callbacks = []
+
+        self.__parser = InputParser()
 
     def prepare(self: 'Listener'):
         """Prepare to listen."""
@@ -28,12 +215,14 @@ class Listener:
 
         # Send ANSI escape sequences.
         sys.stdout.write('\x1b[?1000h')  # Record mouse events.
+        sys.stdout.write('\x1b[?2004h')  # Bracket pasted text.
         sys.stdout.flush()
 
     def terminate(self: 'Listener'):
         """Terminate listening."""
         # Send ANSI escape sequences.
         sys.stdout.write('\x1b[?1000l')  # Stop recording mouse events.
+        sys.stdout.write('\x1b[?2004l')  # Stop bracketing pasted text.
         sys.stdout.flush()
 
         # Restore settings.
@@ -59,10 +248,73 @@ class Listener:
         """
         self.click_callbacks.append(callback)
 
+    def add_paste_callback(self: 'Listener', callback: 'function[[str], None]'):
+        """Add a paste callback.
+
+        Args:
+            callback (function[[str], None]): The callback to add.
+
+        The callback will be called with the pasted text. Without paste callback, the pasted text is sent
+        to the key callbacks, one key at a time.
+        """
+        self.paste_callbacks.append(callback)
+
     def stop(self: 'Listener'):
         """Stop listening."""
         self.listening = False
 
+    def process(self: 'Listener', data: bytes):
+        """Process bytes read from the terminal.
+
+        Args:
+            data (bytes): The bytes.
+        """
+        self.__dispatch(self.__parser.feed(data))
+
+    def has_pending(self: 'Listener') -> bool:
+        """Check if the end of a sequence is awaited.
+
+        Returns:
+            bool: True if `flush` should be called when no input comes within `ESCAPE_TIMEOUT`.
+        """
+        return self.__parser.has_pending()
+
+    def flush(self: 'Listener'):
+        """Process the pending bytes as if no more bytes followed, e.g. a lone escape."""
+        self.__dispatch(self.__parser.flush())
+
+    def interrupt(self: 'Listener'):
+        """Process an interruption, as sent by `ctrl` + `c`."""
+        # Key callback.
+        val = 0
+        for callback in self.key_callbacks:
+            callback(val)
+
+    def __dispatch(self: 'Listener', events: list[tuple]):
+        """Call the callbacks of events.
+
+        Args:
+            events (list[tuple]): The events, as returned by `InputParser.feed`.
+        """
+        for event in events:
+            if event[0] == 'key':
+                # Key callback.
+                for callback in self.key_callbacks:
+                    callback(event[1])
+            elif event[0] == 'click':
+                # Click callback.
+                _, key, x, y = event
+                for callback in self.click_callbacks:
+                    callback(key, x - 1, y - 1)
+            elif self.paste_callbacks:
+                # Paste callback.
+                for callback in self.paste_callbacks:
+                    callback(event[1])
+            else:
+                # Pasted keys.
+                parser = InputParser()
+                self.__dispatch(parser.feed(event[1].encode('utf-8')) + parser.flush())
+
     def listen(self: 'Listener'):
         """Listen to events."""
         if self.listening:
@@ -73,38 +325,16 @@ class Listener:
         self.listening = True
         while self.listening:
             try:
-                # Read.
-                r, _, _ = select.select([sys.stdin], [], [])
+                # Wait for input, or for the rest of a sequence.
+                timeout = Listener.ESCAPE_TIMEOUT if self.has_pending() else None
+                r, _, _ = select.select([sys.stdin], [], [], timeout)
                 if r:
-                    ch_set = ''
-                    ch = os.read(sys.stdin.fileno(), 1)
-                    while ch is not None and len(ch) > 0:
-                        ch_set += ch.decode('ISO-8859-1')
-                        ch = os.read(sys.stdin.fileno(), 1)
-
-                    # Click callback.
-                    click_expr = r'\x1b\[M(.)(.)(.)'
-                    if match := re.match(click_expr, ch_set):
-                        key, x, y = match.groups()
-                        key, x, y = ord(key) - 32, ord(x) - 32, ord(y) - 32
-                        for callback in self.click_callbacks:
-                            callback(key, x - 1, y - 1)
-                        continue
-
-                    # Convert to int.
-                    val = 0
-                    for i, ch in enumerate(ch_set):
-                        val += ord(ch) << (8 * i)
-
-                    # Key callback.
-                    for callback in self.key_callbacks:
-                        callback(val)
+                    self.process(os.read(sys.stdin.fileno(), Listener.READ_SIZE))
+                else:
+                    self.flush()
 
             except KeyboardInterrupt:
-                # Key callback.
-                val = 0
-                for callback in self.key_callbacks:
-                    callback(val)
+                self.interrupt()
 
         self.terminate()
 
@@ -122,6 +352,7 @@ if __name__ == '__main__':
 
     listener.add_key_callback(key_callback)
     listener.add_click_callback(click_callback)
+    listener.add_paste_callback(lambda text: print(f'Paste: {text!r}'))
 
     print('Press `ctrl` + `c` to stop.')
     listener.listen()
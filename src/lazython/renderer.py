@@ -1,31 +1,203 @@
 import sys
-import re
 import os
+import signal
+import threading
+import contextlib
+from collections import deque
+from typing import Iterator
 
+from .style import DEFAULT_STYLE
+from .layout import Layout
 
-TAB_WIDTH = 4
 
-exprs = [
-    COLOR_EXPR := r'\x1b\[[0-9;]*m',
-    SAVE_EXPR := r'\x1b7',
-    RESTORE_EXPR := r'\x1b8',
-    GOTO_EXPR := r'\x1b\[\d+;\d+H',
-    RETURN_EXPR := r'\r',
-    NEWLINE_EXPR := r'\n',
-    TAB_EXPR := r'\t',
-    ERASE_END_OF_LINE_EXPR := r'\x1b\[K',
-    RETURN_ERASE_END_OF_LINE_EXPR := r'\x1b\[2K',
-    MOVE_UP_EXPR := r'\x1b\[\d*A',
-]
+class OutputBuffer:
+    """An append-only output builder.
 
-FULL_EXPR = f'({"|".join(exprs)})'
+    The pieces of a frame are collected in a list, then joined and encoded once when flushed. A mark
+    records the current end of the buffer, so that everything written after it can be dropped cheaply.
+    """
+
+    def __init__(self: 'OutputBuffer'):
+        """Constructor."""
+        self.__chunks: list[str] = []
+
+    def __len__(self: 'OutputBuffer') -> int:
+        return len(self.__chunks)
+
+    def write(self: 'OutputBuffer', text: str) -> None:
+        """Append a text.
+
+        Args:
+            text (str): The text.
+        """
+        self.__chunks.append(text)
+
+    def mark(self: 'OutputBuffer') -> int:
+        """Mark the current end of the buffer.
+
+        Returns:
+            int: The mark, to pass to `rollback`.
+        """
+        return len(self.__chunks)
+
+    def rollback(self: 'OutputBuffer', mark: int) -> None:
+        """Drop everything written since a mark.
+
+        Args:
+            mark (int): The mark returned by `mark`.
+        """
+        del self.__chunks[mark:]
+
+    def getvalue(self: 'OutputBuffer') -> str:
+        """Get the content of the buffer.
+
+        Returns:
+            str: The content.
+        """
+        return ''.join(self.__chunks)
+
+    def flush(self: 'OutputBuffer', stream: object = None) -> int:
+        """Write the content of the buffer to a stream and empty the buffer.
+
+        Args:
+            stream (object, optional): A text stream. Defaults to None means `sys.stdout`.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        stream = stream or sys.stdout
+        text = ''.join(self.__chunks)
+        self.__chunks.clear()
+        if not text:
+            return 0
+
+        binary = getattr(stream, 'buffer', None)
+        if binary is None:
+            stream.write(text)
+            stream.flush()
+            return len(text.encode(stream.encoding or 'utf-8', 'replace'))
+
+        # Send what the text layer may hold first, then the frame in one write.
+        data = text.encode(stream.encoding or 'utf-8', 'replace')
+        stream.flush()
+        binary.write(data)
+        binary.flush()
+        return len(data)
+
+
+class FrameStats:
+    """The statistics of the last rendered frames.
+
+    Each frame records the time spent in each phase, the number of `addstr` calls and the number of
+    bytes written. Percentiles are computed over a rolling window of frames, so that they follow the
+    current load rather than the whole run.
+    """
+
+    PHASES = ('layout', 'tabs', 'content', 'flush', 'total')  # The timed phases of a frame, in seconds.
+    COUNTS = ('addstr', 'bytes')  # The counted quantities of a frame.
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self: 'FrameStats', budget: float, window: int = 256):
+        """Constructor.
+
+        Args:
+            budget (float): The time between two frames, in seconds. A frame taking longer skips the frames it overlaps.
+            window (int, optional): The number of frames the percentiles are computed on. Defaults to 256.
+        """
+        self.budget = budget
+        self.frames = 0
+        self.skipped = 0
+
+        self.__samples: deque[tuple] = deque(maxlen=window)  # The phase times, then the counts, of each frame.
+        self.__lock = threading.Lock()
+
+    def record(self: 'FrameStats', times: tuple[float, float, float, float], addstr_calls: int, written: int) -> None:
+        """Record a frame.
+
+        Args:
+            times (tuple[float, float, float, float]): The layout, tabs, content and flush times, in seconds.
+            addstr_calls (int): The number of `addstr` calls.
+            written (int): The number of bytes written.
+        """
+        total = sum(times)
+        with self.__lock:
+            self.frames += 1
+            if self.budget > 0:
+                self.skipped += int(total // self.budget)
+            self.__samples.append((*times, total, addstr_calls, written))
+
+    def clear(self: 'FrameStats') -> None:
+        """Forget the recorded frames and reset the counters."""
+        with self.__lock:
+            self.__samples.clear()
+            self.frames = 0
+            self.skipped = 0
+
+    def info(self: 'FrameStats') -> dict:
+        """Get the frame statistics.
+
+        Returns:
+            dict: The number of frames and skipped frames, the size of the window, then for each phase and count the
+                value of the last frame, the percentiles and the maximum over the window, e.g.
+                `info['total']['p99']`.
+        """
+        with self.__lock:
+            samples = list(self.__samples)
+            info = {'frames': self.frames, 'skipped': self.skipped, 'window': len(samples)}
+        for i, name in enumerate(FrameStats.PHASES + FrameStats.COUNTS):
+            values = sorted(sample[i] for sample in samples) or [0]
+            info[name] = {'last': samples[-1][i] if samples else 0, 'max': values[-1]}
+            for percentile in FrameStats.PERCENTILES:
+                info[name][f'p{percentile}'] = values[min(len(values) - 1, len(values) * percentile // 100)]
+        return info
+
+    def summary(self: 'FrameStats') -> str:
+        """Get a one line summary of the frame statistics.
+
+        Returns:
+            str: The median and 99th percentile of the frame time and of each phase, in milliseconds, then the median
+                counts and the skipped frames.
+        """
+        info = self.info()
+        phases = ' '.join(f'{name} {info[name]["p50"] * 1000:.1f}/{info[name]["p99"] * 1000:.1f}'
+                          for name in FrameStats.PHASES)
+        return (f'{phases} ms | addstr {info["addstr"]["p50"]} | {info["bytes"]["p50"]} B | '
+                f'{info["frames"]} frames, {info["skipped"]} skipped')
 
 
 class Renderer:
+    last_size: os.terminal_size = None  # The terminal size last read by a renderer, for `Renderer.get_size`.
+    MAX_GAP = 4  # The number of unchanged cells written through rather than skipped with a goto.
+
     def __init__(self: 'Renderer'):
-        """Constructor."""
-        self.buffer: str = ''
+        """Constructor.
+
+        The renderer draws into a back grid of (char, style) cells. `refresh` only sends the cells
+        that differ from the front grid, which holds what the terminal currently displays.
+        """
+        self.buffer = OutputBuffer()  # The output of the current frame.
         self.rendering: bool = False
+        self.style: str = DEFAULT_STYLE  # The current pen style.
+        self.dirty = threading.Event()  # Set when the screen is outdated.
+        self.resized = threading.Event()  # Set when the terminal has been resized.
+        self.lock = threading.RLock()  # Held while the model is mutated or composed into a frame.
+        self.addstr_calls = 0  # The number of `addstr` calls, for the frame statistics.
+
+        self.on_invalidate: 'function[[], None]' = None  # Called when the screen is marked as outdated.
+
+        self.__batch_depth = 0  # The number of nested batches.
+        self.__batch_dirty = False  # Whether the screen was invalidated during the batch.
+
+        self.__size: os.terminal_size = None  # The cached terminal size.
+        self.__watching_size = False  # Whether the size is updated by the SIGWINCH handler.
+        self.__previous_handler = None  # The SIGWINCH handler replaced by the renderer.
+
+        self.__columns = 0
+        self.__lines = 0
+        self.__chars: list[list[str]] = []
+        self.__styles: list[list[str]] = []
+        self.__front_chars: list[list[str]] = []
+        self.__front_styles: list[list[str]] = []
 
     def start(self: 'Renderer') -> None:
         """Start the renderer."""
@@ -38,6 +210,17 @@ class Renderer:
         sys.stdout.write('\x1b[?25l')  # Hide cursor.
         sys.stdout.flush()
 
+        # Follow the terminal size. Signal handlers can only be set from the main thread.
+        self.__size = os.get_terminal_size()
+        Renderer.last_size = self.__size
+        if threading.current_thread() is threading.main_thread():
+            self.__previous_handler = signal.signal(signal.SIGWINCH, self.__resize_callback)
+            self.__watching_size = True
+
+        # The saved screen is blank, everything has to be sent again.
+        self.__reset_front()
+        self.invalidate()
+
     def stop(self: 'Renderer') -> None:
         """Stop the renderer."""
         if not self.rendering:
@@ -48,46 +231,164 @@ class Renderer:
         sys.stdout.write('\x1b[?25h')  # Show cursor.
         sys.stdout.flush()
 
+        if self.__watching_size and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGWINCH, self.__previous_handler)
+            self.__watching_size = False
+
         self.rendering = False
 
+    def get_terminal_size(self: 'Renderer') -> os.terminal_size:
+        """Get the terminal size.
+
+        The size is read once, then updated on SIGWINCH while the renderer is running.
+
+        Returns:
+            os.terminal_size: The terminal size.
+        """
+        if self.__size is None or not self.__watching_size:
+            self.__size = os.get_terminal_size()
+            Renderer.last_size = self.__size
+        return self.__size
+
+    def __resize_callback(self: 'Renderer', signum: int, frame: object) -> None:
+        """The SIGWINCH handler."""
+        self.__size = os.get_terminal_size()
+        Renderer.last_size = self.__size
+        self.resized.set()
+        self.invalidate()
+
     def __del__(self: 'Renderer'):
         """Destructor."""
         self.stop()
 
-    def refresh(self: 'Renderer') -> None:
-        """Refresh the screen."""
+    def refresh(self: 'Renderer') -> int:
+        """Refresh the screen.
+
+        Returns:
+            int: The number of bytes written.
+        """
         if not self.rendering:
             raise Exception('The renderer is not running. Please call Renderer.start() first.')
 
-        sys.stdout.write(self.buffer)
-        sys.stdout.flush()
-        self.buffer = ''
+        buffer = self.buffer
+        write = buffer.write
+        pen = None
+        cursor = None
+        for y in range(self.__lines):
+            chars = self.__chars[y]
+            styles = self.__styles[y]
+            front_chars = self.__front_chars[y]
+            front_styles = self.__front_styles[y]
+            if chars == front_chars and styles == front_styles:
+                continue
+
+            # Unchanged cells between two changes are written through speculatively, as long as they
+            # cost less than a goto. The gap is rolled back if no change follows it.
+            gap = None
+            for x in range(self.__columns):
+                char = chars[x]
+                style = styles[x]
+                if char == front_chars[x] and style == front_styles[x]:
+                    if gap is None:
+                        if cursor != (x, y) or style != pen:
+                            continue
+                        gap = (buffer.mark(), x)
+                    if style == pen and x - gap[1] < Renderer.MAX_GAP:
+                        write(char)
+                        cursor = (x + 1, y)
+                    else:
+                        buffer.rollback(gap[0])
+                        cursor = (gap[1], y)
+                        gap = None
+                    continue
+                gap = None
+                if cursor != (x, y):
+                    self.goto(x, y)
+                if style != pen:
+                    write(style or '\x1b[0m')
+                    pen = style
+                write(char)
+                cursor = (x + 1, y)
+            if gap is not None:
+                buffer.rollback(gap[0])
+                cursor = (gap[1], y)
+
+            self.__front_chars[y] = chars[:]
+            self.__front_styles[y] = styles[:]
+
+        return buffer.flush(sys.stdout)
+
+    def invalidate(self: 'Renderer') -> None:
+        """Mark the screen as outdated, so that a new frame gets rendered.
+
+        During a batch, the screen is only marked as outdated when the batch ends.
+        """
+        if self.__batch_depth > 0:
+            self.__batch_dirty = True
+            return
+        self.dirty.set()
+        if self.on_invalidate is not None:
+            self.on_invalidate()
+
+    @contextlib.contextmanager
+    def batch(self: 'Renderer') -> 'Iterator[None]':
+        """Group mutations of the model into a single frame.
+
+        The lock is held for the whole batch, so that no frame shows part of it, and the screen is
+        invalidated at most once, when the outermost batch ends.
+        """
+        with self.lock:
+            self.__batch_depth += 1
+            try:
+                yield
+            finally:
+                self.__batch_depth -= 1
+                if self.__batch_depth == 0 and self.__batch_dirty:
+                    self.__batch_dirty = False
+                    self.invalidate()
 
     def clear(self: 'Renderer') -> None:
         """Clear the screen."""
-        self.buffer += f'\x1b[2J'
+        size = self.get_terminal_size()
+        self.__fit(size.columns, size.lines)
 
-    def get_cursor_pos(self: 'Renderer') -> tuple[int, int]:
-        """Get the cursor position.
+        blank_chars = [' '] * self.__columns
+        blank_styles = [DEFAULT_STYLE] * self.__columns
+        for y in range(self.__lines):
+            self.__chars[y][:] = blank_chars
+            self.__styles[y][:] = blank_styles
 
-        Returns:
-            tuple[int, int]: The cursor position.
+    def __fit(self: 'Renderer', columns: int, lines: int) -> None:
+        """Resize the grids to the terminal size.
+
+        Args:
+            columns (int): The number of columns.
+            lines (int): The number of lines.
         """
-        if not self.rendering:
-            raise Exception('The renderer is not running. Please call Renderer.start() first.')
+        if columns == self.__columns and lines == self.__lines:
+            return
+        self.__columns = columns
+        self.__lines = lines
+        self.__chars = [[' '] * columns for _ in range(lines)]
+        self.__styles = [[DEFAULT_STYLE] * columns for _ in range(lines)]
+        self.__reset_front()
 
-        # Request cursor position.
-        sys.stdout.write('\x1b[6n')
-        sys.stdout.flush()
+    def __reset_front(self: 'Renderer') -> None:
+        """Forget what the terminal displays, so that the next refresh sends every cell."""
+        self.__front_chars = [[None] * self.__columns for _ in range(self.__lines)]
+        self.__front_styles = [[None] * self.__columns for _ in range(self.__lines)]
 
-        # Read response.
-        val = ""
-        while not (val := val + sys.stdin.read(1)).endswith('R'):
-            continue
+    def __put(self: 'Renderer', x: int, y: int, text: str, style: str) -> None:
+        """Put a text in the back grid.
 
-        # Parse response.
-        val = re.match(r'\x1b\[(\d+);(\d+)R', val).groups()
-        return int(val[1]) - 1, int(val[0]) - 1
+        Args:
+            x (int): The x.
+            y (int): The y.
+            text (str): The text. It must fit in the line.
+            style (str): The style.
+        """
+        self.__chars[y][x:x + len(text)] = text
+        self.__styles[y][x:x + len(text)] = [style] * len(text)
 
     def goto(self: 'Renderer', x: int, y: int) -> None:
         """Go to the specified position.
@@ -96,7 +397,7 @@ class Renderer:
             x (int): The x.
             y (int): The y.
         """
-        self.buffer += f'\x1b[{y+1};{x+1}H'
+        self.buffer.write(f'\x1b[{y+1};{x+1}H')
 
     def addstr(
             self: 'Renderer',
@@ -123,8 +424,10 @@ class Renderer:
         Returns:
             tuple[int, int]: The number of columns and the number of lines.
         """
+        self.addstr_calls += 1
+
         # Verify arguments.
-        size = os.get_terminal_size()
+        size = self.get_terminal_size()
         if width == -1:
             width = size.columns
         if height == -1:
@@ -135,110 +438,25 @@ class Renderer:
         width = max(0, min(width, size.columns - x))
         height = max(0, min(height, size.lines - y))
 
-        # Init.
-        cursor_x = 0
-        cursor_y = -scroll
-        saved_cursor_x = 0
-        saved_cursor_y = 0
-        self.goto(x + cursor_x, y + cursor_y)
-
-        # Init line count.
-        buffer_backup = self.buffer
-        cursor_min_x = cursor_x
-        cursor_max_x = cursor_x
-        cursor_min_y = cursor_y
-        cursor_max_y = cursor_y
-
-        strings = re.split(FULL_EXPR, text)
-        for i, string in enumerate(strings):
-            if i % 2 == 0:
-                # Normal string.
-                for char in string:
-                    if cursor_x >= width:
-                        if not wrap:
-                            self.goto(x + cursor_x - 1, y + cursor_y)
-                            self.buffer += '…'
-                            break
-                        # Wrap.
-                        cursor_x = 0
-                        cursor_y += 1
-                        self.goto(x, y + cursor_y)
-
-                    # Add char.
-                    if 0 <= cursor_y < height:
-                        self.buffer += char
-                    cursor_x += 1
-
-                    # Update maxes.
-                    if cursor_x > cursor_max_x:
-                        cursor_max_x = cursor_x
-                    if cursor_y > cursor_max_y:
-                        cursor_max_y = cursor_y
-            else:
-                # Escape sequence.
-                if re.match(COLOR_EXPR, string):
-                    self.buffer += string
-                elif re.match(SAVE_EXPR, string):
-                    self.buffer += string
-                    saved_cursor_x, saved_cursor_y = self.get_cursor_pos()
-                    saved_cursor_x -= x
-                    saved_cursor_y -= y
-                elif re.match(RESTORE_EXPR, string):
-                    self.buffer += string
-                    self.goto(x + saved_cursor_x, y + saved_cursor_y)
-                    cursor_x = saved_cursor_x
-                    cursor_y = saved_cursor_y - scroll
-                elif re.match(GOTO_EXPR, string):
-                    cursor_x, cursor_y = re.match(GOTO_EXPR, string).groups()
-                    cursor_x = int(cursor_x) - 1
-                    cursor_y = int(cursor_y) - 1 - scroll
-                    self.goto(x + cursor_x, y + cursor_y)
-                elif re.match(RETURN_EXPR, string):
-                    cursor_x = 0
-                    self.goto(x, y + cursor_y)
-                elif re.match(NEWLINE_EXPR, string):
-                    cursor_x = 0
-                    cursor_y += 1
-                    self.goto(x, y + cursor_y)
-                elif re.match(TAB_EXPR, string):
-                    cursor_x += TAB_WIDTH - cursor_x % TAB_WIDTH
-                    if cursor_x >= width:
-                        # Wrap.
-                        cursor_x = 0
-                        cursor_y += 1
-                        self.goto(x, y + cursor_y)
-                elif re.match(ERASE_END_OF_LINE_EXPR, string):
-                    self.buffer += ' ' * (width - cursor_x)
-                    self.goto(x + cursor_x, y + cursor_y)
-                elif re.match(RETURN_ERASE_END_OF_LINE_EXPR, string):
-                    cursor_x = 0
-                    self.goto(x, y + cursor_y)
-                    self.buffer += ' ' * width
-                    self.goto(x, y + cursor_y)
-                elif re.match(MOVE_UP_EXPR, string):
-                    value = re.match(r'\x1b\[(\d*)A', string).groups()[0]
-                    if value == '':
-                        value = 1
-                    cursor_y -= int(value)
-                    self.goto(x + cursor_x, y + cursor_y)
-                else:
-                    raise Exception('Invalid escape sequence.')
-
-            # Update cursor min and max y.
-            if cursor_x < cursor_min_x:
-                cursor_min_x = cursor_x
-            if cursor_x > cursor_max_x:
-                cursor_max_x = cursor_x
-            if cursor_y < cursor_min_y:
-                cursor_min_y = cursor_y
-            if cursor_y > cursor_max_y:
-                cursor_max_y = cursor_y
-
-        # Restore buffer.
-        if no_draw:
-            self.buffer = buffer_backup
-
-        return cursor_max_x - cursor_min_x, cursor_max_y - cursor_min_y
+        if not no_draw:
+            self.__fit(size.columns, size.lines)
+
+        def draw(column: int, row: int, text: str, style: str) -> None:
+            row -= scroll
+            if column < 0:
+                # Clip the text at the left of the box.
+                text = text[-column:]
+                column = 0
+            if 0 <= row < height and text:
+                self.__put(x + column, y + row, text, style)
+
+        # Saved cursor positions are tracked by the layout, without querying the terminal.
+        layout = Layout(width, wrap=wrap, style=self.style, draw=None if no_draw else draw)
+        layout.feed(text)
+        if not no_draw:
+            self.style = layout.style
+
+        return layout.get_size()
 
     @staticmethod
     def get_size(
@@ -253,7 +471,10 @@ class Renderer:
 
         Returns:
             tuple[int, int]: The number of columns and the number of lines.
+
+        The width is limited to the terminal width, as last read by a renderer.
         """
-        renderer = Renderer()
-        size = renderer.addstr(test, width=width, no_draw=True)
-        return size
+        columns = (Renderer.last_size or os.get_terminal_size()).columns
+        layout = Layout(max(0, min(columns if width == -1 else width, columns)))
+        layout.feed(test)
+        return layout.get_size()
@@ -0,0 +1,72 @@
+import functools
+
+
+DEFAULT_STYLE = ''
+
+
+@functools.lru_cache(maxsize=4096)
+def apply_sgr(style: str, sequence: str) -> str:
+    """Apply an SGR escape sequence to a style.
+
+    Styles are stored in a canonical form, so that two cells looking the same always have the same style.
+
+    Args:
+        style (str): The current style. `DEFAULT_STYLE` or a value returned by this function.
+        sequence (str): The SGR escape sequence, e.g. `'\\x1b[1;32m'`.
+
+    Returns:
+        str: The resulting style.
+    """
+    params = style[4:-1] + ';' if style else ''
+    params += sequence[2:-1]
+    codes = params.split(';')
+
+    attributes = set()
+    foreground = background = underline = None
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        i += 1
+        if code in ('', '0'):
+            attributes.clear()
+            foreground = background = underline = None
+        elif code in ('38', '48', '58'):
+            # Extended color: 5;n or 2;r;g;b.
+            length = 2 if i < len(codes) and codes[i] == '5' else 4
+            color = ';'.join([code] + codes[i:i + length])
+            i += length
+            if code == '38':
+                foreground = color
+            elif code == '48':
+                background = color
+            else:
+                underline = color
+        elif code == '39':
+            foreground = None
+        elif code == '49':
+            background = None
+        elif code == '59':
+            underline = None
+        elif '30' <= code <= '37' and len(code) == 2 or '90' <= code <= '97' and len(code) == 2:
+            foreground = code
+        elif '40' <= code <= '47' and len(code) == 2 or '100' <= code <= '107' and len(code) == 3:
+            background = code
+        elif code in ('22', '23', '24', '25', '27', '28', '29'):
+            # Attribute reset.
+            attributes -= {
+                '22': {'1', '2'},
+                '23': {'3'},
+                '24': {'4', '21'},
+                '25': {'5', '6'},
+                '27': {'7'},
+                '28': {'8'},
+                '29': {'9'},
+            }[code]
+        else:
+            attributes.add(code.lstrip('0') or '0')
+
+    parts = sorted(attributes, key=int)
+    parts += [color for color in (foreground, background, underline) if color is not None]
+    if len(parts) == 0:
+        return DEFAULT_STYLE
+    return '\x1b[0;' + ';'.join(parts) + 'm'
@@ -0,0 +1,439 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import count
+from typing import Sequence
+
+from .layout import Layout
+from .vars import HIT_COLOR, HIT_END_COLOR
+
+
+# Numbers the texts whose offsets start counting from 0, see `Subtext.get_span`.
+TEXT_IDS = count()
+
+SEARCH_SLICE_SIZE = 1 << 20  # The number of chars searched at once, see `prepare_search`.
+
+def get_hit_bounds(
+        start: int,
+        end: int,
+        hits: Sequence[int],
+        length: int,
+) -> list[tuple[int, int]]:
+    """Get the hits of a search overlapping a part of a text.
+
+    Args:
+        start (int): The start offset of the part.
+        end (int): The end offset of the part.
+        hits (Sequence[int]): The sorted offsets of the hits.
+        length (int): The length of a hit.
+
+    Returns:
+        list[tuple[int, int]]: The start and the end of each hit, relative to the part and cut to it.
+    """
+    bounds = []
+    for i in range(bisect_left(hits, start - length + 1), len(hits)):
+        if hits[i] >= end:
+            break
+        bounds.append((max(0, hits[i] - start), min(end, hits[i] + length) - start))
+    return bounds
+
+
+def prepare_search(
+        text: str | Sequence[str],
+        query: str,
+        start: int = 0,
+        skip: int = 0,
+) -> 'function[[threading.Event], array]':
+    """Prepare a search of a text, ignoring case.
+
+    The text is searched a slice at a time, so that a long search lets the other threads run, and can be
+    cancelled between two slices.
+
+    Args:
+        text (str | Sequence[str]): The text, or the chunks it is made of.
+        query (str): The query.
+        start (int, optional): The offset of the first char searched, added to the offsets of the hits. Defaults to 0.
+        skip (int, optional): The number of chars at the beginning of the text not searched. Defaults to 0.
+
+    Returns:
+        function[[threading.Event], array]: Searches the text, and returns the offsets of the hits. If the optional
+            event gets set, it stops and returns the hits found so far.
+    """
+    chunks = [text] if isinstance(text, str) else text
+    expression = re.compile(re.escape(query), re.IGNORECASE)
+    overlap_length = len(query) - 1
+
+    def search(cancel: threading.Event = None) -> array:
+        hits = array('q')
+        offset = start  # The offset of the next char to search.
+        overlap = ''
+        position = skip
+        for chunk in chunks:
+            while position < len(chunk):
+                if cancel is not None and cancel.is_set():
+                    return hits
+                piece = chunk[position:position + SEARCH_SLICE_SIZE]
+                # The end of the previous slice is searched again, for the hits across slices. It is too short to
+                # hold a whole hit, so no hit is found twice.
+                data = overlap + piece
+                hits.extend(offset - len(overlap) + match.start() for match in expression.finditer(data))
+                offset += len(piece)
+                position += len(piece)
+                overlap = data[max(0, len(data) - overlap_length):] if overlap_length > 0 else ''
+            position -= len(chunk)
+        return hits
+    return search
+
+
+class Subtext:
+    """A subtext that can grow.
+
+    The text is kept as a list of chunks, joined only when the whole text is needed. The layout
+    of each content width is updated incrementally, so that appending a chunk and counting the
+    lines cost time proportional to the chunk, not to the whole text. The row index of the layouts
+    gives access to any window of rows without going through the text before it.
+
+    A subtext can be bounded: once it holds more lines or chars than its limit, its oldest lines are
+    dropped as text is appended. The offsets of the chunks and of the rows keep counting from the
+    beginning of everything appended, so that dropping lines only forgets the chunks and the rows
+    before them.
+    """
+
+    MAX_LAYOUTS = 2  # The number of widths whose layout is kept.
+    CHUNK_SIZE = 1 << 16  # The size from which appended pieces are joined into a chunk.
+
+    def __init__(
+            self: 'Subtext',
+            text: str = '',
+    ) -> None:
+        """Initialize a subtext.
+
+        Args:
+            text (str, optional): The initial text. Defaults to ''.
+        """
+        self.__chunks: list[str] = [text] if text else []  # The joined chunks.
+        self.__starts: list[int] = [0] if text else []  # The offset of each chunk.
+        self.__tail: list[str] = []  # The pieces appended since the last chunk.
+        self.__tail_start = len(text)  # The offset of the first piece of the tail.
+        self.__start = 0  # The offset of the first char not dropped.
+        self.__length = len(text)  # The offset of the end of the text.
+        self.__layouts: dict[int, Layout] = {}
+        self.__text_id = next(TEXT_IDS)
+
+        self.__max_lines: int = None
+        self.__max_chars: int = None
+        self.__line_starts: deque[int] = None  # The offset of each line but the first, if the subtext is bounded.
+
+    def __len__(
+            self: 'Subtext',
+    ) -> int:
+        return self.__length - self.__start
+
+    def append(
+            self: 'Subtext',
+            chunk: str,
+    ) -> int:
+        """Append a chunk of text.
+
+        Args:
+            chunk (str): The chunk.
+
+        Returns:
+            int: The number of rows dropped from the most recently used layout, if the subtext is bounded.
+        """
+        if not chunk:
+            return 0
+        if self.__line_starts is not None:
+            self.__index_lines(chunk, self.__length)
+        self.__tail.append(chunk)
+        self.__length += len(chunk)
+        if self.__length - self.__tail_start >= Subtext.CHUNK_SIZE:
+            self.__seal()
+        for layout in self.__layouts.values():
+            layout.feed(chunk, final=False)
+        return self.__evict()
+
+    def set_limit(
+            self: 'Subtext',
+            max_lines: int = None,
+            max_chars: int = None,
+    ) -> int:
+        """Bound the subtext.
+
+        The oldest lines are dropped whole, so the line being appended to is kept even if it exceeds
+        the limit on its own.
+
+        Args:
+            max_lines (int, optional): The maximum number of lines. Defaults to None means no limit.
+            max_chars (int, optional): The maximum number of chars. Defaults to None means no limit.
+
+        Returns:
+            int: The number of rows dropped from the most recently used layout.
+        """
+        self.__max_lines = max_lines
+        self.__max_chars = max_chars
+        if max_lines is None and max_chars is None:
+            self.__line_starts = None
+            return 0
+        if self.__line_starts is None:
+            self.__line_starts = deque()
+            self.__index_lines(self.get_text(), self.__start)
+        return self.__evict()
+
+    def get_text(
+            self: 'Subtext',
+    ) -> str:
+        """Get the text.
+
+        Returns:
+            str: The text.
+        """
+        first = self.__starts[0] if self.__chunks else self.__tail_start
+        if len(self.__chunks) + len(self.__tail) > 1 or first < self.__start:
+            text = ''.join(self.__chunks + self.__tail)
+            self.__chunks = [text[self.__start - first:]]
+            self.__starts = [self.__start]
+            self.__tail = []
+            self.__tail_start = self.__length
+        elif self.__tail:
+            self.__seal()
+        return self.__chunks[0] if self.__chunks else ''
+
+    def get_slice(
+            self: 'Subtext',
+            start: int,
+            end: int,
+    ) -> str:
+        """Get a part of the text, without joining the whole text.
+
+        Args:
+            start (int): The start offset.
+            end (int): The end offset.
+
+        Returns:
+            str: The text between the offsets.
+        """
+        return self.__get_slice(self.__start + max(0, start), self.__start + min(end, len(self)))
+
+    def __get_slice(
+            self: 'Subtext',
+            start: int,
+            end: int,
+    ) -> str:
+        """Get a part of the text, between offsets counted from the beginning of everything appended."""
+        if start >= end:
+            return ''
+        tail_start = self.__tail_start
+        if self.__tail and end > tail_start:
+            if len(self.__tail) > 1:
+                self.__tail = [''.join(self.__tail)]
+            tail = self.__tail[0]
+            if start >= tail_start:
+                return tail[start - tail_start:end - tail_start]
+            return self.__get_slice(start, tail_start) + tail[:end - tail_start]
+        first = bisect_right(self.__starts, start) - 1
+        last = bisect_right(self.__starts, end - 1) - 1
+        text = ''.join(self.__chunks[first:last + 1])
+        offset = self.__starts[first]
+        return text[start - offset:end - offset]
+
+    def get_window(
+            self: 'Subtext',
+            width: int,
+            scroll: int,
+            height: int,
+            hits: Sequence[int] = (),
+            query: str = '',
+    ) -> tuple[str, int] | None:
+        """Get the text displayed by a window of rows.
+
+        Args:
+            width (int): The width.
+            scroll (int): The first row of the window.
+            height (int): The number of rows of the window.
+            hits (Sequence[int], optional): The offsets of the hits of a search, highlighted in the window. Defaults to ().
+            query (str, optional): The query of the search. Defaults to ''.
+
+        Returns:
+            tuple[str, int] | None: The text, starting with the style of its first row, and the scroll to render it with.
+                None if the text moves the cursor up, so that the window cannot be isolated.
+        """
+        layout = self.get_layout(width)
+        if not layout.monotonic:
+            return None
+        rows = layout.rows
+        if height <= 0:
+            return '', 0
+
+        # The rows of a text waiting for the next append are not indexed yet.
+        row = layout.first_row + scroll
+        first = min(row, len(rows) - 1)
+        start = rows[first]
+        end = rows[row + height] if row + height < len(rows) else self.__length
+        text = self.__get_slice(start, end)
+        if hits:
+            pieces = []
+            position = 0
+            for hit_start, hit_end in get_hit_bounds(start, end, hits, len(query)):
+                pieces += [text[position:hit_start], HIT_COLOR, text[hit_start:hit_end], HIT_END_COLOR]
+                position = hit_end
+            text = ''.join(pieces) + text[position:]
+        return (layout.row_styles[first] or '\x1b[0m') + text, row - first
+
+    def get_row(
+            self: 'Subtext',
+            width: int,
+            offset: int,
+    ) -> int | None:
+        """Get the row displaying an offset, see `prepare_search`.
+
+        Args:
+            width (int): The width.
+            offset (int): The offset.
+
+        Returns:
+            int | None: The row, or None if the offset was dropped or if the text moves the cursor up.
+        """
+        layout = self.get_layout(width)
+        if not layout.monotonic or offset < self.__start:
+            return None
+        return bisect_right(layout.rows, offset, lo=layout.first_row) - 1 - layout.first_row
+
+    def get_span(
+            self: 'Subtext',
+    ) -> tuple[int, int, int]:
+        """Get the identity and the offsets of the text.
+
+        The offsets count from the beginning of everything appended. Appending text only moves the end, and dropping
+        lines only moves the start, so that the offsets of the hits of a search stay valid. The identity tells texts
+        whose offsets count from different beginnings apart.
+
+        Returns:
+            tuple[int, int, int]: The identity, the start offset and the end offset.
+        """
+        return self.__text_id, self.__start, self.__length
+
+    def prepare_search(
+            self: 'Subtext',
+            query: str,
+            since: int = None,
+    ) -> 'function[[threading.Event], array]':
+        """Prepare a search of the text, ignoring case.
+
+        The chunks of the text are only listed here, they are not joined. The search itself can run in another thread
+        while the subtext changes.
+
+        Args:
+            query (str): The query.
+            since (int, optional): The end offset of the text searched before, see `get_span`. Only the hits ending
+                after it are searched. Defaults to None means the whole text.
+
+        Returns:
+            function[[threading.Event], array]: Searches the text, and returns the offsets of the hits, see
+                `prepare_search`.
+        """
+        start = self.__start if since is None else max(self.__start, since - len(query) + 1)
+        first = max(0, bisect_right(self.__starts, start) - 1)
+        base = self.__starts[first] if self.__chunks else self.__tail_start
+        return prepare_search(self.__chunks[first:] + self.__tail, query, start, start - base)
+
+    def get_layout(
+            self: 'Subtext',
+            width: int,
+    ) -> 'Layout':
+        """Get the layout of the text at the specified width.
+
+        Args:
+            width (int): The width.
+
+        Returns:
+            Layout: The layout, with its row index.
+        """
+        width = max(0, width)
+        layout = self.__layouts.pop(width, None)
+        if layout is None:
+            layout = Layout(width, index=True, start=self.__start)
+            layout.feed(self.get_text(), final=False)
+
+        # Keep the most recently used layouts.
+        self.__layouts[width] = layout
+        while len(self.__layouts) > Subtext.MAX_LAYOUTS:
+            del self.__layouts[next(iter(self.__layouts))]
+        return layout
+
+    def get_size(
+            self: 'Subtext',
+            width: int,
+    ) -> tuple[int, int]:
+        """Get the size of the text at the specified width.
+
+        Args:
+            width (int): The width.
+
+        Returns:
+            tuple[int, int]: The number of columns and the number of lines.
+        """
+        return self.get_layout(width).get_size()
+
+    def __seal(
+            self: 'Subtext',
+    ) -> None:
+        """Join the appended pieces into a chunk."""
+        self.__starts.append(self.__tail_start)
+        self.__chunks.append(''.join(self.__tail))
+        self.__tail = []
+        self.__tail_start = self.__length
+
+    def __index_lines(
+            self: 'Subtext',
+            text: str,
+            offset: int,
+    ) -> None:
+        """Record the offset of the lines starting in a text appended at an offset."""
+        line_starts = self.__line_starts
+        position = text.find('\n')
+        while position != -1:
+            line_starts.append(offset + position + 1)
+            position = text.find('\n', position + 1)
+
+    def __evict(
+            self: 'Subtext',
+    ) -> int:
+        """Drop the oldest lines exceeding the limits.
+
+        Returns:
+            int: The number of rows dropped from the most recently used layout.
+        """
+        line_starts = self.__line_starts
+        if line_starts is None:
+            return 0
+        start = self.__start
+        if self.__max_lines is not None:
+            while line_starts and len(line_starts) + 1 > self.__max_lines:
+                start = line_starts.popleft()
+        if self.__max_chars is not None:
+            while line_starts and self.__length - start > self.__max_chars:
+                start = line_starts.popleft()
+        if start == self.__start:
+            return 0
+        self.__start = start
+
+        # Forget the chunks before the new start.
+        count = bisect_right(self.__starts, start) - 1
+        if count > 0:
+            del self.__chunks[:count]
+            del self.__starts[:count]
+
+        # Drop the rows before the new start. The start of a line is the start of a row.
+        dropped = 0
+        for width, layout in list(self.__layouts.items()):
+            if not layout.monotonic:
+                # The rows are not indexed, lay the text out again when needed.
+                del self.__layouts[width]
+                dropped = 0
+                continue
+            dropped = bisect_left(layout.rows, start, lo=layout.first_row) - layout.first_row
+            layout.drop_rows(dropped)
+        return dropped
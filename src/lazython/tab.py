@@ -1,14 +1,28 @@
+import threading
+import contextlib
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import cmp_to_key
+from itertools import chain
+from typing import Any, Hashable, Iterable
+
 from .line import Line
+from .linelist import LineList
+from .linestore import LineStore, SLOT_MASK
 from .box import Box
 from .renderer import Renderer
 from .vars import *
 from .shortcut import Shortcut
+from .keymap import Keymap
+from .textindex import TextIndex
+from .listener import key_text
 
 
 class Tab:
     """The tab class."""
 
     ID: int = 0
+    DESCENDING = cmp_to_key(lambda a, b: (a < b) - (a > b))  # Wraps a sort key to sort in descending order.
 
     def __init__(
             self: 'Tab',
@@ -25,7 +39,30 @@ class Tab:
         self.__height_weight = height_weight  # The weight of the tab in the height calculation.
         self.__min_height = min_height  # The minimum height of the tab. It does not include the top and bottom lines.
 
-        self.__lines: list[Line] = []
+        self.__store = LineStore(renderer=renderer)  # The data of the lines.
+        self.__lines = LineList()  # The ids of the lines, in display order.
+        self.__keys: dict[Hashable, int] = {}  # The id of the lines added with a key.
+        self.__line_keys: dict[int, Hashable] = {}  # The key of each line added with one, by line id.
+        self.__store.on_set_text = self.__on_set_text
+        self.__no_line = Line.from_store(self.__store, SLOT_MASK)  # A handle on no line, selected while the tab is empty.
+
+        self.__query = ''  # The filter query, empty if the lines are not filtered.
+        self.__typing: str = None  # The query being typed, 'filter' or 'search', None if none.
+        self.__input = ''  # The text typed in the query.
+        self.__index: TextIndex = None  # The trigram index of the line texts, built by the first filter.
+        self.__index_log: list[tuple[bool, int, str]] = None  # The texts added and removed while the index is built.
+        self.__view = self.__lines  # The ids of the displayed lines: all the lines, or the ones matching the filter.
+
+        self.__sort_key: 'function[[Line], Any]' = None  # The key the lines are sorted by, None if they are not sorted.
+        self.__sort_reverse = False
+        self.__sort_values: dict[int, Any] = {}  # The sort key of each line, by line id.
+
+        self.__search = ''  # The query searched in the selected subtext, empty if none.
+        self.__search_key: tuple = None  # The line id, the subtab, the query and the subtext span of the last search.
+        self.__hits: array = None  # The offsets of the hits of the last search, None while it runs.
+        self.__searching = False  # Whether a search of the selected subtext is running.
+        self.__hit = -1  # The index of the hit jumped to, -1 if none.
+        self.__jump = 0  # The direction of a jump waiting for the search to end.
 
         self.__tab_box = Box(width=0, height=0, x=0, y=0)
         self.__content_box = Box(width=0, height=0, x=0, y=0)
@@ -36,7 +73,7 @@ class Tab:
         self.__tab_scroll = 0
         self.__content_scroll = 0
 
-        self.__shortcuts: list[Shortcut] = []
+        self.__keymap = Keymap()
 
         self.__selected = False
 
@@ -47,7 +84,7 @@ class Tab:
 
     def add_key(
             self: 'Tab',
-            key: int,
+            key: int | tuple[int, ...],
             callback: 'function',
             name: str = None,
             help: str = None,
@@ -55,26 +92,28 @@ class Tab:
         """Add a key shortcut.
 
         Args:
-            key (int): The key.
+            key (int | tuple[int, ...]): The key, or the chord of keys pressed one after the other.
             callback (function): The callback.
             name (str): The name. Defaults to None means no display in the menu.
             help (str): The help. Defaults to None means no display in the menu.
         """
-        self.__shortcuts.append(Shortcut(key=key, callback=callback, name=name, help=help))
+        with self.__get_lock():
+            self.__keymap.add(Shortcut(key=key, callback=callback, name=name, help=help))
+            self.__invalidate()
 
     def get_key_callbacks(
             self: 'Tab',
-            key: int,
+            key: int | tuple[int, ...],
     ) -> list['function']:
         """Get the key callbacks.
 
         Args:
-            key (int): The key.
+            key (int | tuple[int, ...]): The key or the chord.
 
         Returns:
             list[function]: The callbacks.
         """
-        return [shortcut.callback for shortcut in self.__shortcuts if shortcut.key == key]
+        return [shortcut.callback for shortcut in self.__keymap.get(Keymap.get_keys(key))]
 
     def get_shortcuts(
             self: 'Tab',
@@ -84,18 +123,71 @@ class Tab:
         Returns:
             list[Shortcut]: The shortcuts.
         """
-        return self.__shortcuts
+        return self.__keymap.get_shortcuts()
+
+    def get_name(
+            self: 'Tab',
+    ) -> str:
+        """Get the name.
+
+        Returns:
+            str: The name.
+        """
+        return self.__name
+
+    def get_subtabs(
+            self: 'Tab',
+    ) -> list[str]:
+        """Get the subtab names.
+
+        Returns:
+            list[str]: The subtab names.
+        """
+        return self.__subtabs
+
+    def get_keymap(
+            self: 'Tab',
+    ) -> 'Keymap':
+        """Get the keymap of the tab.
+
+        Returns:
+            Keymap: The keymap.
+        """
+        return self.__keymap
+
+    def batch(
+            self: 'Tab',
+    ) -> 'contextlib.AbstractContextManager':
+        """Group mutations into a single frame.
+
+        Example:
+            with tab.batch():
+                for line, status in zip(lines, statuses):
+                    line.set_text(status)
+
+        Returns:
+            contextlib.AbstractContextManager: The batch context, see `Renderer.batch`.
+        """
+        if self.__renderer is None:
+            # Nothing is rendered, the lines are only locked.
+            return self.__get_lock()
+        return self.__renderer.batch()
 
     def add_line(
             self: 'Tab',
             text: str = '',
             subtexts: list[str] = [],
+            key: Hashable = None,
     ) -> 'Line':
         """Add a line to the tab.
 
         Args:
             text (str, optional): The line text. Defaults to ''.
             subtexts (list[str], optional): The line contents. Defaults to [].
+            key (Hashable, optional): A key to find the line with `get_line_by_key`. Defaults to None means no key.
+
+        Raises:
+            ValueError: If a line of the tab already has the key.
 
         Returns:
             Line: The line.
@@ -103,15 +195,114 @@ class Tab:
         The line text will be rendered on the tab.
         The line contents will be rendered on the content box, in the corresponding subtab.
         """
-        new_line = Line(text=text, subtexts=subtexts)
-        self.__lines.append(new_line)
-        return new_line
+        with self.__get_lock():
+            if key is not None and key in self.__keys:
+                raise ValueError(f'A line with the key {key!r} already exists.')
+            id = self.__store.add(text, subtexts)
+            if key is not None:
+                self.__keys[key] = id
+                self.__line_keys[id] = key
+            if self.__sort_key is None:
+                self.__lines.append(id)
+                self.__add_to_filter([id])
+            else:
+                selected_id = self.__get_selected_id()
+                self.__sort_lines([id])
+                self.__add_to_filter([id])
+                self.__select_id(selected_id)
+            self.__invalidate()
+            return Line.from_store(self.__store, id)
+
+    def add_lines(
+            self: 'Tab',
+            lines: 'Iterable[str | tuple[str, list[str]]]',
+    ) -> list['Line']:
+        """Add lines to the tab.
+
+        The iterable is consumed before the tab is locked, then the lines are added at once, for a single frame.
+
+        Args:
+            lines (Iterable[str | tuple[str, list[str]]]): The text of each line, or its text and its contents.
+                It can be a generator.
+
+        Returns:
+            list[Line]: The lines.
+        """
+        lines = list(lines)
+        with self.__get_lock():
+            ids = self.__add_to_store(lines)
+            if self.__sort_key is None:
+                self.__lines.extend(ids)
+                self.__add_to_filter(ids)
+            else:
+                selected_id = self.__get_selected_id()
+                self.__sort_lines(ids)
+                self.__add_to_filter(ids)
+                self.__select_id(selected_id)
+            if len(ids) > 0:
+                self.__invalidate()
+            return [Line.from_store(self.__store, id) for id in ids]
+
+    def replace_lines(
+            self: 'Tab',
+            lines: 'Iterable[str | tuple[str, list[str]]]',
+    ) -> list['Line']:
+        """Replace the lines of the tab.
+
+        The selected line index and the tab scroll are kept, as far as the new lines allow it.
+
+        Args:
+            lines (Iterable[str | tuple[str, list[str]]]): The text of each line, or its text and its contents.
+                It can be a generator.
+
+        Returns:
+            list[Line]: The lines.
+        """
+        lines = list(lines)
+        with self.__get_lock():
+            self.__store.clear()
+            ids = self.__add_to_store(lines)
+            self.__lines = LineList(ids)
+            self.__view = self.__lines
+            self.__sort_values = {}
+            if self.__sort_key is not None:
+                self.__sort_lines(ids)
+            self.__keys = {}
+            self.__line_keys = {}
+            self.__index = None
+            self.__index_log = None
+            self.__view = self.__get_matches() if self.__query else self.__lines
+            self.__selected_line = max(0, min(self.__selected_line, len(self.__view) - 1))
+            self.__tab_scroll = min(self.__tab_scroll, self.__selected_line)
+            self.__update_tab_scroll()
+            self.__update_content_scroll()
+            self.__invalidate()
+            return [Line.from_store(self.__store, id) for id in ids]
+
+    def __add_to_store(
+            self: 'Tab',
+            lines: list[str | tuple[str, list[str]]],
+    ) -> list[int]:
+        add = self.__store.add
+        return [add(line) if isinstance(line, str) else add(line[0], line[1]) for line in lines]
 
     def clear_lines(
             self: 'Tab',
     ) -> None:
         """Clear the lines."""
-        self.__lines = []
+        with self.__get_lock():
+            self.__store.clear()
+            self.__lines.clear()
+            self.__sort_values = {}
+            self.__keys = {}
+            self.__line_keys = {}
+            self.__index = None
+            self.__index_log = None
+            self.__view = LineList() if self.__query else self.__lines
+            self.__selected_line = 0
+            self.__tab_scroll = 0
+            self.__update_content_scroll()
+            self.__invalidate()
 
     def delete_line(
             self: 'Tab',
@@ -121,8 +312,171 @@ class Tab:
 
         Args:
             line (Line): The line.
+
+        Raises:
+            ValueError: If the line is not in the tab.
+        """
+        with self.__get_lock():
+            id = self.__get_id(line)
+            index = self.__lines.remove(id)
+            if self.__view is not self.__lines:
+                index = self.__view.remove(id) if id in self.__view else None
+            self.__index_text(id, line.get_text(), False)
+            self.__sort_values.pop(id, None)
+            self.__store.remove(id)
+            key = self.__line_keys.pop(id, None)
+            if key is not None:
+                del self.__keys[key]
+
+            # Keep the selection in range, on the same line if it is not the deleted one.
+            if index is not None and index < self.__selected_line or self.__selected_line >= len(self.__view):
+                self.__selected_line = max(0, self.__selected_line - 1)
+            if index is not None and index < self.__tab_scroll:
+                self.__tab_scroll -= 1
+            self.__tab_scroll = min(self.__tab_scroll, self.__selected_line)
+            self.__update_content_scroll()
+            self.__invalidate()
+
+    def move_line(
+            self: 'Tab',
+            line: 'Line',
+            index: int,
+    ) -> None:
+        """Move a line to another index. The selected line stays selected.
+
+        Args:
+            line (Line): The line.
+            index (int): The index of the line once moved.
+
+        Raises:
+            ValueError: If the line is not in the tab, or if the lines are sorted, see `set_sort_key`.
+        """
+        with self.__get_lock():
+            id = self.__get_id(line)
+            if self.__sort_key is not None:
+                raise ValueError('The lines of a sorted tab cannot be moved.')
+            selected_id = self.__get_selected_id()
+            self.__lines.move(id, index)
+            if self.__view is not self.__lines and id in self.__view:
+                # Keep the matching lines in the order of the lines.
+                self.__view.remove(id)
+                self.__insert_in_view(id)
+            self.__select_id(selected_id)
+            self.__update_tab_scroll()
+            self.__invalidate()
+
+    def set_sort_key(
+            self: 'Tab',
+            key: 'function[[Line], Any]' = None,
+            reverse: bool = False,
+    ) -> None:
+        """Sort the lines by a key. The selected line stays selected.
+
+        The lines then stay sorted: added lines are inserted at their place, and a line whose text is set is
+        moved if its key changed. If the key depends on something else than the line text, call `update_sort`
+        when it changes. Only the lines whose key changed are moved, and lines with equal keys keep their order.
+
+        Example:
+            tab.set_sort_key(lambda line: cpu[line], reverse=True)
+            ...
+            cpu[line] = 12.5
+            tab.update_sort([line])
+
+        Args:
+            key (function[[Line], Any], optional): Gets the key of a line. Defaults to None means the lines are not
+                sorted anymore, they keep their current order.
+            reverse (bool, optional): Sort in descending order. Defaults to False.
+        """
+        with self.__get_lock():
+            self.__sort_key = key
+            self.__sort_reverse = reverse
+            self.__sort_values = {}
+            if key is None:
+                return
+            selected_id = self.__get_selected_id()
+            self.__sort_lines(list(self.__lines))
+            self.__select_id(selected_id)
+            self.__invalidate()
+
+    def update_sort(
+            self: 'Tab',
+            lines: 'Iterable[Line]' = None,
+    ) -> None:
+        """Move the lines whose sort key changed to their place, see `set_sort_key`. The selected line stays selected.
+
+        Args:
+            lines (Iterable[Line], optional): The lines whose key may have changed. Defaults to None means all the lines.
+
+        Raises:
+            ValueError: If a line is not in the tab.
         """
-        self.__lines.remove(line)
+        with self.__get_lock():
+            if self.__sort_key is None:
+                return
+            ids = list(self.__lines) if lines is None else [self.__get_id(line) for line in lines]
+            selected_id = self.__get_selected_id()
+            if self.__sort_lines(ids):
+                self.__select_id(selected_id)
+                self.__invalidate()
+
+    def get_line(
+            self: 'Tab',
+            id: int,
+    ) -> 'Line | None':
+        """Get a line by its id.
+
+        Args:
+            id (int): The line id, see `Line.get_id`.
+
+        Returns:
+            Line | None: The line, or None if the tab has no line with this id.
+        """
+        with self.__get_lock():
+            if self.__store.get_slot(id) is None:
+                return None
+            return Line.from_store(self.__store, id)
+
+    def get_line_by_key(
+            self: 'Tab',
+            key: Hashable,
+    ) -> 'Line | None':
+        """Get a line by the key it was added with.
+
+        Args:
+            key (Hashable): The key.
+
+        Returns:
+            Line | None: The line, or None if the tab has no line with this key.
+        """
+        with self.__get_lock():
+            id = self.__keys.get(key)
+            return Line.from_store(self.__store, id) if id is not None else None
+
+    def get_line_index(
+            self: 'Tab',
+            line: 'Line',
+    ) -> int:
+        """Get the index of a line.
+
+        Args:
+            line (Line): The line.
+
+        Raises:
+            ValueError: If the line is not in the tab.
+
+        Returns:
+            int: The index.
+        """
+        with self.__get_lock():
+            return self.__lines.index(self.__get_id(line))
+
+    def __get_id(
+            self: 'Tab',
+            line: 'Line',
+    ) -> int:
+        if line.get_store() is not self.__store or self.__store.get_slot(line.get_id()) is None:
+            raise ValueError('The line is not in the tab.')
+        return line.get_id()
 
     def set_tab_width(
             self: 'Tab',
@@ -216,23 +570,27 @@ class Tab:
             self: 'Tab',
     ) -> None:
         """Select the next line."""
-        if len(self.__lines) == 0:
-            return
-        self.__selected_line += 1
-        self.__selected_line %= len(self.__lines)
-        self.__update_tab_scroll()
-        self.__update_content_scroll()
+        with self.__get_lock():
+            if len(self.__view) == 0:
+                return
+            self.__selected_line += 1
+            self.__selected_line %= len(self.__view)
+            self.__update_tab_scroll()
+            self.__update_content_scroll()
+            self.__invalidate()
 
     def previous_line(
             self: 'Tab',
     ) -> None:
         """Select the previous line."""
-        if len(self.__lines) == 0:
-            return
-        self.__selected_line -= 1
-        self.__selected_line %= len(self.__lines)
-        self.__update_tab_scroll()
-        self.__update_content_scroll()
+        with self.__get_lock():
+            if len(self.__view) == 0:
+                return
+            self.__selected_line -= 1
+            self.__selected_line %= len(self.__view)
+            self.__update_tab_scroll()
+            self.__update_content_scroll()
+            self.__invalidate()
 
     def select_line(
             self: 'Tab',
@@ -243,30 +601,250 @@ class Tab:
         Args:
             line (int): The line.
         """
-        self.__selected_line = line
-        self.__selected_line %= len(self.__lines)
-        self.__update_tab_scroll()
-        self.__update_content_scroll()
+        with self.__get_lock():
+            self.__selected_line = line
+            self.__selected_line %= len(self.__view)
+            self.__update_tab_scroll()
+            self.__update_content_scroll()
+            self.__invalidate()
+
+    def show_line(
+            self: 'Tab',
+            line: 'Line',
+    ) -> None:
+        """Select a line, clearing the filter if it hides the line.
+
+        Args:
+            line (Line): The line.
+
+        Raises:
+            ValueError: If the line is not in the tab.
+        """
+        with self.__get_lock():
+            id = self.__get_id(line)
+            if id not in self.__view:
+                self.set_filter('')
+            self.select_line(self.__view.index(id))
+
+    def select_subtab(
+            self: 'Tab',
+            subtab: int,
+    ) -> None:
+        """Select the specified subtab.
+
+        Args:
+            subtab (int): The subtab.
+        """
+        with self.__get_lock():
+            if len(self.__subtabs) == 0:
+                return
+            self.__selected_subtab = subtab % len(self.__subtabs)
+            self.__update_content_scroll()
+            self.__invalidate()
 
     def next_subtab(
             self: 'Tab',
     ) -> None:
         """Select the next subtab."""
-        if len(self.__subtabs) == 0:
-            return
-        self.__selected_subtab += 1
-        self.__selected_subtab %= len(self.__subtabs)
-        self.__update_content_scroll()
+        with self.__get_lock():
+            if len(self.__subtabs) == 0:
+                return
+            self.__selected_subtab += 1
+            self.__selected_subtab %= len(self.__subtabs)
+            self.__update_content_scroll()
+            self.__invalidate()
 
     def previous_subtab(
             self: 'Tab',
     ) -> None:
         """Select the previous subtab."""
-        if len(self.__subtabs) == 0:
-            return
-        self.__selected_subtab -= 1
-        self.__selected_subtab %= len(self.__subtabs)
-        self.__update_content_scroll()
+        with self.__get_lock():
+            if len(self.__subtabs) == 0:
+                return
+            self.__selected_subtab -= 1
+            self.__selected_subtab %= len(self.__subtabs)
+            self.__update_content_scroll()
+            self.__invalidate()
+
+    def set_filter(
+            self: 'Tab',
+            query: str,
+    ) -> None:
+        """Display only the lines whose text contains a query, ignoring case.
+
+        The texts are indexed by trigrams the first time a query needs it, and the index is then kept
+        up to date as lines are added, deleted or changed. A query extending the previous one is only
+        checked against the lines matching the previous one. The selected line stays selected if it matches.
+
+        Args:
+            query (str): The query. An empty query displays all the lines.
+        """
+        with self.__get_lock():
+            if query == self.__query:
+                return
+            previous = self.__query
+            selected_id = self.__get_selected_id()
+            self.__query = query
+            if not query:
+                self.__view = self.__lines
+            elif previous and previous.lower() in query.lower():
+                # Refine the lines matching the previous query.
+                self.__view = LineList(self.__filter_ids(self.__view))
+            else:
+                self.__view = self.__get_matches()
+            self.__select_id(selected_id)
+            self.__update_content_scroll()
+            self.__invalidate()
+
+    def get_filter(
+            self: 'Tab',
+    ) -> str:
+        """Get the filter query.
+
+        Returns:
+            str: The query, empty if the lines are not filtered.
+        """
+        return self.__query
+
+    def start_filter(
+            self: 'Tab',
+    ) -> None:
+        """Start typing the filter query.
+
+        The next printable keys are added to the query, `backspace` removes the last char, `enter`
+        keeps the query and `esc` clears it, see `type_key`.
+        """
+        with self.__get_lock():
+            self.__typing = 'filter'
+            self.__input = self.__query
+            self.__invalidate()
+
+    def start_search(
+            self: 'Tab',
+    ) -> None:
+        """Start typing the query searched in the selected subtext.
+
+        The next printable keys are added to the query, `backspace` removes the last char, `enter`
+        searches the query and jumps to the first hit, and `esc` clears it, see `type_key`.
+        """
+        with self.__get_lock():
+            self.__typing = 'search'
+            self.__input = self.__search
+            self.__invalidate()
+
+    def type_key(
+            self: 'Tab',
+            key: int,
+    ) -> bool:
+        """Type a key in the query being typed.
+
+        Args:
+            key (int): The key code.
+
+        Returns:
+            bool: True if the key was typed in the query, False if no query is being typed or if the key is not text.
+        """
+        with self.__get_lock():
+            if self.__typing is None:
+                return False
+            set_query = self.set_filter if self.__typing == 'filter' else self.set_search
+            if key in (10, 13):
+                # `enter` keeps the query.
+                if self.__typing == 'search':
+                    self.set_search(self.__input)
+                    self.next_match()
+                self.__typing = None
+            elif key == 27:
+                # `esc` clears the query.
+                self.__typing = None
+                set_query('')
+            else:
+                if key in (8, 127):
+                    self.__input = self.__input[:-1]
+                else:
+                    text = key_text(key)
+                    if text is None:
+                        return False
+                    self.__input += text
+                if self.__typing == 'filter':
+                    # The lines are filtered as the query is typed.
+                    self.set_filter(self.__input)
+            self.__invalidate()
+            return True
+
+    def prepare_search(
+            self: 'Tab',
+            query: str,
+    ) -> list[tuple['Line', int, 'function[[threading.Event], array]']]:
+        """Prepare a search of the subtexts of all the lines, ignoring case.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            list[tuple[Line, int, function[[threading.Event], array]]]: The line, the subtab and the search of each
+                subtext, see `Line.prepare_subtext_search`. The searches can run in other threads.
+        """
+        with self.__get_lock():
+            searches = []
+            for id in self.__lines:
+                line = Line.from_store(self.__store, id)
+                for subtab in range(line.get_nb_subtext()):
+                    search = line.prepare_subtext_search(subtab, query)
+                    if search is not None:
+                        searches.append((line, subtab, search))
+            return searches
+
+    def set_search(
+            self: 'Tab',
+            query: str,
+    ) -> None:
+        """Search a query in the selected subtext, ignoring case, and highlight its hits.
+
+        The subtext is searched once, in a separate thread. The offset of each hit is then mapped to
+        its row by the row index of the subtext, so that jumping to a hit with `next_match` and
+        `previous_match` does not search or lay the subtext out again. The search runs again when
+        another subtext is selected, or when the subtext changed. When the subtext was only
+        appended to, only the appended text is searched, and the jumps go on from the current hit.
+
+        Args:
+            query (str): The query. An empty query stops the search.
+        """
+        with self.__get_lock():
+            if query == self.__search:
+                return
+            self.__search = query
+            self.__search_key = None
+            self.__hits = None
+            self.__searching = False
+            self.__jump = 0
+            if query:
+                self.__search_content()
+            self.__invalidate()
+
+    def get_search(
+            self: 'Tab',
+    ) -> str:
+        """Get the query searched in the selected subtext.
+
+        Returns:
+            str: The query, empty if there is no search.
+        """
+        return self.__search
+
+    def next_match(
+            self: 'Tab',
+    ) -> None:
+        """Scroll the content to the next hit of the search."""
+        with self.__get_lock():
+            self.__jump_to_hit(1)
+
+    def previous_match(
+            self: 'Tab',
+    ) -> None:
+        """Scroll the content to the previous hit of the search."""
+        with self.__get_lock():
+            self.__jump_to_hit(-1)
 
     def get_selected_line(
             self: 'Tab',
@@ -274,11 +852,12 @@ class Tab:
         """Get the selected line.
 
         Returns:
-            Line: The selected line.
+            Line: The selected line. If no line is displayed, a handle on no line, whose getters return default values
+                and whose setters do nothing.
         """
-        if len(self.__lines) == 0:
-            return Line()
-        return self.__lines[self.__selected_line]
+        if len(self.__view) == 0:
+            return self.__no_line
+        return Line.from_store(self.__store, self.__view[self.__selected_line])
 
     def get_nb_lines(
             self: 'Tab',
@@ -288,7 +867,7 @@ class Tab:
         Returns:
             int: The number of lines.
         """
-        return len(self.__lines)
+        return len(self.__view)
 
     def get_selected_subtext(
             self: 'Tab',
@@ -298,10 +877,10 @@ class Tab:
         Returns:
             str: The selected subtext.
         """
-        if len(self.__lines) == 0:
+        if len(self.__view) == 0:
             return ''
         line = self.get_selected_line()
-        if len(line.get_subtexts()) == 0:
+        if line.get_nb_subtext() == 0:
             return ''
         return line.get_subtext(self.__selected_subtab)
 
@@ -340,53 +919,60 @@ class Tab:
             scroll: int = 1,
     ) -> None:
         """Scroll up."""
-        line_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
-        if scroll < 0 or 0 <= line_scroll < scroll:
-            # Scroll to beginning.
-            self.get_selected_line().set_scroll(self.__selected_subtab, 0)
-            self.__content_scroll = 0
-            return
-
-        if line_scroll < 0:
-            # Start from the end.
-            _, line_count = Renderer.get_size(self.get_selected_subtext(), width=self.__content_box.get_width() - 2)
-            new_scroll = line_count - self.__content_box.get_height() + 2
-        else:
-            new_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
+        with self.__get_lock():
+            line_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
+            if scroll < 0 or 0 <= line_scroll < scroll:
+                # Scroll to beginning.
+                self.get_selected_line().set_scroll(self.__selected_subtab, 0)
+                self.__content_scroll = 0
+                self.__invalidate()
+                return
+
+            if line_scroll < 0:
+                # Start from the end.
+                line_count = self.__get_content_line_count()
+                new_scroll = line_count - self.__content_box.get_height() + 2
+            else:
+                new_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
 
-        # Scroll up.
-        new_scroll -= scroll
-        new_scroll = max(0, new_scroll)
-        self.get_selected_line().set_scroll(self.__selected_subtab, new_scroll)
-        self.__content_scroll = new_scroll
+            # Scroll up.
+            new_scroll -= scroll
+            new_scroll = max(0, new_scroll)
+            self.get_selected_line().set_scroll(self.__selected_subtab, new_scroll)
+            self.__content_scroll = new_scroll
+            self.__invalidate()
 
     def scroll_down(
             self: 'Tab',
             scroll: int = 1,
     ) -> None:
         """Scroll down."""
-        if scroll < 0:
-            # Scroll to end.
-            self.get_selected_line().set_scroll(self.__selected_subtab, -1)
-            self.__content_scroll = -1
-            return
-
-        line_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
-        if line_scroll < 0:
-            # Nothing to scroll, alreday at the end.
-            return
-
-        _, line_count = Renderer.get_size(self.get_selected_subtext(), width=self.__content_box.get_width() - 2)
-        new_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
-        new_scroll += scroll
-        if new_scroll > line_count - self.__content_box.get_height() + 2:
-            # Scroll to end.
-            self.get_selected_line().set_scroll(self.__selected_subtab, -1)
-            self.__content_scroll = -1
-            return
-
-        self.get_selected_line().set_scroll(self.__selected_subtab, new_scroll)
-        self.__content_scroll = new_scroll
+        with self.__get_lock():
+            if scroll < 0:
+                # Scroll to end.
+                self.get_selected_line().set_scroll(self.__selected_subtab, -1)
+                self.__content_scroll = -1
+                self.__invalidate()
+                return
+
+            line_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
+            if line_scroll < 0:
+                # Nothing to scroll, alreday at the end.
+                return
+
+            line_count = self.__get_content_line_count()
+            new_scroll = self.get_selected_line().get_scroll(self.__selected_subtab)
+            new_scroll += scroll
+            if new_scroll > line_count - self.__content_box.get_height() + 2:
+                # Scroll to end.
+                self.get_selected_line().set_scroll(self.__selected_subtab, -1)
+                self.__content_scroll = -1
+                self.__invalidate()
+                return
+
+            self.get_selected_line().set_scroll(self.__selected_subtab, new_scroll)
+            self.__content_scroll = new_scroll
+            self.__invalidate()
 
     def render_tab(
             self: 'Tab',
@@ -421,15 +1007,15 @@ class Tab:
         self.__renderer.addstr(text, x=x + 2 + used_width, y=y)
 
         # Right line.
-        if len(self.__lines) <= height - 2 or height < 6:
+        if len(self.__view) <= height - 2 or height < 6:
             # If there is no need for a scroll bar, or if the tab is too small, render a simple line.
             text = '│' * (height - 2)
         else:
             # Scroll bar.
             text = '▲'
-            bar_portion = (height - 2) / len(self.__lines)
+            bar_portion = (height - 2) / len(self.__view)
             bar_nb = max(1, int(bar_portion * (height - 4)))
-            scroll_portion = self.__tab_scroll / len(self.__lines)
+            scroll_portion = self.__tab_scroll / len(self.__view)
             scroll_nb = round(scroll_portion * (height - 4))
             text += '│' * scroll_nb
             text += '█' * bar_nb
@@ -441,12 +1027,21 @@ class Tab:
         text = '│' * (height - 2)
         self.__renderer.addstr(text, x=x, y=y + 1, width=1, height=height - 2)
 
-        # Render bottom line.
-        text = '└' + '─' * (width - 2) + '┘'
-        self.__renderer.addstr(text, x=x, y=y + height - 1, width=width, height=1)
+        # Render bottom line, with the filter query.
+        if self.__query or self.__typing == 'filter':
+            self.__renderer.addstr('└╴', x=x, y=y + height - 1)
+            query = self.__input + '_' if self.__typing == 'filter' else self.__query
+            text = f'/{query} {len(self.__view)}/{len(self.__lines)}'
+            used_width, _ = self.__renderer.addstr(text, x=x + 2, y=y + height - 1, width=width - 4, height=1)
+            text = '╶' + '─' * (width - 4 - used_width) + '┘'
+            self.__renderer.addstr(text, x=x + 2 + used_width, y=y + height - 1)
+        else:
+            text = '└' + '─' * (width - 2) + '┘'
+            self.__renderer.addstr(text, x=x, y=y + height - 1, width=width, height=1)
 
         # Render lines.
-        for i, line in enumerate(self.__lines[self.__tab_scroll:height - 2 + self.__tab_scroll]):
+        for i, id in enumerate(self.__view[self.__tab_scroll:height - 2 + self.__tab_scroll]):
+            line = Line.from_store(self.__store, id)
             line_color = LINE_COLOR
             if i + self.__tab_scroll == self.__selected_line and self.__selected:
                 line_color += LINE_SELECTED_COLOR
@@ -482,9 +1077,9 @@ class Tab:
             text = '╶' + '─' * (width - 4 - used_width) + '┐'
             self.__renderer.addstr(text, x=x + 2 + used_width, y=y)
 
-        # Render the content.
-        content_text = self.get_selected_subtext()
-        _, line_count = Renderer.get_size(content_text, width=width - 2)
+        # Render the content. The scroll of the line moves when rows are dropped from its subtext.
+        self.__update_content_scroll()
+        line_count = self.__get_content_line_count()
         scroll = self.__content_scroll
         if scroll < 0:
             scroll = line_count - height + 2
@@ -493,10 +1088,23 @@ class Tab:
             self.get_selected_line().set_scroll(self.__selected_subtab, -1)
             self.__content_scroll = scroll
         scroll = max(0, scroll)
-        self.__renderer.addstr(content_text,
-                               x=x + 1, y=y + 1,
-                               width=width - 2, height=height - 2,
-                               scroll=scroll)
+        line = self.get_selected_line()
+        hits, query = self.__get_hits()
+        window = line.get_subtext_window(self.__selected_subtab, width - 2, scroll, height - 2, hits, query)
+        if window is not None:
+            # Only the visible rows.
+            window_text, window_scroll = window
+            self.__renderer.addstr(window_text,
+                                   x=x + 1, y=y + 1,
+                                   width=width - 2, height=height - 2,
+                                   scroll=window_scroll,
+                                   wrap=line.get_subtext_wrap(self.__selected_subtab))
+        else:
+            self.__renderer.addstr(self.get_selected_subtext(),
+                                   x=x + 1, y=y + 1,
+                                   width=width - 2, height=height - 2,
+                                   scroll=scroll)
+        self.__renderer.addstr(DEFAULT_COLOR)
 
         # Right line.
         if line_count <= height - 2 or height < 6:
@@ -529,9 +1137,30 @@ class Tab:
         text = '│' * (height - 2)
         self.__renderer.addstr(text, x=x, y=y + 1, width=1, height=height - 2)
 
-        # Render the bottom line.
-        text = '└' + '─' * (width - 2) + '┘'
-        self.__renderer.addstr(text, x=x, y=y + height - 1, width=width, height=1)
+        # Render the bottom line, with the search query.
+        if self.__search or self.__typing == 'search':
+            self.__renderer.addstr('└╴', x=x, y=y + height - 1)
+            if self.__typing == 'search':
+                text = f'?{self.__input}_'
+            elif self.__hits is None:
+                text = f'?{self.__search} …'
+            else:
+                text = f'?{self.__search} {self.__hit + 1}/{len(self.__hits)}'
+            used_width, _ = self.__renderer.addstr(text, x=x + 2, y=y + height - 1, width=width - 4, height=1)
+            text = '╶' + '─' * (width - 4 - used_width) + '┘'
+            self.__renderer.addstr(text, x=x + 2 + used_width, y=y + height - 1)
+        else:
+            text = '└' + '─' * (width - 2) + '┘'
+            self.__renderer.addstr(text, x=x, y=y + height - 1, width=width, height=1)
+
+    def __get_content_line_count(
+            self: 'Tab',
+    ) -> int:
+        if len(self.__view) == 0:
+            return 0
+        width = self.__content_box.get_width() - 2
+        _, line_count = self.get_selected_line().get_subtext_size(self.__selected_subtab, width)
+        return line_count
 
     def __update_content_scroll(
             self: 'Tab',
@@ -542,13 +1171,21 @@ class Tab:
             self: 'Tab',
     ) -> None:
         """Select the tab."""
-        self.__selected = True
+        with self.__get_lock():
+            if self.__selected:
+                return
+            self.__selected = True
+            self.__invalidate()
 
     def unselect(
             self: 'Tab',
     ) -> None:
         """Unselect the tab."""
-        self.__selected = False
+        with self.__get_lock():
+            if not self.__selected:
+                return
+            self.__selected = False
+            self.__invalidate()
 
     def get_tab_height(
             self: 'Tab',
@@ -580,27 +1217,344 @@ class Tab:
         """
         return self.__height_weight
 
-    def __get_subtext_lines(
+    def __get_lock(
             self: 'Tab',
-    ) -> list[str]:
-        subtext = self.get_selected_subtext()
-        subtext_lines = subtext.split('\n')
-        width = self.__content_box.get_width() - 2
-        for i, subtext_line in enumerate(subtext_lines):
-            if len(subtext_line) > width:
-                subtext_lines[i] = subtext_line[:width]
-                subtext_lines.insert(i + 1, subtext_line[width:])
-        return subtext_lines
+    ) -> 'threading.RLock':
+        return self.__store.lock
 
-    def __get_content_lines(
+    def __invalidate(
             self: 'Tab',
-    ) -> list[str]:
-        height = self.__content_box.get_height()
-        width = self.__content_box.get_width()
-        subtext_lines = self.__get_subtext_lines()
-        subtext_lines = subtext_lines[self.__content_scroll:height-2+self.__content_scroll]
-        subtext_lines += [' ' * (width - 2)] * (height - len(subtext_lines) - 2)
-        return subtext_lines
+    ) -> None:
+        if self.__renderer is not None:
+            self.__renderer.invalidate()
+
+    def __get_selected_id(
+            self: 'Tab',
+    ) -> int | None:
+        return self.__view[self.__selected_line] if len(self.__view) > 0 else None
+
+    def __select_id(
+            self: 'Tab',
+            id: int | None,
+    ) -> None:
+        """Select a line if it is displayed, else keep the selection in range."""
+        if id is not None and id in self.__view:
+            self.__selected_line = self.__view.index(id)
+        else:
+            self.__selected_line = max(0, min(self.__selected_line, len(self.__view) - 1))
+        self.__tab_scroll = max(0, min(self.__tab_scroll, len(self.__view) - self.__tab_box.get_height() + 2))
+        self.__update_tab_scroll()
+
+    def __matches(
+            self: 'Tab',
+            id: int,
+    ) -> bool:
+        slot = self.__store.get_slot(id)
+        return slot is not None and self.__query.lower() in self.__store.texts[slot].lower()
+
+    def __filter_ids(
+            self: 'Tab',
+            ids: Iterable[int],
+    ) -> list[int]:
+        """Get the lines matching the filter query, among lines of the tab."""
+        query = self.__query.lower()
+        texts = self.__store.texts
+        return [id for id in ids if query in texts[id & SLOT_MASK].lower()]
+
+    def __get_matches(
+            self: 'Tab',
+    ) -> 'LineList':
+        """Get the lines matching the filter query, in display order."""
+        candidates = None
+        if len(self.__query) >= TextIndex.SIZE:
+            if self.__index is not None:
+                candidates = self.__index.get_candidates(self.__query)
+            elif self.__index_log is None:
+                self.__build_index()
+        if candidates is None:
+            # The query is too short to be looked up, or the index is not built yet.
+            ids = self.__lines
+        elif len(candidates) * 16 < len(self.__lines):
+            ids = sorted(candidates, key=self.__lines.index)
+        else:
+            ids = (id for id in self.__lines if id in candidates)
+        return LineList(self.__filter_ids(ids))
+
+    def __build_index(
+            self: 'Tab',
+    ) -> None:
+        """Index the line texts in a separate thread. The lines are scanned until the index is ready."""
+        texts = self.__store.texts
+        snapshot = [(id, texts[id & SLOT_MASK]) for id in self.__lines]
+        log = self.__index_log = []
+        threading.Thread(target=self.__run_index, args=(snapshot, log), daemon=True).start()
+
+    def __run_index(
+            self: 'Tab',
+            snapshot: list[tuple[int, str]],
+            log: list[tuple[bool, int, str]],
+    ) -> None:
+        index = TextIndex(snapshot)
+        with self.__get_lock():
+            # The index is dropped if the lines were replaced since.
+            if self.__index_log is not log:
+                return
+            for added, id, text in log:
+                if added:
+                    index.add(id, text)
+                else:
+                    index.remove(id, text)
+            self.__index = index
+            self.__index_log = None
+
+    def __index_text(
+            self: 'Tab',
+            id: int,
+            text: str,
+            added: bool,
+    ) -> None:
+        """Add or remove the text of a line from the index, or log it while the index is built."""
+        if self.__index is not None:
+            if added:
+                self.__index.add(id, text)
+            else:
+                self.__index.remove(id, text)
+        elif self.__index_log is not None:
+            self.__index_log.append((added, id, text))
+
+    def __add_to_filter(
+            self: 'Tab',
+            ids: list[int],
+    ) -> None:
+        """Index new lines, and display them if they match the filter query."""
+        if self.__index is not None or self.__index_log is not None:
+            texts = self.__store.texts
+            for id in ids:
+                self.__index_text(id, texts[id & SLOT_MASK], True)
+        if self.__view is self.__lines:
+            return
+        if self.__sort_key is None:
+            self.__view.extend(self.__filter_ids(ids))
+        else:
+            for id in self.__filter_ids(ids):
+                self.__insert_in_view(id)
+
+    def __insert_in_view(
+            self: 'Tab',
+            id: int,
+    ) -> None:
+        """Display a matching line, at its place among the displayed lines."""
+        index = bisect_left(self.__view, self.__lines.index(id), key=self.__lines.index)
+        self.__view.insert(index, id)
+
+    def __on_set_text(
+            self: 'Tab',
+            id: int,
+            old_text: str,
+            text: str,
+    ) -> None:
+        """Index the new text of a line, move it to its place if the lines are sorted, and display or hide it
+        according to the filter query."""
+        self.__index_text(id, old_text, False)
+        self.__index_text(id, text, True)
+        selected_id = self.__get_selected_id()
+        moved = self.__sort_key is not None and self.__sort_lines([id])
+        filtered = self.__view is not self.__lines and (id in self.__view) != self.__matches(id)
+        if not moved and not filtered:
+            return
+        if filtered:
+            if id in self.__view:
+                self.__view.remove(id)
+            else:
+                self.__insert_in_view(id)
+        self.__select_id(selected_id)
+        self.__update_content_scroll()
+
+    def __get_sort_value(
+            self: 'Tab',
+            id: int,
+    ) -> Any:
+        value = self.__sort_values[id]
+        return Tab.DESCENDING(value) if self.__sort_reverse else value
+
+    def __sort_lines(
+            self: 'Tab',
+            ids: list[int],
+    ) -> bool:
+        """Compute the sort key of lines, and move the ones whose key changed to their place.
+
+        New lines are inserted, but not displayed by the filter, see `__add_to_filter`. The selection is not kept.
+
+        Args:
+            ids (list[int]): The ids of the lines, in the tab or new.
+
+        Returns:
+            bool: True if a line was moved or inserted.
+        """
+        values = self.__sort_values
+        changed = []
+        for id in ids:
+            value = self.__sort_key(Line.from_store(self.__store, id))
+            if id not in values or values[id] != value:
+                changed.append(id)
+            values[id] = value
+        if not changed:
+            return False
+
+        lines = self.__lines
+        filtered = self.__view is not lines
+        if len(changed) * 32 > len(lines):
+            # Sorting all the lines is faster than moving many of them.
+            # The new lines are added after the other ones, so that the sort keeps the order of the equal lines.
+            order = sorted(dict.fromkeys(chain(lines, changed)), key=values.__getitem__, reverse=self.__sort_reverse)
+            displayed = set(self.__view) if filtered else None
+            self.__lines = LineList(order)
+            self.__view = LineList(id for id in order if id in displayed) if filtered else self.__lines
+            return True
+
+        # Take the lines out first, so that the other lines are sorted while they are inserted back.
+        displayed = []
+        for id in changed:
+            if id in lines:
+                lines.remove(id)
+                if filtered and id in self.__view:
+                    self.__view.remove(id)
+                    displayed.append(id)
+        for id in changed:
+            lines.insert(bisect_right(lines, self.__get_sort_value(id), key=self.__get_sort_value), id)
+        for id in displayed:
+            self.__insert_in_view(id)
+        return True
+
+    def __get_search_key(
+            self: 'Tab',
+    ) -> tuple:
+        line = self.get_selected_line()
+        subtab = self.__selected_subtab
+        return (line.get_id(), subtab, self.__search, *line.get_subtext_span(subtab))
+
+    def __update_search(
+            self: 'Tab',
+    ) -> None:
+        """Search the selected subtext if it changed since it was searched.
+
+        When the subtext was only appended to, only its end is searched, and the hits found so far are kept.
+        """
+        key = self.__get_search_key()
+        previous = self.__search_key
+        if previous == key:
+            return
+        same_text = previous is not None and previous[:4] == key[:4] and key[3] is not None
+        if same_text and self.__searching:
+            # The changes are searched once the running search ends.
+            return
+        if same_text and self.__hits is not None and key[5] >= previous[5]:
+            self.__search_content(since=previous[5])
+        else:
+            self.__search_content()
+
+    def __search_content(
+            self: 'Tab',
+            since: int = None,
+    ) -> None:
+        """Search the selected subtext in a separate thread.
+
+        Args:
+            since (int, optional): The end offset of the subtext searched before. Only the hits after it are searched,
+                and added to the hits found so far. Defaults to None means the whole subtext.
+        """
+        key = self.__get_search_key()
+        search = self.get_selected_line().prepare_subtext_search(self.__selected_subtab, self.__search, since)
+        self.__search_key = key
+        self.__searching = False
+        if since is None:
+            self.__hits = None
+            self.__hit = -1
+        else:
+            # Forget the hits dropped from the beginning of the subtext.
+            dropped = bisect_left(self.__hits, key[4])
+            del self.__hits[:dropped]
+            self.__hit = self.__hit - dropped if self.__hit >= dropped else -1
+        if search is None:
+            if since is None:
+                self.__hits = array('q')
+            return
+        self.__searching = True
+        threading.Thread(target=self.__run_search, args=(search, key, since is not None), daemon=True).start()
+
+    def __run_search(
+            self: 'Tab',
+            search: 'function[[threading.Event], array]',
+            key: tuple,
+            append: bool,
+    ) -> None:
+        hits = search()
+        with self.__get_lock():
+            # The hits are dropped if another search started since.
+            if self.__search_key != key or not self.__searching:
+                return
+            self.__searching = False
+            if append:
+                self.__hits.extend(hits)
+            else:
+                self.__hits = hits
+            if self.__jump != 0:
+                self.__jump_to_hit(self.__jump)
+            self.__invalidate()
+
+    def __get_hits(
+            self: 'Tab',
+    ) -> tuple['array', str]:
+        """Get the hits to highlight in the selected subtext, and search it if it changed."""
+        if not self.__search or len(self.__view) == 0:
+            return (), ''
+        self.__update_search()
+        return self.__hits or (), self.__search
+
+    def __jump_to_hit(
+            self: 'Tab',
+            direction: int,
+    ) -> None:
+        """Scroll the content to the hit after or before the current one."""
+        self.__jump = 0
+        if not self.__search or len(self.__view) == 0:
+            return
+        self.__update_search()
+        if self.__hits is None:
+            self.__jump = direction
+            return
+        hits = self.__hits
+        if len(hits) == 0:
+            return
+
+        line = self.get_selected_line()
+        subtab = self.__selected_subtab
+        width = self.__content_box.get_width() - 2
+        height = self.__content_box.get_height() - 2
+
+        def get_row(offset: int) -> int:
+            row = line.get_subtext_row(subtab, width, offset)
+            return -1 if row is None else row
+
+        if 0 <= self.__hit < len(hits):
+            index = (self.__hit + direction) % len(hits)
+        else:
+            # Start from the rows displayed.
+            scroll = line.get_scroll(subtab)
+            if scroll < 0:
+                scroll = max(0, self.__get_content_line_count() - height)
+            index = bisect_left(hits, scroll, key=get_row)
+            index = (index if direction > 0 else index - 1) % len(hits)
+        row = get_row(hits[index])
+        if row < 0:
+            return
+
+        # Center the hit.
+        self.__hit = index
+        scroll = max(0, row - height // 2)
+        line.set_scroll(subtab, scroll)
+        self.__content_scroll = scroll
+        self.__invalidate()
 
     def __update_tab_scroll(
             self: 'Tab',
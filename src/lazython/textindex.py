@@ -0,0 +1,96 @@
+from typing import Iterable
+
+
+class TextIndex:
+    """A trigram index of the texts of lines.
+
+    Each trigram of the lowercased texts is mapped to the set of the lines holding it. The lines
+    that may contain a query are the intersection of the sets of its trigrams, starting with the
+    smallest, so a query only has to be checked against the few texts having all its trigrams.
+    """
+
+    SIZE = 3  # The length of the indexed substrings.
+
+    def __init__(
+            self: 'TextIndex',
+            texts: Iterable[tuple[int, str]] = (),
+    ) -> None:
+        """Initialize a text index.
+
+        Args:
+            texts (Iterable[tuple[int, str]], optional): The id and the text of the initial lines. Defaults to ().
+        """
+        self.__lines: dict[str, set[int]] = {}  # The lines holding each trigram.
+        for id, text in texts:
+            self.add(id, text)
+
+    @staticmethod
+    def get_trigrams(
+            text: str,
+    ) -> set[str]:
+        """Get the trigrams of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            set[str]: The trigrams of the lowercased text.
+        """
+        text = text.lower()
+        return {text[i:i + TextIndex.SIZE] for i in range(len(text) - TextIndex.SIZE + 1)}
+
+    def add(
+            self: 'TextIndex',
+            id: int,
+            text: str,
+    ) -> None:
+        """Index the text of a line.
+
+        Args:
+            id (int): The line id.
+            text (str): The text.
+        """
+        lines = self.__lines
+        for trigram in TextIndex.get_trigrams(text):
+            ids = lines.get(trigram)
+            if ids is None:
+                lines[trigram] = {id}
+            else:
+                ids.add(id)
+
+    def remove(
+            self: 'TextIndex',
+            id: int,
+            text: str,
+    ) -> None:
+        """Forget the text of a line.
+
+        Args:
+            id (int): The line id.
+            text (str): The text it was indexed with.
+        """
+        lines = self.__lines
+        for trigram in TextIndex.get_trigrams(text):
+            ids = lines.get(trigram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del lines[trigram]
+
+    def get_candidates(
+            self: 'TextIndex',
+            query: str,
+    ) -> set[int] | None:
+        """Get the lines whose text may contain a query.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            set[int] | None: The lines having all the trigrams of the query, or None if the query is too short to be looked up.
+        """
+        trigrams = TextIndex.get_trigrams(query)
+        if not trigrams:
+            return None
+        sets = sorted((self.__lines.get(trigram, set()) for trigram in trigrams), key=len)
+        return sets[0].intersection(*sets[1:])
@@ -4,3 +4,5 @@ TAB_SELECTED_COLOR = '\x1b[0;32;49;59m'
 LINE_COLOR = '\x1b[0;34;49;59m'
 LINE_SELECTED_COLOR = '\x1b[7m'
 SUBTAB_SELECTED_COLOR = '\x1b[0;32;49;59m'
+HIT_COLOR = '\x1b[7m'
+HIT_END_COLOR = '\x1b[27m'
@@ -0,0 +1,108 @@
+import os
+import time
+
+import pytest
+
+from lazython.filesubtext import FileSubtext
+from lazython.tab import Tab
+
+
+@pytest.fixture
+def path(tmp_path: 'pathlib.Path') -> str:
+    path = str(tmp_path / 'file.log')
+    write(path, ''.join(f'line {i}\n' for i in range(1000)))
+    return path
+
+
+def write(
+        path: str,
+        text: str,
+        mode: str = 'w',
+) -> None:
+    with open(path, mode) as file:
+        file.write(text)
+
+
+def index_all(
+        subtext: FileSubtext,
+) -> tuple[int, int]:
+    """Index the whole file, and get its size."""
+    subtext.get_row(80, 1 << 62)
+    return subtext.get_size(80)
+
+
+def test_window(path: str) -> None:
+    subtext = FileSubtext(path)
+    assert subtext.get_window(80, 10, 2) == ('\x1b[0mline 10\nline 11\n', 0)
+    assert index_all(subtext) == (80, 1000)
+    assert subtext.get_row(80, len('line 0\nline 1')) == 1
+    assert subtext.get_window(80, 999, 5) == ('\x1b[0mline 999\n', 0)
+    subtext.close()
+
+
+def test_hits(path: str) -> None:
+    subtext = FileSubtext(path)
+    hits = subtext.prepare_search('LINE 1')()
+    assert len(hits) == 1 + 10 + 100
+    text, _ = subtext.get_window(80, 1, 1, hits, 'line 1')
+    assert text.count('line 1') == 1 and 'line 1' not in text.split('\x1b[')[0]
+    subtext.close()
+
+
+def test_truncated(path: str) -> None:
+    """A file truncated under an unfollowed subtext is read as it is, without crashing."""
+    subtext = FileSubtext(path)
+    assert index_all(subtext) == (80, 1000)
+    write(path, 'a\n')
+    assert subtext.get_window(80, 0, 2) == ('\x1b[0ma\n', 0)
+    assert subtext.get_window(80, 500, 10) == ('\x1b[0m', 0)
+    subtext.close()
+
+
+def test_followed(path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A followed subtext is indexed again when the file grows, is truncated or is replaced."""
+    monkeypatch.setattr(FileSubtext, 'POLL_INTERVAL', 0.01)
+    subtext = FileSubtext(path, on_change=lambda: None)
+
+    def wait_for(size: tuple[int, int]) -> None:
+        deadline = time.monotonic() + 5
+        while index_all(subtext) != size and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert index_all(subtext) == size
+
+    wait_for((80, 1000))
+    write(path, 'more\n', 'a')
+    wait_for((80, 1001))
+    assert subtext.get_window(80, 1000, 1) == ('\x1b[0mmore\n', 0)
+
+    write(path, 'a\nb\n')
+    wait_for((80, 2))
+
+    os.rename(path, path + '.1')
+    write(path, 'new\n')
+    wait_for((80, 1))
+    assert subtext.get_text() == 'new\n'
+    subtext.close()
+
+
+def test_closed_with_line(path: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    closed = []
+    close = FileSubtext.close
+    monkeypatch.setattr(FileSubtext, 'close', lambda subtext: closed.append(subtext) or close(subtext))
+    tab = Tab(name='tab', subtabs=['file'])
+    line = tab.add_line('line')
+    line.set_subtext_file(0, path)
+    assert closed == []
+    tab.delete_line(line)
+    assert len(closed) == 1
+
+
+def test_search_since(path: str) -> None:
+    """A search since the end of the previous one only finds the hits ending after it."""
+    end = os.path.getsize(path)
+    write(path, 'line 1000\n', 'a')
+    subtext = FileSubtext(path)
+    assert subtext.get_span()[1:] == (0, end + 10)
+    assert list(subtext.prepare_search('line 1', since=end + 2)()) == [end]
+    assert list(subtext.prepare_search('line 1', since=end + 6)()) == []
+    subtext.close()
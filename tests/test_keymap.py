@@ -0,0 +1,81 @@
+import pytest
+
+from lazython import Lazython
+from lazython.keymap import Keymap
+from lazython.shortcut import Shortcut
+from lazython.tab import Tab
+
+DOWN = 4348699
+
+
+def test_keymap() -> None:
+    keymap = Keymap()
+    a = Shortcut(key=1, callback=None, name='a', help='A')
+    b = Shortcut(key=(2, 3, 4), callback=None)
+    keymap.add(a)
+    keymap.add(b)
+    assert keymap.get((1,)) == [a]
+    assert keymap.get((2, 3, 4)) == [b]
+    assert keymap.get((2, 3)) == []
+    assert keymap.is_prefix((2,)) and keymap.is_prefix((2, 3))
+    assert not keymap.is_prefix((2, 3, 4)) and not keymap.is_prefix((1,))
+    assert keymap.get_shortcuts() == [a, b]
+    assert keymap.get_displayable() == [a]
+    with pytest.raises(ValueError):
+        keymap.add(Shortcut(key=(), callback=None))
+
+
+def make_lazython(
+        **kwargs,
+) -> tuple[Lazython, Tab, list]:
+    """Make a lazython with a tab of 3 lines, and the list the test callbacks record their calls in."""
+    lazython = Lazython(**kwargs)
+    tab = lazython.new_tab(name='tab')
+    tab.add_lines(['a', 'b', 'c'])
+    return lazython, tab, []
+
+
+def test_chord() -> None:
+    lazython, tab, calls = make_lazython()
+    lazython.add_key((ord('g'), ord('g')), lambda: calls.append('gg'))
+    lazython.key_callback(ord('g'))
+    assert calls == []
+    lazython.key_callback(ord('g'))
+    assert calls == ['gg']
+
+
+def test_broken_chord() -> None:
+    """A key breaking a chord is taken on its own."""
+    lazython, tab, calls = make_lazython()
+    lazython.add_key((ord('g'), ord('g')), lambda: calls.append('gg'))
+    lazython.add_key(ord('h'), lambda: calls.append('h'))
+    lazython.key_callback(ord('g'))
+    lazython.key_callback(ord('h'))
+    assert calls == ['h']
+    lazython.key_callback(ord('g'))
+    lazython.key_callback(ord('g'))
+    assert calls == ['h', 'gg']
+
+
+def test_app_and_tab_keys() -> None:
+    """The keys of the app and of the selected tab run after the built-in ones."""
+    lazython, tab, calls = make_lazython()
+    lazython.add_key(DOWN, lambda: calls.append(('app', tab.get_selected_line().get_text())))
+    tab.add_key(DOWN, lambda: calls.append(('tab', tab.get_selected_line().get_text())))
+    lazython.key_callback(DOWN)
+    assert calls == [('app', 'b'), ('tab', 'b')]
+
+
+def test_option_keys_yield_to_app_keys() -> None:
+    lazython, tab, calls = make_lazython(filter_key=ord('/'))
+    lazython.key_callback(ord('/'))
+    lazython.key_callback(ord('b'))
+    lazython.key_callback(10)
+    assert tab.get_filter() == 'b'
+
+    lazython, tab, calls = make_lazython(filter_key=ord('/'))
+    lazython.add_key(ord('/'), lambda: calls.append('/'))
+    lazython.key_callback(ord('/'))
+    lazython.key_callback(ord('b'))
+    assert calls == ['/']
+    assert tab.get_filter() == ''
@@ -0,0 +1,94 @@
+import random
+
+from lazython.layout import Layout
+
+
+def lay_out(text: str, width: int, **kwargs) -> Layout:
+    layout = Layout(width, **kwargs)
+    layout.feed(text)
+    return layout
+
+
+def test_size() -> None:
+    assert lay_out('', 10).get_size() == (0, 0)
+    assert lay_out('abc', 10).get_size() == (3, 0)
+    assert lay_out('abc\nde', 10).get_size() == (3, 1)
+    assert lay_out('abc\n', 10).get_size() == (3, 1)
+
+
+def test_wrap() -> None:
+    assert lay_out('abcdefgh', 3).get_size() == (3, 2)
+    assert lay_out('abcdefgh', 3, wrap=False).get_size() == (3, 0)
+
+
+def test_escape_sequences_take_no_room() -> None:
+    assert lay_out('\x1b[1;31mabc\x1b[0m', 10).get_size() == (3, 0)
+
+
+def test_tab() -> None:
+    assert lay_out('a\tb', 10).get_size() == (5, 0)
+
+
+def test_draw() -> None:
+    pieces = []
+    lay_out('ab\x1b[32mcd\nef', 3, draw=lambda x, y, text, style: pieces.append((x, y, text, style)))
+    assert pieces == [
+        (0, 0, 'ab', ''),
+        (2, 0, 'c', '\x1b[0;32m'),
+        (0, 1, 'd', '\x1b[0;32m'),
+        (0, 2, 'ef', '\x1b[0;32m'),
+    ]
+
+
+def test_cut_with_ellipsis() -> None:
+    pieces = []
+    lay_out('abcdef\ngh', 4, wrap=False, draw=lambda x, y, text, style: pieces.append((x, y, text)))
+    assert pieces == [(0, 0, 'abcd'), (3, 0, '…'), (0, 1, 'gh')]
+
+
+def test_row_index() -> None:
+    layout = lay_out('abcdefg\nhi\x1b[1m\njk', 3, index=True)
+    assert list(layout.rows) == [0, 3, 6, 8, 15]
+    assert layout.row_styles == ['', '', '', '', '\x1b[0;1m']
+    assert layout.monotonic
+    assert not lay_out('a\x1b[1Ab', 3, index=True).monotonic
+
+
+def test_incremental_feed() -> None:
+    """Feeding a text in pieces lays it out like feeding it at once, even when a sequence is cut."""
+    rng = random.Random(0)
+    alphabet = ['a', 'b', ' ', '\n', '\t', '\r', '\x1b[1m', '\x1b[0m', '\x1b[38;5;2m', '\x1b[K']
+    for _ in range(200):
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+        width = rng.randint(1, 12)
+        expected = lay_out(text, width, index=True)
+
+        layout = Layout(width, index=True)
+        position = 0
+        while position < len(text):
+            end = min(len(text), position + rng.randint(1, 5))
+            layout.feed(text[position:end], final=False)
+            position = end
+        layout.feed('')
+
+        assert layout.get_size() == expected.get_size()
+        assert list(layout.rows) == list(expected.rows)
+        assert layout.style == expected.style
+
+
+def test_drop_rows_columns() -> None:
+    """The columns of the dropped rows are not counted anymore."""
+    layout = lay_out('abcdefgh\nab\nabc', 10, index=True)
+    assert layout.get_size() == (8, 2)
+    layout.drop_rows(1)
+    assert layout.get_size() == (3, 1)
+    layout.drop_rows(1)
+    assert layout.get_size() == (3, 0)
+
+
+def test_goto_origin() -> None:
+    """A goto to row or column 0 goes to the first one, like terminals do."""
+    pieces = []
+    layout = lay_out('abc\x1b[0;0Hx', 5, draw=lambda x, y, text, style: pieces.append((x, y, text)))
+    assert (layout.cursor_x, layout.cursor_y) == (1, 0)
+    assert pieces == [(0, 0, 'abc'), (0, 0, 'x')]
@@ -0,0 +1,42 @@
+from lazython import Lazython
+
+
+def type_keys(
+        lazython: Lazython,
+        text: str,
+) -> None:
+    for char in text:
+        lazython.key_callback(ord(char))
+
+
+def test_filter_query_takes_app_keys() -> None:
+    """While the filter query is typed, the keys of the app are typed in it."""
+    lazython = Lazython(filter_key=ord('/'))
+    tab = lazython.new_tab(name='tab')
+    tab.add_lines(['banana', 'cherry', 'bean'])
+    calls = []
+    lazython.add_key(ord('b'), lambda: calls.append('b'))
+    type_keys(lazython, '/ban')
+    assert tab.get_filter() == 'ban'
+    assert tab.get_nb_lines() == 1
+    assert calls == []
+    lazython.key_callback(10)
+    type_keys(lazython, 'b')
+    assert calls == ['b']
+    assert tab.get_filter() == 'ban'
+
+
+def test_search_queries_take_app_keys() -> None:
+    lazython = Lazython(search_keys=(6, 14, 16), search_all_key=7)
+    tab = lazython.new_tab(name='tab', subtabs=['text'])
+    tab.add_line('line').set_subtext(0, 'a banana')
+    calls = []
+    lazython.add_key(ord('b'), lambda: calls.append('b'))
+    lazython.key_callback(6)
+    type_keys(lazython, 'ban')
+    lazython.key_callback(10)
+    assert tab.get_search() == 'ban'
+    lazython.key_callback(7)
+    type_keys(lazython, 'ban')
+    lazython.key_callback(27)
+    assert calls == []
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from lazython.linelist import LineList
+from lazython.linestore import SLOT_BITS
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Use small blocks, so that the tests split and delete many of them."""
+    monkeypatch.setattr(LineList, 'BLOCK_SIZE', 4)
+
+
+def test_extend_and_index() -> None:
+    lines = LineList(range(50))
+    assert len(lines) == 50
+    assert list(lines) == list(range(50))
+    assert [lines[i] for i in range(50)] == list(range(50))
+    assert lines[-1] == 49
+    assert lines[10:20] == list(range(10, 20))
+    assert lines[::7] == list(range(0, 50, 7))
+    assert [lines.index(id) for id in range(50)] == list(range(50))
+    with pytest.raises(IndexError):
+        lines[50]
+    with pytest.raises(ValueError):
+        lines.index(50)
+
+
+def test_remove() -> None:
+    lines = LineList(range(20))
+    assert lines.remove(5) == 5
+    assert lines.remove(19) == 18
+    assert 5 not in lines and 19 not in lines and 6 in lines
+    assert list(lines) == [id for id in range(20) if id not in (5, 19)]
+    with pytest.raises(ValueError):
+        lines.remove(5)
+
+    # Empty the blocks.
+    for id in list(lines):
+        lines.remove(id)
+    assert len(lines) == 0 and list(lines) == []
+    lines.append(3)
+    assert list(lines) == [3] and lines.index(3) == 0
+
+
+def test_move() -> None:
+    lines = LineList(range(10))
+    lines.move(0, 9)
+    assert list(lines) == list(range(1, 10)) + [0]
+    lines.move(0, 0)
+    lines.move(5, 2)
+    assert list(lines) == [0, 1, 5, 2, 3, 4, 6, 7, 8, 9]
+
+
+def test_block_split() -> None:
+    """Inserting many lines at the same place splits the block."""
+    lines = LineList(range(8))
+    for id in range(100, 150):
+        lines.insert(3, id)
+    assert list(lines) == [0, 1, 2] + list(range(149, 99, -1)) + [3, 4, 5, 6, 7]
+    assert all(lines.index(id) == i for i, id in enumerate(lines))
+
+
+def test_generations() -> None:
+    """A line reusing the slot of another line is not taken for it."""
+    old = 7
+    new = 1 << SLOT_BITS | 7
+    lines = LineList([old])
+    assert old in lines and new not in lines
+    lines.remove(old)
+    lines.append(new)
+    assert new in lines and old not in lines
+    assert lines.index(new) == 0
+
+
+def test_random_operations() -> None:
+    rng = random.Random(0)
+    lines = LineList()
+    model = []
+    next_id = 0
+    for _ in range(3000):
+        operation = rng.random()
+        if operation < 0.3 or not model:
+            lines.append(next_id)
+            model.append(next_id)
+            next_id += 1
+        elif operation < 0.45:
+            index = rng.randint(0, len(model))
+            lines.insert(index, next_id)
+            model.insert(index, next_id)
+            next_id += 1
+        elif operation < 0.5:
+            ids = list(range(next_id, next_id + rng.randint(0, 10)))
+            lines.extend(ids)
+            model += ids
+            next_id += len(ids)
+        elif operation < 0.75:
+            id = rng.choice(model)
+            assert lines.remove(id) == model.index(id)
+            model.remove(id)
+        else:
+            id = rng.choice(model)
+            index = rng.randrange(len(model))
+            lines.move(id, index)
+            model.remove(id)
+            model.insert(index, id)
+        assert len(lines) == len(model)
+    assert list(lines) == model
+    assert [lines.index(id) for id in model] == list(range(len(model)))
+    assert [lines[i] for i in range(len(model))] == model
+    start = len(model) // 3
+    assert lines[start:start + 17] == model[start:start + 17]
@@ -0,0 +1,58 @@
+from lazython.line import Line
+from lazython.linestore import LineStore, SLOT_MASK
+
+
+def test_add_and_remove() -> None:
+    store = LineStore()
+    first = store.add('a', ['x'])
+    second = store.add('b')
+    assert len(store) == 2
+    assert store.texts[store.get_slot(first)] == 'a'
+    assert store.subtexts[store.get_slot(first)] == ['x']
+
+    store.remove(first)
+    assert len(store) == 1
+    assert store.get_slot(first) is None
+    assert store.get_slot(second) is not None
+    store.remove(first)
+    assert len(store) == 1
+
+
+def test_slot_reuse() -> None:
+    """A removed slot is reused with a new generation, so the old id stays removed."""
+    store = LineStore()
+    old = store.add('old', ['x'])
+    store.remove(old)
+    new = store.add('new')
+    assert new & SLOT_MASK == old & SLOT_MASK
+    assert new != old
+    assert store.get_slot(old) is None
+    assert store.texts[store.get_slot(new)] == 'new'
+    assert store.get_slot(new) not in store.subtexts
+
+
+def test_clear() -> None:
+    store = LineStore()
+    ids = [store.add(str(i)) for i in range(3)]
+    store.clear()
+    assert len(store) == 0
+    assert all(store.get_slot(id) is None for id in ids)
+    new_ids = [store.add(str(i)) for i in range(3)]
+    assert set(new_ids).isdisjoint(ids)
+    assert len(store) == 3
+
+
+def test_removed_line_handle() -> None:
+    """The handle of a removed line returns default values, and does not change the line reusing its slot."""
+    store = LineStore()
+    id = store.add('a', ['x'])
+    line = Line.from_store(store, id)
+    store.remove(id)
+    other = Line.from_store(store, store.add('b', ['y']))
+    assert line.get_text() == ''
+    assert line.get_nb_subtext() == 0
+    line.set_text('c')
+    line.set_subtext(0, 'z')
+    assert other.get_text() == 'b'
+    assert other.get_subtext(0) == 'y'
+    assert line != other
@@ -0,0 +1,56 @@
+from lazython.listener import InputParser, key_code, key_text
+
+DOWN = key_code(b'\x1b[B')
+
+
+def test_key_code() -> None:
+    assert key_code(b'a') == ord('a')
+    assert DOWN == 4348699
+
+
+def test_key_text() -> None:
+    assert key_text(ord('a')) == 'a'
+    assert key_text(key_code('é'.encode())) == 'é'
+    assert key_text(10) is None
+    assert key_text(DOWN) is None
+
+
+def test_keys() -> None:
+    parser = InputParser()
+    assert parser.feed(b'a\x1b[Bb') == [('key', ord('a')), ('key', DOWN), ('key', ord('b'))]
+    assert not parser.has_pending()
+
+
+def test_cut_sequence() -> None:
+    """A sequence cut at the end of a read is completed by the next one."""
+    parser = InputParser()
+    assert parser.feed(b'a\x1b[') == [('key', ord('a'))]
+    assert parser.has_pending()
+    assert parser.feed(b'B') == [('key', DOWN)]
+    assert parser.feed('é'.encode()[:1]) == []
+    assert parser.feed('é'.encode()[1:]) == [('key', key_code('é'.encode()))]
+
+
+def test_lone_escape() -> None:
+    parser = InputParser()
+    assert parser.feed(b'\x1b') == []
+    assert parser.flush() == [('key', 27)]
+    assert not parser.has_pending()
+
+
+def test_alt_key() -> None:
+    assert InputParser().feed(b'\x1ba') == [('key', key_code(b'\x1ba'))]
+
+
+def test_click() -> None:
+    parser = InputParser()
+    assert parser.feed(b'\x1b[M' + bytes([32, 33 + 4, 33 + 2])[:2]) == []
+    assert parser.feed(bytes([33 + 2])) == [('click', 0, 5, 3)]
+
+
+def test_paste() -> None:
+    """Pasted text is one event, even when the end marker is cut."""
+    parser = InputParser()
+    assert parser.feed(b'x\x1b[200~a\x1b[Bq\x1b[20') == [('key', ord('x'))]
+    assert not parser.has_pending()
+    assert parser.feed(b'1~y') == [('paste', 'a\x1b[Bq'), ('key', ord('y'))]
@@ -0,0 +1,125 @@
+import threading
+
+from lazython.line import Line
+from lazython.linestore import SLOT_MASK
+from lazython.tab import Tab
+
+
+def make_tab() -> Tab:
+    return Tab(name='tab', subtabs=['text'])
+
+
+def wait_for(
+        condition: 'function[[], bool]',
+) -> None:
+    for _ in range(200):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError('The condition never held.')
+
+
+def get_text(
+        line: Line,
+) -> str:
+    return line.get_subtext_window(0, 40, 0, 10)[0]
+
+
+def test_lazy() -> None:
+    """The provider is only called once the subtext is displayed, and its result kept until refreshed."""
+    tab = make_tab()
+    line = tab.add_line('line')
+    calls = []
+
+    def provider() -> str:
+        calls.append(threading.current_thread())
+        return f'call {len(calls)}'
+
+    line.set_subtext_provider(0, provider)
+    assert calls == []
+    assert line.get_subtext(0) == ''
+
+    get_text(line)
+    wait_for(lambda: line.get_subtext(0) == 'call 1')
+    assert calls[0] is not threading.current_thread()
+    get_text(line)
+    assert len(calls) == 1
+
+    # The current subtext is kept until the provider returns again.
+    line.refresh_subtext(0)
+    assert line.get_subtext(0) == 'call 1'
+    get_text(line)
+    wait_for(lambda: line.get_subtext(0) == 'call 2')
+
+    # Setting the subtext removes the provider.
+    line.set_subtext(0, 'fixed')
+    line.refresh_subtext(0)
+    get_text(line)
+    assert len(calls) == 2
+    assert line.get_subtext(0) == 'fixed'
+
+
+def test_raising() -> None:
+    """The error of a provider is displayed as the subtext."""
+    tab = make_tab()
+    line = tab.add_line('line')
+
+    def provider() -> str:
+        raise ValueError('no text')
+
+    line.set_subtext_provider(0, provider)
+    get_text(line)
+    wait_for(lambda: line.get_subtext(0) == 'ValueError: no text')
+
+
+def test_deleted_while_running() -> None:
+    """The result of a provider is dropped if its line was deleted, even if the slot got reused."""
+    tab = make_tab()
+    line = tab.add_line('line')
+    started = threading.Event()
+    release = threading.Event()
+    threads = []
+
+    def provider() -> str:
+        threads.append(threading.current_thread())
+        started.set()
+        release.wait(2)
+        return 'late'
+
+    line.set_subtext_provider(0, provider)
+    get_text(line)
+    assert started.wait(2)
+    tab.delete_line(line)
+    other = tab.add_line('other')
+    assert other.get_id() & SLOT_MASK == line.get_id() & SLOT_MASK
+    other.set_subtext(0, 'other text')
+    release.set()
+    threads[0].join(2)
+    assert not threads[0].is_alive()
+    assert other.get_subtext(0) == 'other text'
+    assert line.get_subtext(0) == ''
+    assert line.get_store().providers == {}
+    assert line.get_store().loads == {}
+
+
+def test_replaced_while_running() -> None:
+    """The result of a provider is dropped if the provider was replaced in the meantime."""
+    tab = make_tab()
+    line = tab.add_line('line')
+    release = threading.Event()
+    threads = []
+
+    def slow() -> str:
+        threads.append(threading.current_thread())
+        release.wait(2)
+        return 'slow'
+
+    line.set_subtext_provider(0, slow)
+    get_text(line)
+    wait_for(lambda: len(threads) == 1)
+    line.set_subtext_provider(0, lambda: 'fast')
+    get_text(line)
+    wait_for(lambda: line.get_subtext(0) == 'fast')
+    release.set()
+    threads[0].join(2)
+    assert line.get_subtext(0) == 'fast'
@@ -0,0 +1,93 @@
+import os
+import threading
+
+import pytest
+
+from lazython.renderer import Renderer
+from lazython.tab import Tab
+
+
+@pytest.fixture
+def renderer(monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture) -> Renderer:
+    """A running renderer on a 10x3 terminal, whose output is captured."""
+    monkeypatch.setattr(os, 'get_terminal_size', lambda *args: os.terminal_size((10, 3)))
+    renderer = Renderer()
+    renderer.start()
+    renderer.clear()
+    renderer.refresh()
+    capsys.readouterr()
+    yield renderer
+    renderer.stop()
+
+
+def test_goto_origin_stays_in_box(renderer: Renderer, capsys: pytest.CaptureFixture) -> None:
+    renderer.addstr('ab\x1b[0;0Hx', x=2, y=1, width=4, height=1)
+    renderer.refresh()
+    assert capsys.readouterr().out == '\x1b[2;3H\x1b[0mxb'
+
+
+def test_refresh_sends_nothing_unchanged(renderer: Renderer, capsys: pytest.CaptureFixture) -> None:
+    renderer.addstr('abc')
+    renderer.refresh()
+    capsys.readouterr()
+    renderer.clear()
+    renderer.addstr('abc')
+    assert renderer.refresh() == 0
+    assert capsys.readouterr().out == ''
+
+
+def test_refresh_writes_short_gaps_through(renderer: Renderer, capsys: pytest.CaptureFixture) -> None:
+    """Unchanged cells between two changes are written rather than skipped, while shorter than a goto."""
+    renderer.addstr('a', x=0, y=0)
+    renderer.addstr('b', x=Renderer.MAX_GAP + 1, y=0)
+    renderer.refresh()
+    assert capsys.readouterr().out == '\x1b[1;1H\x1b[0ma' + ' ' * Renderer.MAX_GAP + 'b'
+
+
+def test_refresh_skips_long_gaps(renderer: Renderer, capsys: pytest.CaptureFixture) -> None:
+    """A long gap, or a gap at the end of a row, is rolled back and skipped."""
+    renderer.addstr('a', x=0, y=0)
+    renderer.addstr('b', x=Renderer.MAX_GAP + 2, y=0)
+    renderer.addstr('c', x=0, y=1)
+    renderer.refresh()
+    assert capsys.readouterr().out == f'\x1b[1;1H\x1b[0ma\x1b[1;{Renderer.MAX_GAP + 3}Hb\x1b[2;1Hc'
+
+
+def test_refresh_styles(renderer: Renderer, capsys: pytest.CaptureFixture) -> None:
+    """The pen is only changed when the style changes, and a gap in another style is skipped."""
+    renderer.addstr('\x1b[31mab\x1b[0m c', x=0, y=0)
+    renderer.refresh()
+    assert capsys.readouterr().out == '\x1b[1;1H\x1b[0;31mab\x1b[1;4H\x1b[0mc'
+
+
+def test_batch_invalidates_once() -> None:
+    renderer = Renderer()
+    calls = []
+    renderer.on_invalidate = lambda: calls.append(renderer.dirty.is_set())
+    tab = Tab(name='tab', renderer=renderer)
+    with renderer.batch():
+        with tab.batch():
+            tab.add_lines(['a', 'b'])
+            tab.add_line('c').set_text('d')
+        assert calls == []
+        assert not renderer.dirty.is_set()
+    assert calls == [True]
+    with renderer.batch():
+        pass
+    assert calls == [True]
+
+
+def test_batch_holds_the_lock() -> None:
+    """A frame cannot be composed while a batch runs."""
+    renderer = Renderer()
+
+    def compose() -> None:
+        with renderer.lock:
+            pass
+
+    with renderer.batch():
+        thread = threading.Thread(target=compose)
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+    thread.join()
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import pty
+import sys
+import threading
+
+import pytest
+
+from lazython import Lazython
+from lazython.renderer import Renderer
+
+
+@pytest.fixture
+def terminal(
+        monkeypatch: pytest.MonkeyPatch,
+) -> int:
+    """Run on a pseudo terminal, and return the fd of its master side."""
+    master, slave = pty.openpty()
+    stdin = open(slave, 'r', closefd=False)
+    stdout = open(slave, 'w', closefd=False)
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    monkeypatch.setattr(os, 'get_terminal_size', lambda *args: os.terminal_size((40, 10)))
+
+    # Drain the output, so that writes never block on a full pty buffer.
+    output = []
+
+    def drain() -> None:
+        while True:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            output.append(data)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    yield master
+    stdin.close()
+    stdout.close()
+    os.close(slave)
+    os.close(master)
+    thread.join(1)
+
+
+async def wait_for(
+        condition: 'function[[], bool]',
+) -> None:
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('The condition never held.')
+
+
+def test_keys_and_stop(
+        terminal: int,
+) -> None:
+    """Keys are read from stdin in the loop, and `stop` returns from `run_async`."""
+    lazython = Lazython()
+    tab = lazython.new_tab(name='tab')
+    tab.add_lines(['a', 'b', 'c'])
+    calls = []
+    lazython.add_key(ord('x'), lambda: calls.append(threading.current_thread()))
+
+    async def feed() -> None:
+        # Setting the terminal up discards the pending input, write after the first frame.
+        await wait_for(lambda: lazython.stats()['frames'] > 0)
+        os.write(terminal, b'x')
+        await wait_for(lambda: len(calls) == 1)
+        os.write(terminal, b'q')
+
+    async def main() -> None:
+        task = asyncio.create_task(feed())
+        await asyncio.wait_for(lazython.run_async(), 2)
+        await task
+
+    asyncio.run(main())
+    assert calls == [threading.main_thread()]
+    with pytest.raises(Exception):
+        lazython.stop()
+
+
+def test_run_again(
+        terminal: int,
+) -> None:
+    """Once stopped, the lazython can be run again."""
+    lazython = Lazython()
+    lazython.new_tab(name='tab')
+
+    async def main() -> None:
+        asyncio.get_running_loop().call_later(0.05, lazython.stop)
+        await asyncio.wait_for(lazython.run_async(), 2)
+
+    asyncio.run(main())
+    asyncio.run(main())
+
+
+def test_failed_setup_is_undone(
+        terminal: int,
+        monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """When a setup step fails, the steps done before are undone."""
+    lazython = Lazython()
+    lazython.new_tab(name='tab')
+
+    def start(
+            renderer: Renderer,
+    ) -> None:
+        raise RuntimeError('start')
+
+    monkeypatch.setattr(Renderer, 'start', start)
+    readers = []
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        with pytest.raises(RuntimeError):
+            await lazython.run_async()
+        readers.append(loop.remove_reader(sys.stdin.fileno()))
+
+    asyncio.run(main())
+    assert readers == [False]
+    with pytest.raises(Exception):
+        lazython.stop()
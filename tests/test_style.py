@@ -0,0 +1,36 @@
+from lazython.style import DEFAULT_STYLE, apply_sgr
+
+
+def test_reset() -> None:
+    assert apply_sgr('', '\x1b[0m') == DEFAULT_STYLE
+    assert apply_sgr('', '\x1b[m') == DEFAULT_STYLE
+    assert apply_sgr(apply_sgr('', '\x1b[1;31m'), '\x1b[0m') == DEFAULT_STYLE
+
+
+def test_canonical_form() -> None:
+    """Two sequences giving the same look give the same style."""
+    assert apply_sgr('', '\x1b[32;1m') == apply_sgr('', '\x1b[1;32m') == '\x1b[0;1;32m'
+    assert apply_sgr(apply_sgr('', '\x1b[1m'), '\x1b[32m') == '\x1b[0;1;32m'
+    assert apply_sgr('', '\x1b[01m') == apply_sgr('', '\x1b[1m')
+
+
+def test_colors_replace_each_other() -> None:
+    style = apply_sgr('', '\x1b[31;42m')
+    assert apply_sgr(style, '\x1b[34m') == '\x1b[0;34;42m'
+    assert apply_sgr(style, '\x1b[39m') == '\x1b[0;42m'
+    assert apply_sgr(style, '\x1b[49;39m') == DEFAULT_STYLE
+    assert apply_sgr('', '\x1b[91;103m') == '\x1b[0;91;103m'
+
+
+def test_extended_colors() -> None:
+    assert apply_sgr('', '\x1b[38;5;208m') == '\x1b[0;38;5;208m'
+    assert apply_sgr('', '\x1b[48;2;1;2;3m') == '\x1b[0;48;2;1;2;3m'
+    # The parameters of an extended color are not taken as attributes.
+    assert apply_sgr('', '\x1b[38;2;1;2;3;4m') == '\x1b[0;4;38;2;1;2;3m'
+    assert apply_sgr(apply_sgr('', '\x1b[58;5;1m'), '\x1b[59m') == DEFAULT_STYLE
+
+
+def test_attribute_resets() -> None:
+    style = apply_sgr('', '\x1b[1;2;3;4;7m')
+    assert apply_sgr(style, '\x1b[22m') == '\x1b[0;3;4;7m'
+    assert apply_sgr(style, '\x1b[22;23;24;27m') == DEFAULT_STYLE
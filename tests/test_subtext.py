@@ -0,0 +1,107 @@
+import random
+import re
+import threading
+
+import pytest
+
+import lazython.subtext
+from lazython.layout import Layout
+from lazython.subtext import Subtext
+
+
+def lay_out(text: str, width: int) -> tuple[int, int]:
+    layout = Layout(width)
+    layout.feed(text)
+    return layout.get_size()
+
+
+def test_append() -> None:
+    subtext = Subtext('ab')
+    assert subtext.get_size(10) == (2, 0)
+    subtext.append('c\nde')
+    assert subtext.get_text() == 'abc\nde'
+    assert len(subtext) == 6
+    assert subtext.get_size(10) == (3, 1)
+    assert subtext.get_size(2) == (2, 2)
+
+
+def test_max_lines() -> None:
+    subtext = Subtext()
+    subtext.set_limit(max_lines=2)
+    subtext.append('a\nb\n')
+    assert subtext.get_text() == 'b\n'
+    subtext.append('c')
+    assert subtext.get_text() == 'b\nc'
+    subtext.append('\nd\ne')
+    assert subtext.get_text() == 'd\ne'
+
+
+def test_max_chars() -> None:
+    """The oldest lines are dropped whole, the last line is kept even if it is too long."""
+    subtext = Subtext()
+    subtext.set_limit(max_chars=5)
+    subtext.append('abc\nde\n')
+    assert subtext.get_text() == 'de\n'
+    subtext.append('fghijkl')
+    assert subtext.get_text() == 'fghijkl'
+
+
+def test_set_limit_drops_rows() -> None:
+    subtext = Subtext('a\nb\nc\nd')
+    subtext.get_size(10)
+    assert subtext.set_limit(max_lines=2) == 2
+    assert subtext.get_text() == 'c\nd'
+    assert subtext.get_size(10) == (1, 1)
+
+
+def test_random_eviction() -> None:
+    """A bounded subtext is laid out like its kept text."""
+    rng = random.Random(0)
+    for _ in range(300):
+        subtext = Subtext()
+        max_lines = rng.randint(1, 4)
+        subtext.set_limit(max_lines=max_lines)
+        width = rng.randint(5, 30)
+        model = ''
+        for _ in range(rng.randint(1, 30)):
+            chunk = ''.join(rng.choice('ab \n\t') for _ in range(rng.randint(0, 60)))
+            model += chunk
+            subtext.get_size(width)
+            subtext.append(chunk)
+        kept = model.split('\n')[-max_lines:]
+        assert subtext.get_text() == '\n'.join(kept)
+        assert subtext.get_size(width) == lay_out(subtext.get_text(), width)
+        assert subtext.get_window(width, 0, 100)[0] == Subtext(subtext.get_text()).get_window(width, 0, 100)[0]
+
+
+def test_search_in_slices(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Searching the chunks a slice at a time finds the hits across chunks and slices, and the dropped text is skipped."""
+    monkeypatch.setattr(lazython.subtext, 'SEARCH_SLICE_SIZE', 7)
+    rng = random.Random(0)
+    for _ in range(200):
+        subtext = Subtext()
+        subtext.set_limit(max_lines=rng.choice([None, 3, 10]))
+        for _ in range(rng.randint(0, 20)):
+            subtext.append(''.join(rng.choice('aAbB\n') for _ in range(rng.randint(1, 12))))
+        _, start, _ = subtext.get_span()
+        query = rng.choice(['ab', 'AB\nb', 'a'])
+        expected = [start + match.start() for match in re.finditer(re.escape(query), subtext.get_text(), re.IGNORECASE)]
+        assert list(subtext.prepare_search(query)()) == expected
+
+
+def test_search_since() -> None:
+    subtext = Subtext('a hit\n')
+    _, _, end = subtext.get_span()
+    subtext.append('hit')
+    assert list(subtext.prepare_search('HIT', since=end)()) == [6]
+    subtext = Subtext('a hi')
+    _, _, end = subtext.get_span()
+    subtext.append('t')
+    assert list(subtext.prepare_search('hit', since=end)()) == [2]
+
+
+def test_search_cancelled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(lazython.subtext, 'SEARCH_SLICE_SIZE', 4)
+    cancel = threading.Event()
+    cancel.set()
+    assert list(Subtext('hit hit hit').prepare_search('hit')(cancel)) == []
@@ -0,0 +1,63 @@
+import time
+
+from lazython.line import Line
+from lazython.tab import Tab
+
+SMALL = 1_000
+LARGE = 16 * SMALL
+MAX_RATIO = 4  # Operations in O(log n) take about the same time at both sizes, operations in O(n) 16 times longer.
+
+
+def time_per_operation(
+        count: int,
+        operate: 'function[[Tab, list[Line]], None]',
+) -> float:
+    """Get the best time of an operation applied to every other line of a tab of `count` lines."""
+    best = float('inf')
+    for _ in range(3):
+        tab = Tab(name='tab')
+        lines = [tab.add_line(str(i), key=i) for i in range(count)]
+        start_time = time.perf_counter()
+        operate(tab, lines[::2])
+        best = min(best, time.perf_counter() - start_time)
+    return best / (count // 2)
+
+
+def assert_scales(
+        operate: 'function[[Tab, list[Line]], None]',
+) -> None:
+    small = time_per_operation(SMALL, operate)
+    large = time_per_operation(LARGE, operate)
+    assert large < MAX_RATIO * small, f'{small * 1e6:.1f} us per operation, {large * 1e6:.1f} us on 16 times more lines'
+
+
+def test_delete_scales() -> None:
+    def delete(tab: Tab, lines: list[Line]) -> None:
+        for line in lines:
+            tab.delete_line(line)
+
+    assert_scales(delete)
+
+
+def test_index_scales() -> None:
+    def index(tab: Tab, lines: list[Line]) -> None:
+        for line in lines:
+            tab.get_line_index(line)
+
+    assert_scales(index)
+
+
+def test_move_scales() -> None:
+    def move(tab: Tab, lines: list[Line]) -> None:
+        for i, line in enumerate(lines):
+            tab.move_line(line, i)
+
+    assert_scales(move)
+
+
+def test_lookup_scales() -> None:
+    def lookup(tab: Tab, lines: list[Line]) -> None:
+        for i in range(0, 2 * len(lines), 2):
+            tab.get_line(tab.get_line_by_key(i).get_id())
+
+    assert_scales(lookup)
@@ -0,0 +1,100 @@
+import types
+
+import pytest
+
+import lazython.tab
+from lazython.line import Line
+from lazython.tab import Tab
+
+
+class InlineThread:
+    """A thread running its target when started, so that the searches end before the jumps."""
+
+    def __init__(self: 'InlineThread', target: 'function', args: tuple = (), daemon: bool = None) -> None:
+        self.target = target
+        self.args = args
+
+    def start(self: 'InlineThread') -> None:
+        self.target(*self.args)
+
+
+@pytest.fixture(autouse=True)
+def inline_threads(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(lazython.tab, 'threading', types.SimpleNamespace(Thread=InlineThread))
+
+
+def make_tab(
+        subtext: str,
+) -> tuple[Tab, Line]:
+    """Make a tab with a single line scrolled to the top, whose content pane shows 10 rows."""
+    tab = Tab(name='tab', subtabs=['text'])
+    tab.set_content_width(40)
+    tab.set_content_height(12)
+    line = tab.add_line('line')
+    line.append_subtext(0, subtext)
+    line.set_scroll(0, 0)
+    return tab, line
+
+
+def jump(
+        tab: Tab,
+        line: Line,
+        direction: int = 1,
+) -> int:
+    """Jump to the next or previous hit, and get the scroll."""
+    if direction > 0:
+        tab.next_match()
+    else:
+        tab.previous_match()
+    return line.get_scroll(0)
+
+
+def test_jumps() -> None:
+    tab, line = make_tab(''.join(f'row {i}{" hit" * (i % 10 == 0)}\n' for i in range(100)))
+    tab.set_search('HIT')
+    assert [jump(tab, line) for _ in range(3)] == [0, 5, 15]
+    assert jump(tab, line, -1) == 5
+    assert jump(tab, line, -1) == 0
+    assert jump(tab, line, -1) == 85
+
+
+def test_jumps_while_growing() -> None:
+    """Jumping while the subtext grows goes on from the current hit, and finds the appended hits."""
+    tab, line = make_tab(''.join(f'row {i} hit\n' for i in range(20)))
+    tab.set_search('hit')
+    scrolls = []
+    for i in range(20, 40):
+        line.append_subtext(0, f'row {i} hit\n')
+        scrolls.append(jump(tab, line))
+    assert scrolls == [0] * 6 + list(range(1, 15))
+    assert [jump(tab, line) for _ in range(20)] == list(range(15, 35))
+
+
+def test_hits_across_appends() -> None:
+    tab, line = make_tab('row 0 h')
+    tab.set_search('hit')
+    jump(tab, line)
+    line.append_subtext(0, 'it\n' + '\n' * 50 + 'hit')
+    assert jump(tab, line) == 0
+    assert jump(tab, line) == 51 - 5
+    assert jump(tab, line) == 0
+
+
+def test_bounded_subtext() -> None:
+    """The hits of the dropped lines are forgotten."""
+    tab, line = make_tab(''.join(f'row {i} hit\n' for i in range(20)))
+    line.set_subtext_limit(0, max_lines=10)
+    tab.set_search('hit')
+    assert jump(tab, line) == 0
+    line.append_subtext(0, ''.join(f'row {i}\n' for i in range(20, 25)))
+    assert [jump(tab, line) for _ in range(5)] == [0, 0, 0, 0, 0]
+
+
+def test_plain_subtext() -> None:
+    tab = Tab(name='tab', subtabs=['text'])
+    tab.set_content_width(40)
+    tab.set_content_height(12)
+    line = tab.add_line('line', ['\n' * 30 + 'hit'])
+    line.set_scroll(0, 0)
+    tab.set_search('hit')
+    assert jump(tab, line) == 25
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from lazython.tab import Tab
+
+
+def get_texts(
+        tab: Tab,
+) -> list[str]:
+    """Get the texts of the lines shown by a tab, in order."""
+    texts = []
+    for index in range(tab.get_nb_lines()):
+        tab.select_line(index)
+        texts.append(tab.get_selected_line().get_text())
+    return texts
+
+
+def test_sort_by_text() -> None:
+    tab = Tab(name='tab')
+    tab.add_lines(['b', 'c', 'a'])
+    tab.set_sort_key(lambda line: line.get_text())
+    assert get_texts(tab) == ['a', 'b', 'c']
+    tab.add_line('bb')
+    assert get_texts(tab) == ['a', 'b', 'bb', 'c']
+    tab.set_sort_key(lambda line: line.get_text(), reverse=True)
+    assert get_texts(tab) == ['c', 'bb', 'b', 'a']
+
+
+def test_set_text_resorts() -> None:
+    tab = Tab(name='tab')
+    line = tab.add_lines(['a', 'b', 'c'])[0]
+    tab.set_sort_key(lambda line: line.get_text())
+    line.set_text('d')
+    assert get_texts(tab) == ['b', 'c', 'd']
+
+
+def test_ties_keep_their_order() -> None:
+    tab = Tab(name='tab')
+    tab.add_lines(['b1', 'a1', 'b2', 'a2', 'b3'])
+    tab.set_sort_key(lambda line: line.get_text()[0])
+    assert get_texts(tab) == ['a1', 'a2', 'b1', 'b2', 'b3']
+
+
+def test_update_sort_keeps_selection() -> None:
+    tab = Tab(name='tab')
+    lines = tab.add_lines(['a', 'b', 'c', 'd'])
+    values = {line: index for index, line in enumerate(lines)}
+    tab.set_sort_key(lambda line: values[line])
+    tab.select_line(1)
+    values[lines[1]] = 10
+    values[lines[3]] = -1
+    tab.update_sort([lines[1], lines[3]])
+    assert tab.get_selected_line() == lines[1]
+    assert get_texts(tab) == ['d', 'a', 'c', 'b']
+
+
+def test_unsorted_keeps_order() -> None:
+    tab = Tab(name='tab')
+    lines = tab.add_lines(['b', 'a'])
+    tab.set_sort_key(lambda line: line.get_text())
+    with pytest.raises(ValueError):
+        tab.move_line(lines[0], 0)
+    tab.set_sort_key(None)
+    tab.add_line('0')
+    assert get_texts(tab) == ['a', 'b', '0']
+    tab.move_line(lines[0], 0)
+    assert get_texts(tab) == ['b', 'a', '0']
+
+
+def test_random_updates() -> None:
+    """The lines and the filtered view stay sorted by random keys."""
+    rng = random.Random(0)
+    tab = Tab(name='tab')
+    values = {}
+    for line in tab.add_lines(f'l{index}' for index in range(100)):
+        values[line] = rng.randint(0, 20)
+    tab.set_sort_key(lambda line: values.get(line, 0), reverse=True)
+    for _ in range(500):
+        lines = list(values)
+        operation = rng.random()
+        if operation < 0.4 and lines:
+            changed = rng.sample(lines, rng.randint(1, min(10, len(lines))))
+            for line in changed:
+                values[line] = rng.randint(0, 20)
+            tab.update_sort(changed)
+        elif operation < 0.6:
+            line = tab.add_line(f'l{rng.randint(0, 999)}')
+            values[line] = rng.randint(0, 20)
+            tab.update_sort([line])
+        elif operation < 0.75 and lines:
+            line = rng.choice(lines)
+            tab.delete_line(line)
+            del values[line]
+        elif operation < 0.9 and lines:
+            rng.choice(lines).set_text(f'l{rng.randint(0, 999)}')
+        else:
+            tab.set_filter(rng.choice(['', '1', 'l2']))
+        order = sorted(values, key=tab.get_line_index)
+        keys = [values[line] for line in order]
+        assert keys == sorted(keys, reverse=True)
+        query = tab.get_filter()
+        assert get_texts(tab) == [line.get_text() for line in order if query in line.get_text()]
+
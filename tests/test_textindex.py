@@ -0,0 +1,53 @@
+import random
+import threading
+
+from lazython.tab import Tab
+from lazython.textindex import TextIndex
+
+
+def test_trigrams() -> None:
+    assert TextIndex.get_trigrams('AbcD') == {'abc', 'bcd'}
+    assert TextIndex.get_trigrams('ab') == set()
+
+
+def test_candidates() -> None:
+    index = TextIndex([(1, 'Hello world'), (2, 'hello there'), (3, 'bye')])
+    assert index.get_candidates('hello') == {1, 2}
+    assert index.get_candidates('WORLD') == {1}
+    assert index.get_candidates('xyz') == set()
+    assert index.get_candidates('he') is None
+
+
+def test_add_and_remove() -> None:
+    index = TextIndex()
+    index.add(1, 'abcdef')
+    index.add(2, 'abcxyz')
+    assert index.get_candidates('abc') == {1, 2}
+    index.remove(1, 'abcdef')
+    assert index.get_candidates('abc') == {2}
+    assert index.get_candidates('def') == set()
+
+
+def test_candidates_hold_the_matches() -> None:
+    """The candidates of a query are a superset of the texts containing it."""
+    rng = random.Random(0)
+    texts = {id: ''.join(rng.choice('abcAB ') for _ in range(rng.randint(0, 20))) for id in range(300)}
+    index = TextIndex(texts.items())
+    for _ in range(200):
+        query = ''.join(rng.choice('abcAB ') for _ in range(rng.randint(3, 6)))
+        matches = {id for id, text in texts.items() if query.lower() in text.lower()}
+        assert matches <= index.get_candidates(query)
+
+
+
+def test_tab_without_renderer_is_locked() -> None:
+    """A tab without renderer still has a lock, shared with its lines and the thread building its index."""
+    tab = Tab(name='tab')
+    line = tab.add_line('line')
+    with tab.batch():
+        thread = threading.Thread(target=line.set_text, args=('text',))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+    thread.join()
+    assert line.get_text() == 'text'